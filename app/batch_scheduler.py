@@ -0,0 +1,108 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, List, Optional
+
+# ⚙️ Scheduler settings (override via environment)
+SCHEDULER_MAX_BATCH_SIZE = int(os.getenv("SCHEDULER_MAX_BATCH_SIZE", "8"))
+SCHEDULER_MAX_WAIT_MS = float(os.getenv("SCHEDULER_MAX_WAIT_MS", "10"))
+SCHEDULER_MAX_QUEUE_DEPTH = int(os.getenv("SCHEDULER_MAX_QUEUE_DEPTH", "256"))  # queued + in-flight items before requests are rejected
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler has 'max_queue_depth' items queued or running."""
+
+
+class MicroBatchScheduler:
+    """
+    Collects single requests for up to 'max_wait_ms' (or until 'max_batch_size'
+    are waiting), runs them as one batch and resolves each caller individually.
+    Batches are dispatched concurrently, so collection never waits on a running batch.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int = SCHEDULER_MAX_BATCH_SIZE,
+                 max_wait_ms: float = SCHEDULER_MAX_WAIT_MS,
+                 max_queue_depth: int = SCHEDULER_MAX_QUEUE_DEPTH):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_depth = max_queue_depth
+        self.stats = {"requests": 0, "batches": 0, "rejected": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._running = set()
+        self._pending = 0  # ✅ Queued and in-flight items; a running batch still holds its slots
+
+    def start(self):
+        """
+        Starts the collector task; must be called from the running event loop.
+        """
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, *self._running, return_exceptions=True)
+            self._worker = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queues one item and waits for its individual result.
+        Raises QueueFullError when 'max_queue_depth' items are already queued
+        or in a running batch.
+        """
+        if self._pending >= self.max_queue_depth:
+            self.stats["rejected"] += 1
+            raise QueueFullError("Too many pending requests.")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, future))
+        self._pending += 1
+        self.stats["requests"] += 1
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            # ✅ Keep collecting until the batch is full or the wait expires
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = loop.create_task(self._dispatch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _dispatch(self, batch: list):
+        self.stats["batches"] += 1
+        items = [item for item, _ in batch]
+        try:
+            results = await self.process_batch(items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._pending -= len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():  # ❌ Caller may have disconnected
+                future.set_result(result)
@@ -0,0 +1,358 @@
+import asyncio
+import contextvars
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from app.sentiment import analyze_sentiment, sentiment_engine
+from app.local_sentiment import analyze_sentiment_local
+from app.rating_predictor import predict_ratings_with_confidence
+from app.router import LLM, LOCAL, route_reviews, summarize_locally
+from app.summarizer import SUMMARY_BATCH_SIZE, SUMMARY_ENGINE, summarize_review, summarize_reviews
+from app.ollama_handler import astream_summarize_with_ollama
+from app.chunking import needs_chunking
+from app.metrics import fallbacks, instrumented, register_callback, rows_processed
+from app.near_duplicates import NEAR_DUP_ENABLED, NearDuplicateClusters
+from app.output_parser import rating_stars
+from app.result_cache import (
+    cached_batch_call, cached_call, is_cacheable, result_cache, sentiment_cache_key, summary_cache_key
+)
+
+# ⚙️ Concurrency settings (override via environment)
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", "8"))   # parallel Watson NLU calls (also capped by WATSON_MAX_CONCURRENCY)
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))       # parallel LLM generations
+CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "16"))           # reviews handled per chunk
+MAX_CHUNKS_IN_FLIGHT = int(os.getenv("BULK_MAX_CHUNKS_IN_FLIGHT", "4"))
+RATING_SOURCE = os.getenv("RATING_SOURCE", "llm")  # "llm" (local model fills gaps) or "local" (always local model)
+
+# ✅ One bounded pool per backend so a slow LLM never starves sentiment calls
+_sentiment_pool = ThreadPoolExecutor(max_workers=SENTIMENT_WORKERS, thread_name_prefix="sentiment")
+_summary_pool = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summary")
+
+# 📊 Backend calls saved because an identical review was already in flight
+pipeline_stats = {"deduplicated_calls": 0}
+register_callback("review_deduplicated_calls_total", "counter",
+                  "Backend calls saved by sharing an identical in-flight review.",
+                  lambda: {(): pipeline_stats["deduplicated_calls"]})
+
+
+def build_result_row(review: str, review_date: str, sentiment: str, granite_result: dict) -> dict:
+    """
+    Builds one output row in the format returned by /upload/summarize_all.
+    """
+    row = {
+        "original_review": review,
+        "summary": granite_result["summary"],
+        "predicted_rating": granite_result["predicted_rating"],
+        "rating_stars": rating_stars(granite_result["predicted_rating"]),
+        "sentiment": sentiment,
+        "rating_source": granite_result.get("rating_source", "llm"),
+        "date": review_date
+    }
+    if "duplicate_of" in granite_result:
+        row["duplicate_of"] = granite_result["duplicate_of"]  # ✅ Summary reused from a near-duplicate review
+    return row
+
+
+def is_failed_row(row: dict) -> bool:
+    """
+    A row counts as failed if any backend reported an error for it.
+    """
+    return "error" in row or row.get("sentiment") == "error" or row.get("predicted_rating") == "N/A"
+
+
+def _in_executor(pool, fn, *args):
+    # ✅ Carries the caller's context (e.g. an active job trace) into the worker thread
+    return asyncio.get_running_loop().run_in_executor(pool, contextvars.copy_context().run, fn, *args)
+
+
+async def _run_cached(pool: ThreadPoolExecutor, key: str, fn, review: str, inflight: dict):
+    """
+    Runs fn(review) on 'pool' through the result cache. Identical reviews in
+    the same upload share one in-flight call instead of each hitting the backend.
+    """
+    if result_cache is not None:
+        value = result_cache.get_memory(key)
+        if value is not None:
+            return value
+
+    future = inflight.get(key)
+    if future is None:
+        future = _in_executor(pool, cached_call, key, fn, review)
+        inflight[key] = future
+        future.add_done_callback(lambda _: inflight.pop(key, None))
+    else:
+        pipeline_stats["deduplicated_calls"] += 1
+
+    return await asyncio.shield(future)
+
+
+async def _run_cached_batch(pool: ThreadPoolExecutor, keys: List[str], batch_fn, reviews: List[str], inflight: dict) -> list:
+    """
+    Like _run_cached, but reviews that are not cached or already in flight are
+    sent to batch_fn together, in groups of SUMMARY_BATCH_SIZE, one pool task per group.
+    """
+    loop = asyncio.get_running_loop()
+    futures = [None] * len(keys)
+    to_compute = {}  # key -> review
+
+    for i, (key, review) in enumerate(zip(keys, reviews)):
+        value = result_cache.get_memory(key) if result_cache is not None else None
+        if value is not None:
+            futures[i] = loop.create_future()
+            futures[i].set_result(value)
+        elif key in inflight or key in to_compute:
+            pipeline_stats["deduplicated_calls"] += 1
+        else:
+            to_compute[key] = review
+
+    pending_keys = list(to_compute)
+    for start in range(0, len(pending_keys), SUMMARY_BATCH_SIZE):
+        group = pending_keys[start:start + SUMMARY_BATCH_SIZE]
+        batch_future = _in_executor(pool, cached_batch_call, group, batch_fn, [to_compute[key] for key in group])
+        for position, key in enumerate(group):
+            inflight[key] = asyncio.ensure_future(_pick(batch_future, position))
+            inflight[key].add_done_callback(lambda _, key=key: inflight.pop(key, None))
+
+    for i, key in enumerate(keys):
+        if futures[i] is None:
+            futures[i] = inflight[key]
+
+    return await asyncio.gather(*(asyncio.shield(future) for future in futures), return_exceptions=True)
+
+
+async def _pick(batch_future, position: int):
+    return (await batch_future)[position]
+
+
+def _apply_local_rating(granite_result: dict, local_rating) -> dict:
+    """
+    Uses the local model's rating when configured to, or when the LLM
+    gave no usable rating (timeout, unparseable output).
+    """
+    if local_rating is None:
+        return granite_result
+    if RATING_SOURCE == "local" or granite_result.get("predicted_rating") == "N/A":
+        if granite_result.get("predicted_rating") == "N/A":
+            fallbacks.inc("llm_rating_to_local")
+        return {**granite_result, "predicted_rating": local_rating, "rating_source": "local"}
+    return {"rating_source": "llm", **granite_result}
+
+
+def _build_row(entry: Dict[str, str], sentiment, granite_result, local_rating=None) -> dict:
+    """
+    Combines backend results for one review into an output row.
+    Backend exceptions arrive as values and turn into an error row
+    (which still carries the local rating, when there is one).
+    """
+    review = entry["review"]
+    review_date = entry.get("date")
+
+    # ✅ Fallback to today's date if missing
+    if not review_date or review_date.strip() == "":
+        review_date = str(date.today())
+
+    try:
+        for value in (sentiment, granite_result):
+            if isinstance(value, BaseException):
+                raise value
+        return build_result_row(review, review_date, sentiment, _apply_local_rating(granite_result, local_rating))
+
+    except Exception as e:
+        # ❌ Keep going: one bad review should not fail the whole upload
+        print("❌ Error while processing review:", str(e))
+        return {
+            "original_review": review,
+            "summary": "Error occurred.",
+            "predicted_rating": local_rating if local_rating is not None else "N/A",
+            "rating_stars": rating_stars(local_rating),
+            "sentiment": "error",
+            "date": review_date,
+            "error": str(e)
+        }
+
+
+async def _summarize_chunk(reviews: List[str], inflight: dict) -> list:
+    keys = [summary_cache_key(review) for review in reviews]
+
+    if SUMMARY_BATCH_SIZE > 1:
+        return await _run_cached_batch(_summary_pool, keys, summarize_reviews, reviews, inflight)
+
+    return await asyncio.gather(
+        *(_run_cached(_summary_pool, key, summarize_review, review, inflight) for key, review in zip(keys, reviews)),
+        return_exceptions=True
+    )
+
+
+async def _run_sentiment(review: str, inflight: dict):
+    # ✅ The local classifier is cheaper than a cache lookup, so it runs inline
+    if sentiment_engine() == "local":
+        return analyze_sentiment_local(review)
+    return await _run_cached(_sentiment_pool, sentiment_cache_key(review), analyze_sentiment, review, inflight)
+
+
+async def _process_chunk(chunk: List[Dict[str, str]], inflight: dict,
+                         clusters: Optional[NearDuplicateClusters] = None, first_position: int = 0) -> List[dict]:
+    """
+    Processes a chunk of reviews concurrently, preserving their order.
+    Sentiment and summarization for the chunk run at the same time.
+    With 'clusters', near-duplicates of earlier reviews in the run reuse
+    their representative's summary instead of calling the LLM. Reviews are
+    identified by their entry's 'row_index' (input row), falling back to
+    their position in the run ('first_position' + offset in the chunk).
+    """
+    reviews = [entry["review"] for entry in chunk]
+
+    # ✅ One vectorized pass rates the whole chunk locally and picks each review's route
+    rated = await _in_executor(None, predict_ratings_with_confidence, reviews)
+    local_ratings = [rating for rating, _ in rated]
+    routes = route_reviews(reviews, [confidence for _, confidence in rated])
+
+    llm_reviews = [review for review, route in zip(reviews, routes) if route == LLM]
+    if clusters is None:
+        llm_task = _summarize_chunk(llm_reviews, inflight)
+    else:
+        positions = [entry.get("row_index", first_position + i)
+                     for i, (entry, route) in enumerate(zip(chunk, routes)) if route == LLM]
+        llm_task = clusters.summarize(llm_reviews, positions, lambda batch: _summarize_chunk(batch, inflight))
+
+    sentiments, llm_summaries = await asyncio.gather(
+        asyncio.gather(
+            *(_run_sentiment(review, inflight) for review in reviews),
+            return_exceptions=True
+        ),
+        llm_task
+    )
+
+    llm_results = iter(llm_summaries)
+    summaries = [next(llm_results) if route == LLM else summarize_locally(review, rating)
+                 for review, route, rating in zip(reviews, routes, local_ratings)]
+    return [_build_row(entry, sentiment, summary, local_rating)
+            for entry, sentiment, summary, local_rating in zip(chunk, sentiments, summaries, local_ratings)]
+
+
+_request_inflight = {}  # shared by batches of single-review requests
+
+
+async def process_reviews(entries: List[Dict[str, str]]) -> List[dict]:
+    """
+    Processes one batch of {review, date} entries as a single chunk.
+    Used by the /summarize micro-batch scheduler.
+    """
+    return await _process_chunk(entries, _request_inflight)
+
+
+async def stream_review(review: str) -> AsyncIterator[dict]:
+    """
+    Streams summary events for one review (see astream_summarize_with_ollama)
+    while sentiment runs alongside, then yields a final 'result' event with
+    the same fields as /summarize. Cached and locally routed reviews skip
+    straight to the result.
+    """
+    loop = asyncio.get_running_loop()
+    sentiment_task = asyncio.ensure_future(_run_sentiment(review, _request_inflight))
+    (local_rating, confidence), = await loop.run_in_executor(None, predict_ratings_with_confidence, [review])
+    key = summary_cache_key(review)
+
+    if route_reviews([review], [confidence])[0] == LOCAL:
+        summary = summarize_locally(review, local_rating)
+    elif result_cache is not None:
+        summary = await loop.run_in_executor(None, result_cache.get, key)
+    else:
+        summary = None
+
+    if summary is None and SUMMARY_ENGINE == "ollama" and not needs_chunking(review, SUMMARY_ENGINE):
+        async for event in astream_summarize_with_ollama(review):
+            if event["type"] == "result":
+                summary = {name: value for name, value in event.items() if name != "type"}
+            else:
+                yield event
+        if result_cache is not None and is_cacheable(summary):
+            await loop.run_in_executor(None, result_cache.set, key, summary)
+
+    elif summary is None:
+        # ✅ Chunked reviews and engines without token streaming return the whole summary at once
+        summary = await _run_cached(_summary_pool, key, summarize_review, review, _request_inflight)
+
+    sentiment, = await asyncio.gather(sentiment_task, return_exceptions=True)
+    row = _build_row({"review": review, "date": ""}, sentiment, summary, local_rating)
+    row.pop("date")
+    yield {"type": "result", **row}
+
+
+def _iter_chunks(entries: Iterable[Dict[str, str]], size: int):
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@instrumented("csv_read")
+def _next_chunk(chunks):
+    return next(chunks, None)
+
+
+def _count_row(row: dict) -> dict:
+    rows_processed.inc("failed" if is_failed_row(row) else "ok")
+    return row
+
+
+async def iter_bulk_results(entries: Iterable[Dict[str, str]], stats: Optional[dict] = None) -> AsyncIterator[dict]:
+    """
+    Yields result rows in input order while keeping at most
+    MAX_CHUNKS_IN_FLIGHT chunks of reviews being processed at once.
+    'entries' may be a lazy generator (e.g. a streaming CSV reader); it is
+    consumed chunk by chunk off the event loop, so memory stays bounded.
+    'stats' receives the run's near-duplicate cluster stats as it progresses.
+    Callers that skip input rows tag entries with 'row_index' so that
+    'duplicate_of' refers to the input row, not the position in the run.
+    """
+    chunks = _iter_chunks(entries, CHUNK_SIZE)
+    pending = deque()
+    inflight = {}  # cache key -> future, shared by duplicate reviews in this run
+    clusters = NearDuplicateClusters() if NEAR_DUP_ENABLED else None
+    processed = submitted = 0
+
+    try:
+        while True:
+            # ✅ Read the next chunk in a thread so parsing never blocks the loop
+            chunk = await _in_executor(None, _next_chunk, chunks)
+            if chunk is None:
+                break
+            pending.append(asyncio.ensure_future(_process_chunk(chunk, inflight, clusters, submitted)))
+            submitted += len(chunk)
+
+            if len(pending) >= MAX_CHUNKS_IN_FLIGHT:
+                for row in await pending.popleft():
+                    processed += 1
+                    yield _count_row(row)
+                print(f"🔍 Processed {processed} reviews")
+                if clusters and stats is not None:
+                    stats["near_duplicates"] = clusters.summary()
+
+        while pending:
+            for row in await pending.popleft():
+                processed += 1
+                yield _count_row(row)
+            print(f"🔍 Processed {processed} reviews")
+
+        if clusters and stats is not None:
+            stats["near_duplicates"] = clusters.summary()
+
+    finally:
+        # ❌ Stop outstanding work if the consumer stops early or a chunk fails
+        for task in pending:
+            task.cancel()
+
+
+async def run_bulk_pipeline(entries: Iterable[Dict[str, str]]) -> List[dict]:
+    """
+    Summarizes and analyzes all reviews concurrently and returns rows in input order.
+    """
+    return [row async for row in iter_bulk_results(entries)]
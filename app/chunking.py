@@ -0,0 +1,140 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from app.extractive_summarizer import split_sentences
+from app.granite_engine import GRANITE_MAX_NEW_TOKENS, build_granite_prompt
+from app.model_registry import loaded_model
+from app.ollama_handler import build_ollama_prompt, estimate_tokens
+
+# ⚙️ Chunking settings (override via environment)
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "2048"))            # keep in sync with the Ollama server's num_ctx
+OLLAMA_OUTPUT_TOKENS = int(os.getenv("OLLAMA_OUTPUT_TOKENS", "200"))  # room left for the model's reply
+CHUNK_CONTEXT_FRACTION = float(os.getenv("CHUNK_CONTEXT_FRACTION", "0.5"))  # share of the free context one chunk may use
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "64"))
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "4"))
+CHUNK_MAX_DEPTH = 3  # reduce rounds before the partial summaries are simply joined
+
+# ✅ Own pool: chunks are submitted from summary-pool threads, which must not wait on themselves
+_chunk_pool = ThreadPoolExecutor(max_workers=CHUNK_WORKERS, thread_name_prefix="chunk")
+
+
+def _granite():
+    return loaded_model("granite")
+
+
+def count_tokens(text: str, engine: str) -> int:
+    """
+    Exact count with the Granite tokenizer once it is loaded, otherwise an estimate.
+    """
+    granite = _granite() if engine == "granite" else None
+    return granite.count_tokens(text) if granite else estimate_tokens(text)
+
+
+def chunk_token_budget(engine: str) -> int:
+    """
+    Review tokens allowed in one prompt, derived from the active model's
+    context window minus the prompt template and the reply.
+    """
+    if engine == "granite":
+        granite = _granite()
+        context = granite.context_window if granite else OLLAMA_NUM_CTX
+        template, reply = build_granite_prompt(""), GRANITE_MAX_NEW_TOKENS
+    else:
+        context, template, reply = OLLAMA_NUM_CTX, build_ollama_prompt(""), OLLAMA_OUTPUT_TOKENS
+
+    free = context - count_tokens(template, engine) - reply
+    return max(CHUNK_OVERLAP_TOKENS * 2, int(free * CHUNK_CONTEXT_FRACTION))
+
+
+def needs_chunking(review: str, engine: str) -> bool:
+    return count_tokens(review, engine) > chunk_token_budget(engine)
+
+
+def _pieces(review: str, budget: int, engine: str) -> List[str]:
+    # ✅ Sentences, with any sentence longer than the budget cut on word boundaries
+    pieces = []
+    for sentence in split_sentences(review):
+        if count_tokens(sentence, engine) <= budget:
+            pieces.append(sentence)
+            continue
+        words, current = sentence.split(), []
+        for word in words:
+            if current and count_tokens(" ".join(current + [word]), engine) > budget:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+    return pieces
+
+
+def split_into_chunks(review: str, engine: str, budget: int = None,
+                      overlap: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """
+    Packs whole sentences into chunks of at most 'budget' tokens. Each chunk
+    starts with the last ~'overlap' tokens of the previous one so context
+    carries across boundaries.
+    """
+    budget = budget or chunk_token_budget(engine)
+    pieces = _pieces(review, budget, engine)
+    sizes = [count_tokens(piece, engine) for piece in pieces]
+
+    chunks, current, used = [], [], 0
+    for index, size in enumerate(sizes):
+        if current and used + size > budget:
+            chunks.append(" ".join(pieces[i] for i in current))
+            # 🔁 Carry trailing pieces into the next chunk, up to the overlap size
+            carried, carried_tokens = [], 0
+            for i in reversed(current):
+                if carried_tokens + sizes[i] > overlap or carried_tokens + sizes[i] + size > budget:
+                    break
+                carried.insert(0, i)
+                carried_tokens += sizes[i]
+            current, used = carried, carried_tokens
+        current.append(index)
+        used += size
+    if current:
+        chunks.append(" ".join(pieces[i] for i in current))
+    return chunks
+
+
+def _usable(result: dict) -> bool:
+    return "error" not in result and result.get("predicted_rating") != "N/A"
+
+
+def summarize_chunked(review: str, summarize_fn: Callable[[str], dict], engine: str, depth: int = 0) -> dict:
+    """
+    Map-reduce summary of a long review: chunks are summarized concurrently,
+    then their summaries are summarized once more into the final result.
+    The rating is the reduce step's rating, or the token-weighted mean of
+    the chunk ratings when the reduce step gives none.
+    """
+    chunks = split_into_chunks(review, engine)
+    print(f"✂️ [Chunking] Review of ~{count_tokens(review, engine)} tokens split into {len(chunks)} chunks")
+    partials = list(_chunk_pool.map(summarize_fn, chunks))
+
+    usable = [(chunk, result) for chunk, result in zip(chunks, partials) if _usable(result)]
+    if not usable:
+        return {**partials[0], "original_review": review, "chunks": len(chunks)}
+
+    weights = [count_tokens(chunk, engine) for chunk, _ in usable]
+    mean_rating = sum(w * float(r["predicted_rating"]) for w, (_, r) in zip(weights, usable)) / sum(weights)
+    combined = " ".join(result["summary"] for _, result in usable)
+
+    if len(usable) == 1:
+        final = usable[0][1]
+    elif not needs_chunking(combined, engine):
+        final = summarize_fn(combined)
+    elif depth + 1 < CHUNK_MAX_DEPTH:
+        final = summarize_chunked(combined, summarize_fn, engine, depth + 1)
+    else:
+        final = {"summary": combined, "predicted_rating": "N/A"}
+
+    return {
+        **usable[0][1],
+        "summary": final["summary"] if _usable(final) else combined,
+        "predicted_rating": final["predicted_rating"] if _usable(final) else round(mean_rating, 1),
+        "original_review": review,
+        "chunks": len(chunks)
+    }
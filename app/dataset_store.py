@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from app.bulk_pipeline import is_failed_row, iter_bulk_results
+from app.result_cache import summary_model
+from app.sentiment import sentiment_engine_version
+from app.sqlite_store import SQLiteStore
+from app.summarizer import PROMPT_VERSION, SUMMARY_ENGINE
+from app.utils import clean_text
+
+# ⚙️ Dataset store settings (override via environment)
+DATASET_DB_PATH = os.getenv("DATASET_DB_PATH", os.path.join("datasets", "datasets.db"))
+LOOKUP_BATCH = 500   # rows looked up per query
+MERGE_BATCH = 200    # new rows written per transaction
+REUSED_AHEAD = 4 * LOOKUP_BATCH  # reused rows looked up ahead of the consumer before lookups pause
+
+
+def dataset_name(filename: str) -> str:
+    """
+    Default dataset id for an upload: the file name without extension,
+    so re-uploading 'reviews_export.csv' every day hits the same dataset.
+    """
+    stem = os.path.splitext(os.path.basename(filename or "dataset"))[0]
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", stem).strip("._") or "dataset"
+
+
+def fingerprint(entry: Dict[str, str]) -> str:
+    payload = "\x1f".join([clean_text(entry["review"]), entry.get("date") or ""])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def row_key(entry: Dict[str, str], entry_fingerprint: str) -> str:
+    # ✅ Rows with an id can change in place; others are identified by content
+    return f"id:{entry['id']}" if entry.get("id") else f"fp:{entry_fingerprint}"
+
+
+def processing_signature() -> str:
+    """
+    Everything that changes a stored row; rows processed under a different
+    signature are run again.
+    """
+    sentiment, sentiment_version = sentiment_engine_version()
+    return "|".join([SUMMARY_ENGINE, summary_model(), PROMPT_VERSION, sentiment, sentiment_version])
+
+
+class DatasetStore(SQLiteStore):
+    """
+    SQLite store of processed rows per dataset, keyed by row id (or content
+    fingerprint), so repeated uploads of a growing export only process the delta.
+    """
+
+    def __init__(self, db_path: str = DATASET_DB_PATH):
+        super().__init__(db_path)
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS dataset_rows (
+                dataset_id TEXT,
+                row_key TEXT,
+                fingerprint TEXT,
+                signature TEXT,
+                data TEXT,
+                updated_at REAL,
+                PRIMARY KEY (dataset_id, row_key)
+            )
+        """)
+
+    def lookup(self, dataset_id: str, keys: List[str]) -> Dict[str, sqlite3.Row]:
+        found = {}
+        with self._connect() as conn:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                rows = conn.execute(
+                    f"SELECT row_key, fingerprint, signature, data FROM dataset_rows "
+                    f"WHERE dataset_id = ? AND row_key IN ({', '.join('?' * len(batch))})",
+                    (dataset_id, *batch)
+                ).fetchall()
+                found.update({row["row_key"]: row for row in rows})
+        return found
+
+    def merge(self, dataset_id: str, items: List[Tuple[str, str, dict]], signature: str):
+        """
+        Upserts (row_key, fingerprint, row) items. Failed rows are not stored,
+        so they are retried on the next upload.
+        """
+        now = time.time()
+        values = [
+            (dataset_id, key, entry_fingerprint, signature, json.dumps(row, ensure_ascii=False), now)
+            for key, entry_fingerprint, row in items if not is_failed_row(row)
+        ]
+        if not values:
+            return
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO dataset_rows (dataset_id, row_key, fingerprint, signature, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                values
+            )
+
+    def stats(self, dataset_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS rows, MAX(updated_at) AS updated_at FROM dataset_rows WHERE dataset_id = ?",
+                (dataset_id,)
+            ).fetchone()
+        if not row["rows"]:
+            return None
+        return {"dataset": dataset_id, "rows": row["rows"], "updated_at": row["updated_at"]}
+
+    def get_results(self, dataset_id: str, offset: int = 0, limit: int = 100) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM dataset_rows WHERE dataset_id = ? ORDER BY rowid LIMIT ? OFFSET ?",
+                (dataset_id, limit, offset)
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def iter_results(self, dataset_id: str):
+        with self._connect() as conn:
+            cursor = conn.execute("SELECT data FROM dataset_rows WHERE dataset_id = ? ORDER BY rowid", (dataset_id,))
+            for row in cursor:
+                yield json.loads(row["data"])
+
+
+dataset_store = DatasetStore()
+
+
+def _batches(entries: Iterable[Dict[str, str]], size: int):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def iter_incremental_results(dataset_id: str, entries: Iterable[Dict[str, str]],
+                                   stats: Optional[dict] = None) -> AsyncIterator[dict]:
+    """
+    Like iter_bulk_results, but rows already stored for this dataset with the
+    same content and processing signature are reused; only new or changed
+    rows reach the pipeline. New results are merged into the store.
+    Rows are yielded in input order. 'stats' collects reused/processed counts.
+    Reused rows are yielded as soon as their lookup batch resolves; only
+    rows queued behind a new row still in the pipeline are held back.
+    """
+    loop = asyncio.get_running_loop()
+    signature = processing_signature()
+    stats = stats if stats is not None else {}
+    stats.update(dataset=dataset_id, reused=0, processed=0)
+    plan = deque()  # per input row: ("reused", row) or ("pending", (key, fingerprint))
+    planned = asyncio.Event()        # set by the reader thread when rows were added to the plan
+    drained = threading.Condition()  # notified by the consumer as it yields reused rows
+    closed = False
+
+    def reused_backlog() -> bool:
+        # ❌ Only pause while the consumer can drain the head itself, or the pipeline would starve
+        return len(plan) >= REUSED_AHEAD and plan[0][0] == "reused" and not closed
+
+    def pending_entries():
+        # ✅ Runs in the pipeline's reader thread; one query per LOOKUP_BATCH rows
+        index = 0
+        for batch in _batches(entries, LOOKUP_BATCH):
+            with drained:
+                while reused_backlog():
+                    drained.wait(1)
+            if closed:
+                return
+
+            fingerprints = [fingerprint(entry) for entry in batch]
+            keys = [row_key(entry, fp) for entry, fp in zip(batch, fingerprints)]
+            stored = dataset_store.lookup(dataset_id, keys)
+
+            pending = []
+            for entry, key, fp in zip(batch, keys, fingerprints):
+                hit = stored.get(key)
+                if hit and hit["fingerprint"] == fp and hit["signature"] == signature:
+                    plan.append(("reused", json.loads(hit["data"])))
+                else:
+                    plan.append(("pending", (key, fp)))
+                    # ✅ Reused rows are skipped, so tag the input row for 'duplicate_of'
+                    pending.append(entry if "row_index" in entry else {**entry, "row_index": index})
+                index += 1
+            loop.call_soon_threadsafe(planned.set)
+            yield from pending
+
+    results = iter_bulk_results(pending_entries(), stats)
+    next_row = None
+    new_rows = []
+
+    try:
+        while True:
+            planned.clear()
+            while plan and plan[0][0] == "reused":
+                stats["reused"] += 1
+                row = plan.popleft()[1]
+                with drained:
+                    drained.notify()
+                yield row
+
+            if next_row is None:
+                next_row = asyncio.ensure_future(results.__anext__())
+            if not next_row.done():
+                # ✅ Wake up for the next new row or for more reused rows, whichever comes first
+                waiter = asyncio.ensure_future(planned.wait())
+                await asyncio.wait({next_row, waiter}, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                continue
+
+            try:
+                row = next_row.result()
+            except StopAsyncIteration:
+                break
+            next_row = None
+
+            key, fp = plan.popleft()[1]
+            new_rows.append((key, fp, row))
+            if len(new_rows) >= MERGE_BATCH:
+                await loop.run_in_executor(None, dataset_store.merge, dataset_id, new_rows, signature)
+                new_rows = []
+            stats["processed"] += 1
+            yield row
+
+        # ✅ Reused rows after the last new one
+        while plan:
+            stats["reused"] += 1
+            yield plan.popleft()[1]
+
+    finally:
+        closed = True
+        with drained:
+            drained.notify_all()
+        if next_row is not None and not next_row.done():
+            next_row.cancel()
+            await asyncio.gather(next_row, return_exceptions=True)
+        await results.aclose()
+        if new_rows:
+            await loop.run_in_executor(None, dataset_store.merge, dataset_id, new_rows, signature)
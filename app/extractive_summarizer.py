@@ -0,0 +1,190 @@
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from app.local_sentiment import LEXICON, analyze_sentiment_local
+
+# ⚙️ Extractive settings (override via environment)
+EXTRACTIVE_MAX_WORDS = int(os.getenv("EXTRACTIVE_MAX_WORDS", "30"))
+DIGEST_MAX_THEMES = int(os.getenv("DIGEST_MAX_THEMES", "8"))
+DIGEST_MAX_SENTENCES = int(os.getenv("DIGEST_MAX_SENTENCES", "50000"))  # larger uploads are sampled
+DIGEST_EXAMPLES = int(os.getenv("DIGEST_EXAMPLES", "3"))
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "but", "if", "of", "to", "in", "on", "at", "for", "with", "from", "by",
+    "was", "were", "is", "are", "be", "been", "it", "its", "this", "that", "there", "we", "i", "my", "our",
+    "me", "us", "you", "they", "he", "she", "had", "has", "have", "as", "so", "very", "really", "just",
+    "again", "also", "too", "all", "after", "during", "seemed"
+}
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_RE.split(text.strip()) if sentence.strip()]
+
+
+def _content_words(sentence: str) -> List[str]:
+    words = _WORD_RE.findall(sentence.lower().replace("\u2019", "'"))
+    return [word for word in words if word not in STOP_WORDS]
+
+
+def tfidf_matrix(sentences: List[str]) -> Tuple[sp.csr_matrix, List[str]]:
+    """
+    Builds an L2-normalized TF-IDF matrix (sentences x vocabulary) and the vocabulary.
+    """
+    vocabulary: Dict[str, int] = {}
+    rows, cols, counts = [], [], []
+    for row, sentence in enumerate(sentences):
+        for word, count in Counter(_content_words(sentence)).items():
+            rows.append(row)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+            counts.append(count)
+
+    matrix = sp.csr_matrix((np.asarray(counts, dtype=np.float32), (rows, cols)),
+                           shape=(len(sentences), max(1, len(vocabulary))))
+    document_frequency = np.bincount(cols, minlength=matrix.shape[1])
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+    matrix = matrix.multiply(idf.astype(np.float32)).tocsr()
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    terms = [None] * len(vocabulary)
+    for word, index in vocabulary.items():
+        terms[index] = word
+    return sp.diags(1 / norms).dot(matrix).tocsr(), terms
+
+
+def textrank_scores(matrix: sp.csr_matrix, damping: float = 0.85, iterations: int = 30) -> np.ndarray:
+    """
+    PageRank over the cosine-similarity graph of the sentences.
+    """
+    n = matrix.shape[0]
+    similarity = (matrix @ matrix.T).toarray()
+    np.fill_diagonal(similarity, 0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    out_weight[out_weight == 0] = 1
+    transition = similarity / out_weight
+
+    scores = np.full(n, 1 / n)
+    for _ in range(iterations):
+        scores = (1 - damping) / n + damping * transition.T @ scores
+    return scores
+
+
+def _trim(text: str, max_words: int) -> str:
+    words = text.split()
+    return " ".join(words[:max_words]) + "…" if len(words) > max_words else text
+
+
+def summarize_extractive(review: str, max_words: int = EXTRACTIVE_MAX_WORDS) -> str:
+    """
+    Picks the most central opinionated sentence(s) of a review (TextRank,
+    nudged towards sentences that carry sentiment words and appear early).
+    Takes about a millisecond for a typical review.
+    """
+    sentences = split_sentences(review)
+    if len(sentences) <= 1:
+        return _trim(review.strip(), max_words)
+
+    matrix, _ = tfidf_matrix(sentences)
+    scores = textrank_scores(matrix)
+    opinion = np.array([any(word in LEXICON for word in _content_words(s)) for s in sentences], dtype=float)
+    position = 1 / (1 + 0.1 * np.arange(len(sentences)))
+    scores = scores * (1 + 0.5 * opinion) * position
+
+    keep = 1 if len(sentences) <= 3 else 2
+    chosen = sorted(np.argsort(-scores)[:keep])
+    return _trim(" ".join(sentences[i] for i in chosen), max_words)
+
+
+def summarize_extractive_batch(reviews: Iterable[str]) -> List[str]:
+    return [summarize_extractive(review) for review in reviews]
+
+
+def _spherical_kmeans(matrix: sp.csr_matrix, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    k-means on unit vectors using cosine similarity; returns a label per row.
+    Seeded k-means++ style so results are repeatable.
+    """
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    centers = [rng.integers(n)]
+    closest = np.asarray((matrix @ matrix[centers[0]].T).todense()).ravel()
+    for _ in range(1, k):
+        distance = np.clip(1 - closest, 0, None)
+        if distance.sum() == 0:
+            break
+        centers.append(rng.choice(n, p=distance / distance.sum()))
+        closest = np.maximum(closest, np.asarray((matrix @ matrix[centers[-1]].T).todense()).ravel())
+
+    centroids = matrix[centers].toarray()
+    labels = np.zeros(n, dtype=int)
+    for iteration in range(iterations):
+        new_labels = np.asarray(matrix @ centroids.T).argmax(axis=1)
+        if iteration and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(len(centroids)):
+            members = matrix[labels == c]
+            if members.shape[0]:
+                center = np.asarray(members.sum(axis=0)).ravel()
+                centroids[c] = center / (np.linalg.norm(center) or 1)
+    return labels
+
+
+def build_digest(reviews: Iterable[str], max_themes: int = DIGEST_MAX_THEMES,
+                 max_sentences: int = DIGEST_MAX_SENTENCES) -> dict:
+    """
+    "What customers are saying" across many reviews, without any LLM calls:
+    sentences are clustered by TF-IDF similarity and each theme is reported
+    with its most central sentence, top terms, mention count and sentiment mix.
+    """
+    sentences, total, rng = [], 0, np.random.default_rng(0)
+    review_count = 0
+    for review in reviews:
+        review_count += 1
+        for sentence in split_sentences(review):
+            total += 1
+            if len(sentences) < max_sentences:
+                sentences.append(sentence)
+            else:
+                # ✅ Reservoir sampling keeps memory bounded on huge uploads
+                slot = rng.integers(total)
+                if slot < max_sentences:
+                    sentences[slot] = sentence
+
+    if not sentences:
+        return {"reviews": review_count, "sentences": 0, "sampled": False, "themes": []}
+
+    matrix, terms = tfidf_matrix(sentences)
+    k = max(1, min(max_themes, len(sentences) // 3 or 1))
+    labels = _spherical_kmeans(matrix, k)
+
+    themes = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        center = np.asarray(matrix[members].mean(axis=0)).ravel()
+        closeness = np.asarray(matrix[members] @ center).ravel()
+        ranked = list(dict.fromkeys(sentences[i] for i in members[np.argsort(-closeness)]))
+        sentiment = Counter(analyze_sentiment_local(sentences[i]) for i in members)
+        themes.append({
+            "summary": ranked[0],
+            "keywords": [terms[i] for i in np.argsort(-center)[:5] if center[i] > 0],
+            "mentions": int(len(members)),
+            "share": round(len(members) / len(sentences), 3),
+            "sentiment": dict(sentiment),
+            "examples": ranked[1:DIGEST_EXAMPLES + 1]
+        })
+
+    themes.sort(key=lambda theme: theme["mentions"], reverse=True)
+    return {
+        "reviews": review_count,
+        "sentences": total,
+        "sampled": total > len(sentences),
+        "themes": themes
+    }
@@ -1,63 +1,133 @@
 import csv
 import os
+import shutil
+import uuid
 from fastapi import UploadFile
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
+
+from app.metrics import instrumented
 
 # ✅ Create upload directory if it doesn't exist
-UPLOAD_DIR = "uploads"
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-def save_and_parse_csv(file: UploadFile) -> List[Dict[str, str]]:
+COPY_CHUNK_BYTES = 1024 * 1024  # Upload is copied to disk 1 MB at a time
+FALLBACK_DATE = "2025-06-10"    # Used if no valid date field is found
+
+
+@instrumented("upload_save")
+def save_upload(file: UploadFile, save_as: Optional[str] = None) -> str:
     """
-    Save the uploaded CSV file and extract 'review' and 'date' (if present).
-    Falls back to dummy 'date' if no date or timestamp column is found.
+    Copy the uploaded file to disk in fixed-size chunks and return its path.
+    Memory use stays constant no matter how large the upload is.
+    Each upload gets its own uuid-prefixed file, so concurrent uploads with
+    the same name never overwrite a file that is still being read.
     """
-    file_location = os.path.join(UPLOAD_DIR, file.filename)
+    # ❌ Never trust path components from the client
+    name = save_as or f"{uuid.uuid4().hex}_{os.path.basename(file.filename or 'upload.csv')}"
+    file_location = os.path.join(UPLOAD_DIR, os.path.basename(name))
 
-    # ✅ Save uploaded file to disk
-    with open(file_location, "wb+") as f:
-        f.write(file.file.read())
+    with open(file_location, "wb") as f:
+        shutil.copyfileobj(file.file, f, COPY_CHUNK_BYTES)
 
-    reviews = []
-    fallback_date = "2025-06-10"  # Used if no valid date field is found
+    return file_location
 
+
+def remove_upload(file_location: str):
+    """
+    Deletes an upload once its run has finished reading it.
+    """
     try:
-        with open(file_location, "r", encoding="utf-8") as csvfile:
-            # ✅ Auto-detect delimiter (comma or tab)
-            sample = csvfile.read(2048)
-            delimiter = "," if sample.count(",") >= sample.count("\t") else "\t"
-            csvfile.seek(0)
+        os.remove(file_location)
+    except FileNotFoundError:
+        pass
 
-            reader = csv.DictReader(csvfile, delimiter=delimiter)
-            original_fields = reader.fieldnames or []
 
-            # ✅ Normalize headers (case-insensitive)
-            field_map = {field.lower().strip(): field for field in original_fields}
-            review_key = field_map.get("review")
-            date_key = field_map.get("date") or field_map.get("timestamp")  # allow either
+def iter_csv_reviews(file_location: str) -> Iterator[Dict[str, str]]:
+    """
+    Lazily yield {review, date} dicts from a CSV file on disk (plus 'id'
+    when the file has a review_id/id column).
+    The header is validated immediately; rows are read one at a time
+    so callers can start processing before the whole file is parsed.
+    """
+    try:
+        csvfile = open(file_location, "r", encoding="utf-8", newline="")
 
-            if not review_key:
-                raise ValueError("CSV must contain a 'review' column.")
+        # ✅ Auto-detect delimiter (comma or tab)
+        sample = csvfile.read(2048)
+        delimiter = "," if sample.count(",") >= sample.count("\t") else "\t"
+        csvfile.seek(0)
 
-            # ✅ Read and process each row
-            for row in reader:
-                print("🧾 Raw Row:", row)  # Debugging log
+        reader = csv.DictReader(csvfile, delimiter=delimiter)
+        original_fields = reader.fieldnames or []
 
-                review_text = row.get(review_key, "").strip()
-                date_value = row.get(date_key, "").strip() if date_key else ""
+        # ✅ Normalize headers (case-insensitive)
+        field_map = {field.lower().strip(): field for field in original_fields}
+        review_key = field_map.get("review")
+        date_key = field_map.get("date") or field_map.get("timestamp")  # allow either
+        id_key = field_map.get("review_id") or field_map.get("id")
 
-                if review_text:
-                    reviews.append({
-                        "review": review_text,
-                        "date": date_value if date_value else fallback_date
-                    })
+        if not review_key:
+            csvfile.close()
+            raise ValueError("CSV must contain a 'review' column.")
 
     except Exception as e:
         print(f"❌ Error while parsing CSV: {e}")
         raise ValueError("Invalid CSV format or encoding issue.")
 
-    if not reviews:
+    return _iter_rows(csvfile, reader, review_key, date_key, id_key)
+
+
+def _iter_rows(csvfile, reader: csv.DictReader, review_key: str, date_key: Optional[str],
+               id_key: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    count = 0
+
+    try:
+        # ✅ Read and process each row
+        for row in reader:
+            review_text = (row.get(review_key) or "").strip()
+            date_value = (row.get(date_key) or "").strip() if date_key else ""
+
+            if review_text:
+                count += 1
+                entry = {
+                    "review": review_text,
+                    "date": date_value if date_value else FALLBACK_DATE
+                }
+                if id_key and (row.get(id_key) or "").strip():
+                    entry["id"] = row[id_key].strip()
+                yield entry
+
+    except Exception as e:
+        print(f"❌ Error while parsing CSV: {e}")
+        raise ValueError("Invalid CSV format or encoding issue.")
+
+    finally:
+        csvfile.close()
+
+    if not count:
         raise ValueError("No valid reviews found.")
 
-    print(f"✅ Parsed {len(reviews)} reviews with actual or fallback dates.")
-    return reviews
+    print(f"✅ Parsed {count} reviews with actual or fallback dates.")
+
+
+def validate_csv(file_location: str):
+    """
+    Raise ValueError unless the CSV has a 'review' column and at least one review.
+    Only reads as far as the first valid row.
+    """
+    reviews = iter_csv_reviews(file_location)
+    try:
+        next(reviews)
+    finally:
+        reviews.close()
+
+
+@instrumented("csv_parse")
+def save_and_parse_csv(file: UploadFile, save_as: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    Save the uploaded CSV file and extract 'review' and 'date' (if present).
+    Falls back to dummy 'date' if no date or timestamp column is found.
+    Pass 'save_as' to store the upload under a different name (e.g. per job).
+    """
+    return list(iter_csv_reviews(save_upload(file, save_as)))
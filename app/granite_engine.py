@@ -0,0 +1,191 @@
+import copy
+import os
+import threading
+import time
+from typing import List
+
+from app.metrics import instrumented
+from app.output_parser import OUTPUT_REASK_ATTEMPTS, parse_reply
+
+# ⚙️ Generation settings (override via environment)
+GRANITE_BATCH_SIZE = int(os.getenv("GRANITE_BATCH_SIZE", "8"))
+GRANITE_MAX_NEW_TOKENS = int(os.getenv("GRANITE_MAX_NEW_TOKENS", "100"))
+GRANITE_DO_SAMPLE = os.getenv("GRANITE_DO_SAMPLE", "0") == "1"  # greedy by default (faster, deterministic)
+GRANITE_NUM_THREADS = int(os.getenv("GRANITE_NUM_THREADS", "0"))  # 0 = pick automatically
+GRANITE_CONTEXT_TOKENS = int(os.getenv("GRANITE_CONTEXT_TOKENS", "4096"))  # used when the model config has no limit
+GRANITE_PREFIX_CACHE = os.getenv("GRANITE_PREFIX_CACHE", "1") == "1"  # encode the shared instructions once, reuse their key/values
+
+# ✅ Shared instruction block first, review last, so every prompt starts with the same tokens.
+# The prefix ends on a word, not whitespace, so it tokenizes the same alone as inside the full prompt.
+GRANITE_PROMPT_PREFIX = """
+You are an AI assistant that summarizes customer reviews and predicts a star rating (1–5).
+
+Give your response in this format:
+Summary: <summary>
+Predicted Rating: <1–5>
+
+Review:"""
+
+
+def build_granite_suffix(review: str) -> str:
+    return f' "{review}"\n'
+
+
+def build_granite_prompt(review: str) -> str:
+    return GRANITE_PROMPT_PREFIX + build_granite_suffix(review)
+
+
+def configure_cpu_threads(num_threads: int = GRANITE_NUM_THREADS) -> int:
+    """
+    Caps intra-op threads for CPU inference. Defaults to half the logical
+    cores (roughly the physical cores), since hyper-threads slow matmuls down.
+    """
+    import torch
+
+    if num_threads <= 0:
+        num_threads = max(1, (os.cpu_count() or 2) // 2)
+    torch.set_num_threads(num_threads)
+    return num_threads
+
+
+def parse_granite_output(output: str) -> dict:
+    """
+    Extracts structured summary and rating from Granite raw output.
+    """
+    return {**parse_reply(output, "granite"), "engine_used": "granite"}
+
+
+class GraniteEngine:
+    """
+    Batched in-process generation for any Hugging Face causal LM.
+    Reviews are left-padded into batches so every prompt ends at the same
+    position and only the newly generated tokens need decoding.
+    Pass a tiny randomly-initialized model and tokenizer to run it on CPU in tests.
+    torch is imported lazily so importing this module stays cheap.
+    """
+
+    def __init__(self, model, tokenizer, batch_size: int = GRANITE_BATCH_SIZE,
+                 max_new_tokens: int = GRANITE_MAX_NEW_TOKENS, do_sample: bool = GRANITE_DO_SAMPLE):
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+        self.max_new_tokens = max_new_tokens
+        self.do_sample = do_sample
+
+        # ✅ Decoder-only models must be padded on the left for batched generation
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        # ✅ Context window from the model config (prompt + generated tokens)
+        self.context_window = getattr(model.config, "max_position_embeddings", None) or GRANITE_CONTEXT_TOKENS
+
+        self._prefix_caches = {}  # prefix text -> (token ids, key/values)
+        self._prefix_lock = threading.Lock()
+
+        if next(model.parameters()).device.type == "cpu":
+            configure_cpu_threads()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def _generation_kwargs(self) -> dict:
+        kwargs = {
+            "max_new_tokens": self.max_new_tokens,
+            "do_sample": self.do_sample,
+            "pad_token_id": self.tokenizer.pad_token_id,
+            "repetition_penalty": 1.2
+        }
+        if self.do_sample:
+            kwargs.update(temperature=0.7, top_k=50, top_p=0.9)
+        return kwargs
+
+    def prefix_cache(self, prefix: str):
+        """
+        Token ids and key/values of a shared prompt prefix, computed on first
+        use and kept for the engine's lifetime.
+        """
+        import torch
+
+        with self._prefix_lock:
+            if prefix not in self._prefix_caches:
+                device = next(self.model.parameters()).device
+                prefix_ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"].to(device)
+                with torch.inference_mode():
+                    past = self.model(input_ids=prefix_ids, use_cache=True).past_key_values
+                self._prefix_caches[prefix] = (prefix_ids, past)
+                print(f"🧠 [Granite] Cached key/values for a {prefix_ids.shape[1]}-token prompt prefix")
+            return self._prefix_caches[prefix]
+
+    def _prefixed_inputs(self, prefix: str, suffixes: List[str]) -> dict:
+        """
+        Inputs for prefix + suffix prompts that only encode the suffixes:
+        the suffixes are left-padded after the shared prefix (the attention
+        mask hides the padding and position ids follow the mask), and
+        generation starts from a copy of the prefix key/values.
+        """
+        import torch
+
+        prefix_ids, past = self.prefix_cache(prefix)
+        inputs = self.tokenizer(suffixes, return_tensors="pt", padding=True,
+                                add_special_tokens=False).to(prefix_ids.device)
+        rows = len(suffixes)
+
+        past = copy.deepcopy(past)  # ✅ generate() extends the cache in place
+        past.batch_repeat_interleave(rows)
+        return {
+            "input_ids": torch.cat([prefix_ids.expand(rows, -1), inputs["input_ids"]], dim=1),
+            "attention_mask": torch.cat([torch.ones_like(prefix_ids).expand(rows, -1), inputs["attention_mask"]], dim=1),
+            "past_key_values": past
+        }
+
+    def generate_texts(self, prompts: List[str], prefix: str = "") -> List[str]:
+        """
+        Generates a completion for every prefix + prompt and returns only the
+        new text. With GRANITE_PREFIX_CACHE the shared prefix is encoded once.
+        """
+        import torch
+
+        outputs = []
+        device = next(self.model.parameters()).device
+
+        for start in range(0, len(prompts), self.batch_size):
+            batch = prompts[start:start + self.batch_size]
+            if prefix and GRANITE_PREFIX_CACHE:
+                inputs = self._prefixed_inputs(prefix, batch)
+            else:
+                inputs = dict(self.tokenizer([prefix + prompt for prompt in batch], return_tensors="pt",
+                                             padding=True).to(device))
+
+            with torch.inference_mode():
+                generated = self.model.generate(**inputs, **self._generation_kwargs())
+
+            new_tokens = generated[:, inputs["input_ids"].shape[1]:]
+            outputs.extend(self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True))
+
+        return outputs
+
+    @instrumented("granite")
+    def summarize_batch(self, reviews: List[str]) -> List[dict]:
+        """
+        Summarizes and rates reviews in padded batches, returning parsed results in order.
+        """
+        start = time.perf_counter()
+        texts = self.generate_texts([build_granite_suffix(review) for review in reviews], GRANITE_PROMPT_PREFIX)
+        print(f"🧠 [Granite] Generated {len(reviews)} summaries in {time.perf_counter() - start:.2f}s")
+
+        results = [parse_granite_output(text) for text in texts]
+
+        # 🔁 Re-ask unparseable items with the answer format already started,
+        # which steers the model into it (and changes the greedy output)
+        failed = [i for i, result in enumerate(results) if result["predicted_rating"] == "N/A"]
+        if failed and OUTPUT_REASK_ATTEMPTS:
+            retries = self.generate_texts([build_granite_suffix(reviews[i]) + "Summary:" for i in failed],
+                                          GRANITE_PROMPT_PREFIX)
+            for i, text in zip(failed, retries):
+                results[i] = parse_granite_output("Summary:" + text)
+
+        for review, result in zip(reviews, results):
+            result["original_review"] = review
+        return results
+
@@ -1,7 +1,15 @@
 import os
+import random
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import requests
 from dotenv import load_dotenv
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+from requests.adapters import HTTPAdapter
+from ibm_cloud_sdk_core.authenticators import IAMAuthenticator, NoAuthAuthenticator
 from ibm_cloud_sdk_core.api_exception import ApiException
 from ibm_watson.natural_language_understanding_v1 import (
     NaturalLanguageUnderstandingV1,
@@ -9,46 +17,164 @@ from ibm_watson.natural_language_understanding_v1 import (
     SentimentOptions
 )
 
+from app.metrics import instrumented
+
 # ✅ Load credentials from .env
 load_dotenv()
 
 # 🔑 Environment Variables
 API_KEY = os.getenv("WATSON_API_KEY")
 WATSON_URL = os.getenv("WATSON_URL")
+WATSON_AUTH_TYPE = os.getenv("WATSON_AUTH_TYPE", "iam")  # "none" talks to a local NLU stub without IAM
+NLU_VERSION = "2022-04-07"
 
-# ✅ Safety check
-if not API_KEY or not WATSON_URL:
-    raise ValueError("❌ API key or Watson URL missing. Check your .env file.")
+# ⚙️ Throughput settings (override via environment)
+WATSON_MAX_CONCURRENCY = int(os.getenv("WATSON_MAX_CONCURRENCY", "8"))
+WATSON_MAX_RPS = float(os.getenv("WATSON_MAX_RPS", "20"))       # client-side rate limit; 0 disables it
+WATSON_TIMEOUT = float(os.getenv("WATSON_TIMEOUT", "30"))
+WATSON_MAX_RETRIES = int(os.getenv("WATSON_MAX_RETRIES", "4"))
+WATSON_BACKOFF = float(os.getenv("WATSON_BACKOFF", "0.5"))
 
-# ✅ Normalize IBM API Key (optional)
-if API_KEY.startswith("ApiKey-"):
-    print("⚠️ Detected 'ApiKey-' prefix — stripping it.")
-    API_KEY = API_KEY.replace("ApiKey-", "")
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
-# ✅ Set up IAM Authenticator
-authenticator = IAMAuthenticator(API_KEY)
 
-# ✅ Initialize Watson NLU client
-nlu = NaturalLanguageUnderstandingV1(
-    version='2022-04-07',
-    authenticator=authenticator
-)
-nlu.set_service_url(WATSON_URL)
+class WatsonNotConfigured(ValueError):
+    """Raised when WATSON_API_KEY / WATSON_URL are missing."""
+
+
+def watson_configured() -> bool:
+    return bool(WATSON_URL) and (bool(API_KEY) or WATSON_AUTH_TYPE == "none")
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: at most 'rate' calls per second on average,
+    with bursts of up to 'burst' calls.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_client: Optional[NaturalLanguageUnderstandingV1] = None
+_client_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(WATSON_MAX_CONCURRENCY)
+_rate_limiter = RateLimiter(WATSON_MAX_RPS)
+_batch_pool = ThreadPoolExecutor(max_workers=WATSON_MAX_CONCURRENCY, thread_name_prefix="watson")
+
+
+def _build_client() -> NaturalLanguageUnderstandingV1:
+    if not watson_configured():
+        raise WatsonNotConfigured("❌ API key or Watson URL missing. Check your .env file.")
+
+    if WATSON_AUTH_TYPE == "none":
+        authenticator = NoAuthAuthenticator()
+    else:
+        api_key = API_KEY
+        # ✅ Normalize IBM API Key (optional)
+        if api_key.startswith("ApiKey-"):
+            print("⚠️ Detected 'ApiKey-' prefix — stripping it.")
+            api_key = api_key.replace("ApiKey-", "")
+        authenticator = IAMAuthenticator(api_key)
+
+    nlu = NaturalLanguageUnderstandingV1(version=NLU_VERSION, authenticator=authenticator)
+    nlu.set_service_url(WATSON_URL)
+    nlu.set_http_config({"timeout": WATSON_TIMEOUT})
+
+    # ✅ Keep-alive pool sized for the concurrency limit
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_maxsize=WATSON_MAX_CONCURRENCY))
+    session.mount("https://", HTTPAdapter(pool_maxsize=WATSON_MAX_CONCURRENCY))
+    nlu.set_http_client(session)
+    return nlu
+
+
+def get_client() -> NaturalLanguageUnderstandingV1:
+    """
+    Builds the Watson NLU client on first use, so importing this module
+    never needs credentials.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def _retry_delay(e: Exception, attempt: int) -> float:
+    # ✅ Honour Retry-After on 429s, otherwise exponential backoff with jitter
+    response = getattr(e, "http_response", None)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return WATSON_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+
+
+def _analyze(text: str) -> str:
+    """
+    One rate-limited Watson call; 429/5xx and connection errors are retried.
+    """
+    nlu = get_client()
+
+    for attempt in range(WATSON_MAX_RETRIES + 1):
+        _rate_limiter.acquire()
+        try:
+            with _slots:
+                response = nlu.analyze(
+                    text=text,
+                    features=Features(sentiment=SentimentOptions()),
+                    language='en'
+                ).get_result()
+            return response['sentiment']['document']['label']
+
+        except ApiException as e:
+            if e.code not in RETRY_STATUS or attempt == WATSON_MAX_RETRIES:
+                raise
+            print(f"🔁 [Watson] HTTP {e.code}, retrying...")
+            time.sleep(_retry_delay(e, attempt))
+
+        except requests.exceptions.ConnectionError as e:
+            if attempt == WATSON_MAX_RETRIES:
+                raise
+            print("🔁 [Watson] Connection error, retrying:", str(e))
+            time.sleep(_retry_delay(e, attempt))
+
+    raise RuntimeError("Watson retries exhausted.")
+
 
 # ✅ Main Sentiment Analysis Function
+@instrumented("watson")
 def analyze_sentiment_ibm(text: str) -> str:
     """
     Analyze sentiment using IBM Watson NLU.
     Returns: 'positive', 'neutral', 'negative', or 'error'
     """
     try:
-        response = nlu.analyze(
-            text=text,
-            features=Features(sentiment=SentimentOptions()),
-            language='en'
-        ).get_result()
+        return _analyze(text)
 
-        return response['sentiment']['document']['label']
+    except WatsonNotConfigured as e:
+        print(str(e))
+        return "error"
 
     except ApiException as e:
         print("🔴 Watson API Error:", e.message)
@@ -64,3 +190,11 @@ def analyze_sentiment_ibm(text: str) -> str:
         print("❗ Unexpected error during sentiment analysis:", str(e))
         traceback.print_exc()
         return "error"
+
+
+def analyze_sentiment_ibm_batch(texts: List[str]) -> List[str]:
+    """
+    Analyzes many texts concurrently (bounded by WATSON_MAX_CONCURRENCY
+    and WATSON_MAX_RPS), returning labels in input order.
+    """
+    return list(_batch_pool.map(analyze_sentiment_ibm, texts))
@@ -1,7 +1,8 @@
+import io
 import os
 import csv
 from fastapi import UploadFile, HTTPException
-from typing import List
+from typing import Iterator, List
 
 
 # ✅ Validate and clean a single review string
@@ -20,6 +21,19 @@ def process_bulk_reviews(file: UploadFile) -> List[str]:
     Reads and validates a CSV file containing customer reviews.
     Returns a list of cleaned, non-empty reviews from the 'review' column.
     """
+    reviews = list(iter_bulk_reviews(file))
+
+    if not reviews:
+        raise HTTPException(status_code=400, detail="No valid reviews found in the file.")
+
+    return reviews
+
+
+def iter_bulk_reviews(file: UploadFile) -> Iterator[str]:
+    """
+    Streams cleaned, non-empty reviews from an uploaded CSV one row at a time,
+    decoding the upload incrementally instead of reading it into memory.
+    """
     filename = file.filename
     extension = os.path.splitext(filename)[1].lower()
 
@@ -28,28 +42,24 @@ def process_bulk_reviews(file: UploadFile) -> List[str]:
         raise HTTPException(status_code=400, detail="Only CSV files are supported.")
 
     try:
-        # 📥 Read file content
-        content = file.file.read().decode("utf-8")
-        reader = csv.DictReader(content.splitlines())
+        # 📥 Decode the upload lazily, line by line
+        content = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+        reader = csv.DictReader(content)
 
         # 🧾 Normalize header names
-        fieldnames = [f.lower().strip() for f in reader.fieldnames]
-        if "review" not in fieldnames:
+        field_map = {f.lower().strip(): f for f in (reader.fieldnames or [])}
+        review_key = field_map.get("review")
+        if not review_key:
             raise HTTPException(status_code=400, detail="CSV file must contain a 'review' column (case-insensitive).")
 
-        reviews = []
         for row in reader:
             # 📦 Support flexible casing of the column name
-            review_text = row.get("review") or row.get("Review") or ""
-            review_text = review_text.strip()
+            review_text = (row.get(review_key) or "").strip()
             if review_text:
-                reviews.append(review_text)
-
-        if not reviews:
-            raise HTTPException(status_code=400, detail="No valid reviews found in the file.")
-
-        return reviews
+                yield review_text
 
+    except HTTPException:
+        raise
     except UnicodeDecodeError:
         raise HTTPException(status_code=400, detail="File must be UTF-8 encoded.")
     except Exception as e:
@@ -0,0 +1,402 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Dict, List, Optional
+
+from app.bulk_pipeline import is_failed_row, iter_bulk_results
+from app.dataset_store import iter_incremental_results
+from app.extractive_summarizer import build_digest
+from app.file_upload import iter_csv_reviews
+from app.metrics import JOB_TRACE_ENABLED, JobTrace, register_callback, tracing
+from app.result_store import ResultWriter, csv_path, trace_path
+from app.sqlite_store import SQLiteStore
+from app.work_queue import WORKER_MODE, work_queue
+
+# ⚙️ Job settings (override via environment)
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join("jobs", "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # jobs processed at the same time
+JOB_CANCEL_POLL_SECONDS = float(os.getenv("JOB_CANCEL_POLL_SECONDS", "1"))  # how often worker processes check for cancellation
+
+# 🧾 Job states
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+
+
+class JobStore(SQLiteStore):
+    """
+    SQLite-backed store for job metadata and finished rows.
+    Rows are written as soon as they finish, so a restart keeps them.
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH):
+        super().__init__(db_path)
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT,
+                input_path TEXT,
+                output_path TEXT,
+                status TEXT,
+                total INTEGER DEFAULT 0,
+                done INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                error TEXT,
+                dataset TEXT,
+                near_duplicates TEXT
+            )
+        """)
+        # ✅ Databases created before these columns existed
+        for column in ("dataset", "near_duplicates"):
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+            except sqlite3.OperationalError:
+                pass
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT,
+                row_index INTEGER,
+                failed INTEGER,
+                data TEXT,
+                PRIMARY KEY (job_id, row_index)
+            )
+        """)
+
+    def create(self, job_id: str, filename: str, input_path: str, total: Optional[int], dataset: Optional[str] = None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, filename, input_path, status, total, created_at, dataset) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, filename, input_path, QUEUED, total, time.time(), dataset)
+            )
+
+    def update(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def mark_running(self, job_id: str) -> bool:
+        """
+        Moves a queued (or interrupted running) job to RUNNING. Returns False
+        if the job was cancelled or finished meanwhile, so it must not run.
+        """
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ? AND status IN (?, ?)",
+                (RUNNING, time.time(), job_id, QUEUED, RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS jobs FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["jobs"] for row in rows}
+
+    def list_unfinished(self) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_result(self, job_id: str, row_index: int, row: dict):
+        failed = is_failed_row(row)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_results (job_id, row_index, failed, data) VALUES (?, ?, ?, ?)",
+                (job_id, row_index, int(failed), json.dumps(row, ensure_ascii=False))
+            )
+            conn.execute(
+                f"UPDATE jobs SET {'failed = failed' if failed else 'done = done'} + 1 WHERE id = ?",
+                (job_id,)
+            )
+
+    def finished_indexes(self, job_id: str) -> set:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT row_index FROM job_results WHERE job_id = ?", (job_id,)).fetchall()
+        return {row["row_index"] for row in rows}
+
+    def get_results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM job_results WHERE job_id = ? ORDER BY row_index LIMIT ? OFFSET ?",
+                (job_id, limit, offset)
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def iter_results(self, job_id: str):
+        for _, row in self.iter_indexed_results(job_id):
+            yield row
+
+    def iter_indexed_results(self, job_id: str):
+        with self._connect() as conn:
+            cursor = conn.execute("SELECT row_index, data FROM job_results WHERE job_id = ? ORDER BY row_index", (job_id,))
+            for row in cursor:
+                yield row["row_index"], json.loads(row["data"])
+
+
+store = JobStore()
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_cancel_events: Dict[str, threading.Event] = {}
+_running_stats: Dict[str, dict] = {}  # job id -> live pipeline stats of running jobs
+
+register_callback("review_jobs", "gauge", "Background jobs by status.",
+                  lambda: {(status,): count for status, count in store.count_by_status().items()}, ("status",))
+
+
+def submit_job(filename: str, input_path: str, dataset: Optional[str] = None, trace: Optional[bool] = None) -> str:
+    """
+    Registers a new job for a saved CSV upload and queues it for processing.
+    Returns the job id immediately; rows are streamed from disk by the worker.
+    With a 'dataset', rows already processed for that dataset are reused.
+    With 'trace', every stage call of the job is written to its trace file.
+    """
+    job_id = uuid.uuid4().hex
+    store.create(job_id, filename, input_path, total=None, dataset=dataset)
+    _schedule(job_id, input_path, trace=trace)
+    print(f"📥 Job {job_id} queued for {filename}")
+    return job_id
+
+
+def _schedule(job_id: str, input_path: str, skip: Optional[set] = None, trace: Optional[bool] = None) -> bool:
+    trace = JOB_TRACE_ENABLED if trace is None else trace
+    if WORKER_MODE == "queue":
+        # 📮 A worker process picks it up and skips the rows that already finished
+        return work_queue.put_job(job_id, trace)
+    _cancel_events[job_id] = threading.Event()
+    _executor.submit(_run_job, job_id, input_path, skip or set(), trace)
+    return True
+
+
+def _count_reviews(job_id: str, input_path: str):
+    """
+    Counts rows in a separate pass so progress and ETA can be reported
+    without holding up the first summaries.
+    """
+    try:
+        store.update(job_id, total=sum(1 for _ in iter_csv_reviews(input_path)))
+    except ValueError:
+        pass  # ❌ Parse errors are reported by the job itself
+
+
+def _run_job(job_id: str, input_path: str, skip: set, trace: bool = False):
+    """
+    Worker entry point: processes all pending rows of a job in its own event loop.
+    """
+    cancel_event = _cancel_events[job_id]
+    if cancel_event.is_set():
+        # 🛑 Cancelled while queued: nothing ran, so only the bookkeeping is left
+        _cancel_events.pop(job_id, None)
+        store.update(job_id, status=CANCELLED, finished_at=time.time())
+        print(f"🛑 Job {job_id} cancelled before it started")
+        return
+
+    # ❌ A cancel that landed between queueing and now must win over the RUNNING write
+    if not store.mark_running(job_id):
+        _cancel_events.pop(job_id, None)
+        print(f"🛑 Job {job_id} was cancelled before it started")
+        return
+
+    job = store.get(job_id)
+    if job["total"] is None:
+        threading.Thread(target=_count_reviews, args=(job_id, input_path), daemon=True).start()
+
+    # ✅ Results are written incrementally (CSV + Parquet); a resumed job rebuilds them first
+    writer = ResultWriter(job_id, store.iter_indexed_results(job_id) if skip else None)
+    store.update(job_id, output_path=csv_path(job_id))
+    job_trace = JobTrace(trace_path(job_id)) if trace else None
+    stats = _running_stats[job_id] = {}
+
+    try:
+        # ✅ The writer is flushed and closed (also on failure) before the final status is written
+        with tracing(job_trace), closing(writer):
+            asyncio.run(_process_rows(job_id, input_path, skip, cancel_event, job["dataset"], writer, stats))
+
+        if cancel_event.is_set():
+            store.update(job_id, status=CANCELLED, finished_at=time.time())
+            print(f"🛑 Job {job_id} cancelled")
+            return
+
+        store.update(job_id, status=COMPLETED, finished_at=time.time())
+        print(f"✅ Job {job_id} complete. Output saved to: {csv_path(job_id)}")
+
+    except Exception as e:
+        print(f"❌ Job {job_id} failed:", str(e))
+        store.update(job_id, status=FAILED, finished_at=time.time(), error=str(e))
+
+    finally:
+        if "near_duplicates" in stats:
+            store.update(job_id, near_duplicates=json.dumps(stats["near_duplicates"]))
+        _running_stats.pop(job_id, None)
+        _cancel_events.pop(job_id, None)
+
+
+async def _process_rows(job_id: str, input_path: str, skip: set, cancel_event: threading.Event,
+                        dataset: Optional[str] = None, writer: Optional[ResultWriter] = None,
+                        stats: Optional[dict] = None):
+    indexes = deque()  # row index of every entry handed to the pipeline, in order
+
+    def pending_entries():
+        for index, entry in enumerate(iter_csv_reviews(input_path)):
+            if index not in skip:
+                indexes.append(index)
+                yield {**entry, "row_index": index}  # ✅ Finished rows are skipped on resume
+
+    if dataset:
+        results = iter_incremental_results(dataset, pending_entries(), stats)
+    else:
+        results = iter_bulk_results(pending_entries(), stats)
+
+    try:
+        async for row in results:
+            index = indexes.popleft()
+            store.add_result(job_id, index, row)
+            if writer:
+                writer.write(row, index)
+            if cancel_event.is_set():
+                break
+    finally:
+        await results.aclose()
+
+
+def run_queued_job(job_id: str, trace: bool = False):
+    """
+    Runs a job claimed from the work queue (worker processes). Cancellation
+    arrives through the job store, so it is polled while the job runs.
+    """
+    job = store.get(job_id)
+    if not job:
+        return
+    if not os.path.exists(job["input_path"]):
+        print(f"❌ Could not run job {job_id}: upload is missing")
+        store.update(job_id, status=FAILED, finished_at=time.time(), error="Upload file is missing.")
+        return
+
+    cancel_event = _cancel_events[job_id] = threading.Event()
+    finished = threading.Event()
+
+    def watch_cancellation():
+        while True:
+            current = store.get(job_id)
+            if current is None or current["status"] == CANCELLED:
+                cancel_event.set()
+                return
+            if finished.wait(JOB_CANCEL_POLL_SECONDS):
+                return
+
+    threading.Thread(target=watch_cancellation, name=f"job-{job_id}-cancel", daemon=True).start()
+    try:
+        _run_job(job_id, job["input_path"], store.finished_indexes(job_id), trace)
+    finally:
+        finished.set()
+        _cancel_events.pop(job_id, None)
+
+
+async def wait_for_job(job_id: str, poll_seconds: float = 0.2) -> dict:
+    """
+    Waits until a job leaves the queued/running states and returns its status.
+    """
+    while True:
+        status = get_job_status(job_id)
+        if status["status"] not in (QUEUED, RUNNING):
+            return status
+        await asyncio.sleep(poll_seconds)
+
+
+def get_job_status(job_id: str) -> Optional[dict]:
+    """
+    Returns job progress including throughput (rows/sec) and ETA (seconds).
+    """
+    job = store.get(job_id)
+    if not job:
+        return None
+
+    processed = job["done"] + job["failed"]
+    throughput, eta = None, None
+    if job["started_at"]:
+        elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+        if elapsed > 0 and processed:
+            throughput = round(processed / elapsed, 2)
+            if job["status"] in (QUEUED, RUNNING) and job["total"] is not None:
+                eta = round((job["total"] - processed) / throughput, 1)
+
+    near_duplicates = _running_stats.get(job_id, {}).get("near_duplicates")
+    if near_duplicates is None and job["near_duplicates"]:
+        near_duplicates = json.loads(job["near_duplicates"])
+
+    return {
+        "job_id": job["id"],
+        "filename": job["filename"],
+        "dataset": job["dataset"],
+        "status": job["status"],
+        "total": job["total"],
+        "done": job["done"],
+        "failed": job["failed"],
+        "progress": round(processed / job["total"], 4) if job["total"] else None,
+        "throughput_rows_per_sec": throughput,
+        "eta_seconds": eta,
+        "near_duplicates": near_duplicates,
+        "output_path": job["output_path"],
+        "error": job["error"]
+    }
+
+
+def get_job_results(job_id: str, offset: int = 0, limit: int = 100) -> List[dict]:
+    """
+    Returns a page of finished rows in input order (available while the job runs).
+    """
+    return store.get_results(job_id, offset, limit)
+
+
+def get_job_digest(job_id: str) -> Optional[dict]:
+    """
+    Extractive "what customers are saying" digest of the job's input (no LLM calls).
+    """
+    job = store.get(job_id)
+    if not job:
+        return None
+    return build_digest(entry["review"] for entry in iter_csv_reviews(job["input_path"]))
+
+
+def cancel_job(job_id: str) -> bool:
+    """
+    Requests cancellation of a queued or running job. Finished rows are kept.
+    """
+    job = store.get(job_id)
+    if not job or job["status"] not in (QUEUED, RUNNING):
+        return False
+
+    event = _cancel_events.get(job_id)
+    if event:
+        event.set()
+    store.update(job_id, status=CANCELLED, finished_at=time.time())
+    return True
+
+
+def resume_unfinished_jobs():
+    """
+    Re-queues jobs interrupted by a restart, skipping rows that already finished.
+    In queue mode, jobs that still have a task are left to the workers.
+    """
+    for job in store.list_unfinished():
+        if not os.path.exists(job["input_path"]):
+            print(f"❌ Could not resume job {job['id']}: upload is missing")
+            store.update(job["id"], status=FAILED, finished_at=time.time(), error="Upload file is missing.")
+            continue
+
+        skip = store.finished_indexes(job["id"])
+        if _schedule(job["id"], job["input_path"], skip):
+            print(f"🔁 Resuming job {job['id']} ({len(skip)} rows already done)")
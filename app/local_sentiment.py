@@ -0,0 +1,81 @@
+import re
+from typing import List
+
+from app.metrics import instrumented
+
+# ✅ Small offline lexicon tuned for hospitality / product reviews
+POSITIVE_WORDS = {
+    "excellent": 3, "amazing": 3, "perfect": 3, "fantastic": 3, "outstanding": 3, "superb": 3,
+    "wonderful": 3, "loved": 3, "love": 2, "great": 2, "awesome": 3, "spotless": 2, "delicious": 2,
+    "friendly": 2, "helpful": 2, "clean": 1, "comfortable": 2, "good": 1, "nice": 1, "smooth": 1,
+    "convenient": 1, "recommend": 2, "pleasant": 2, "beautiful": 2, "enjoyed": 2, "happy": 2,
+    "quick": 1, "fast": 1, "polite": 2, "cozy": 2, "best": 3, "top-notch": 3, "impressed": 2,
+    "welcoming": 2, "efficient": 2, "decent": 1, "quiet": 1, "working": 1, "worked": 1
+}
+NEGATIVE_WORDS = {
+    "terrible": -3, "horrible": -3, "awful": -3, "worst": -3, "disgusting": -3, "unacceptable": -3,
+    "rude": -2, "dirty": -2, "bad": -2, "poor": -2, "disappointed": -2, "disappointing": -2,
+    "broken": -2, "slow": -1, "noisy": -1, "smelly": -2, "musty": -2, "odor": -2, "unhelpful": -2,
+    "disinterested": -1, "uncomfortable": -2, "never": -1, "flickered": -1, "cold": -1, "late": -1,
+    "overpriced": -2, "expensive": -1, "hate": -3, "problem": -1, "issue": -1, "unhappy": -2,
+    "weird": -1, "stained": -2, "leaking": -2, "complaint": -1, "mediocre": -1,
+    "missing": -1, "unhygienic": -2, "cramped": -1, "outdated": -1
+}
+LEXICON = {**POSITIVE_WORDS, **NEGATIVE_WORDS}
+NEGATIONS = {"not", "no", "never", "n't", "hardly", "without", "didn't", "wasn't", "isn't", "don't", "won't", "couldn't"}
+INTENSIFIERS = {"very": 1.5, "really": 1.5, "extremely": 2.0, "so": 1.3, "super": 1.5, "absolutely": 1.8, "quite": 1.2}
+
+NEUTRAL_THRESHOLD = 0.5  # |score| below this is 'neutral'
+_TOKEN_RE = re.compile(r"[a-z]+(?:-[a-z]+)*(?:'[a-z]+)?|[!]")  # ✅ "don't" stays one token
+
+
+def score_text(text: str) -> float:
+    """
+    Returns a sentiment score: > 0 positive, < 0 negative.
+    Handles simple negation ("not clean"), intensifiers ("very rude")
+    and contrast ("..., but ...": the clause after 'but' counts more).
+    """
+    tokens = _TOKEN_RE.findall(text.lower().replace("\u2019", "'"))
+    score = 0.0
+    weight = 1.0
+
+    for i, token in enumerate(tokens):
+        if token == "but":
+            score *= 0.5   # ✅ What follows 'but' usually carries the verdict
+            weight = 1.5
+            continue
+
+        value = LEXICON.get(token)
+        if value is None:
+            continue
+
+        window = tokens[max(0, i - 3):i]
+        if any(w in NEGATIONS or w.endswith("n't") for w in window):
+            value = -value * 0.75
+        for w in window[-1:]:
+            value *= INTENSIFIERS.get(w, 1.0)
+        score += value * weight
+
+    if "!" in tokens and score:
+        score *= 1.2
+    return score
+
+
+def label_from_score(score: float) -> str:
+    if score >= NEUTRAL_THRESHOLD:
+        return "positive"
+    if score <= -NEUTRAL_THRESHOLD:
+        return "negative"
+    return "neutral"
+
+
+@instrumented("sentiment_local")
+def analyze_sentiment_local(text: str) -> str:
+    """
+    Offline sentiment: returns 'positive', 'neutral' or 'negative'.
+    """
+    return label_from_score(score_text(text))
+
+
+def analyze_sentiment_local_batch(texts: List[str]) -> List[str]:
+    return [analyze_sentiment_local(text) for text in texts]
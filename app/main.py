@@ -1,17 +1,33 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 
-import csv
+import json
 import os
+import uuid
 from datetime import date
+from typing import Literal, Optional
 
-from app.file_upload import save_and_parse_csv  # ✅ Returns list of dicts with review + date
+from app.file_upload import iter_csv_reviews, remove_upload, save_upload, validate_csv  # ✅ Streams {review, date} dicts from disk
 from app.input_handler import validate_single_review
-from app.ibm_sentiment import analyze_sentiment_ibm
-from app.summarizer import summarize_review  # ✅ Uses Granite + fallback
+from app.summarizer import SUMMARY_ENGINE  # ✅ Uses Granite + fallback
+from app.sentiment import sentiment_engine
+from app.model_registry import model_status, warm_up_in_background
+from app.bulk_pipeline import iter_bulk_results, pipeline_stats, process_reviews, stream_review  # ✅ Concurrent sentiment + summarization
+from app.output_writer import OUTPUT_DIR, write_summaries_csv
+from app.dataset_store import dataset_name, dataset_store, iter_incremental_results
+from app import result_store
+from app.router import router_stats
+from app.extractive_summarizer import build_digest, summarize_extractive
+from app.result_cache import result_cache
+from app.batch_scheduler import MicroBatchScheduler, QueueFullError
+from app import job_manager
+from app.metrics import register_callback, render_metrics, summarize_trace
+from app.work_queue import WORKER_MODE, process_reviews_on_workers
+from app.output_parser import parse_summary
 
 # ✅ Initialize FastAPI app
 app = FastAPI()
@@ -27,87 +43,406 @@ app.add_middleware(
 
 # ✅ Mount static and output folders
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/output", StaticFiles(directory="output"), name="output")
+app.mount("/output", StaticFiles(directory=OUTPUT_DIR), name="output")
 
 # ✅ Set up Jinja2 Templates for frontend rendering
 templates = Jinja2Templates(directory="templates")
 
+# ✅ Resume background jobs interrupted by a restart
+@app.on_event("startup")
+def resume_jobs():
+    job_manager.resume_unfinished_jobs()
+
+
+# ✅ Groups concurrent /summarize requests into batches (run by worker processes in queue mode)
+summarize_scheduler = MicroBatchScheduler(process_reviews_on_workers if WORKER_MODE == "queue" else process_reviews)
+register_callback("review_scheduler_queue_depth", "gauge", "Single-review requests waiting for a batch.",
+                  lambda: {(): summarize_scheduler.queue_depth})
+register_callback("review_scheduler_events_total", "counter", "Micro-batch scheduler requests, batches and rejections.",
+                  lambda: {(name,): count for name, count in summarize_scheduler.stats.items()}, ("event",))
+
+
+@app.on_event("startup")
+def start_scheduler():
+    summarize_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    await summarize_scheduler.stop()
+
+
+# ✅ Load Granite in the background so the server accepts traffic right away (workers own it in queue mode)
+@app.on_event("startup")
+def warm_up_models():
+    if SUMMARY_ENGINE == "granite" and WORKER_MODE != "queue":
+        warm_up_in_background(["granite"])
+
+
+# 📊 Prometheus scrape endpoint: stage latencies, errors, fallbacks, cache hits, queue depth
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+# ✅ Health check with model load state and load time
+@app.get("/health")
+def health():
+    return {"status": "ok", "summary_engine": SUMMARY_ENGINE, "sentiment_engine": sentiment_engine(),
+            "worker_mode": WORKER_MODE, "models": model_status()}
+
+
 # ✅ Home route
 @app.get("/", response_class=HTMLResponse)
 def serve_index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
-# ✅ Single review summarization
+# ✅ Single review summarization (micro-batched with concurrent requests)
 @app.post("/summarize")
-def summarize_text(review: str = Form(...)):
+async def summarize_text(review: str = Form(...)):
     try:
         cleaned = validate_single_review(review)
-        sentiment = analyze_sentiment_ibm(cleaned)
-        granite_result = summarize_review(cleaned)
+        result = await summarize_scheduler.submit({"review": cleaned, "date": ""})
+
+        if "error" in result:
+            raise RuntimeError(result["error"])
 
         return {
             "original_review": cleaned,
-            "summary": granite_result["summary"],
-            "predicted_rating": granite_result["predicted_rating"],
-            "sentiment": sentiment,
-            "rating_stars": "⭐" * int(round(granite_result["predicted_rating"]))
+            "summary": result["summary"],
+            "predicted_rating": result["predicted_rating"],
+            "sentiment": result["sentiment"],
+            "rating_stars": result["rating_stars"]
         }
 
+    except QueueFullError:
+        raise HTTPException(status_code=429, detail="Too many pending requests. Please retry shortly.")
+
     except Exception as e:
         print("❌ Error in /summarize:", str(e))
         raise HTTPException(status_code=500, detail="Summarization failed.")
 
 
+# ✅ Single review summarization streamed as NDJSON events
+@app.post("/summarize/stream")
+async def summarize_text_stream(review: str = Form(...)):
+    cleaned = validate_single_review(review)
+
+    async def events():
+        if WORKER_MODE == "queue" and SUMMARY_ENGINE != "ollama":
+            # ✅ The model lives in the worker processes: the whole result arrives as one event
+            result = await summarize_scheduler.submit({"review": cleaned, "date": ""})
+            result.pop("date", None)
+            yield json.dumps({"type": "result", **result}, ensure_ascii=False) + "\n"
+            return
+        async for event in stream_review(cleaned):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+# ✅ Instant CPU-only summary (no LLM)
+@app.post("/summarize/extractive")
+def summarize_text_extractive(review: str = Form(...)):
+    cleaned = validate_single_review(review)
+    return {
+        "original_review": cleaned,
+        "summary": summarize_extractive(cleaned),
+        "engine_used": "extractive"
+    }
+
+
+# ✅ Micro-batch scheduler and routing counters
+@app.get("/summarize/stats")
+def summarize_stats():
+    return {**summarize_scheduler.stats, "queue_depth": summarize_scheduler.queue_depth,
+            "pending": summarize_scheduler.pending, "routes": dict(router_stats),
+            "output_parsing": parse_summary()}
+
+
 # ✅ Bulk summarization from uploaded CSV
 @app.post("/upload/summarize_all")
-async def summarize_all_reviews(file: UploadFile = File(...)):
+async def summarize_all_reviews(file: UploadFile = File(...), dataset: str = Form(None),
+                                incremental: bool = Form(False), include_data: bool = Form(True)):
+    file_location = None
     try:
         print(f"📁 File received: {file.filename}")
-        parsed_reviews = save_and_parse_csv(file)  # List of dicts with 'review' and 'date'
-
-        if not parsed_reviews:
-            raise ValueError("No valid reviews found in the uploaded file.")
-
-        result = []
-        for i, entry in enumerate(parsed_reviews, start=1):
-            review = entry["review"]
-            review_date = entry.get("date")
-
-            # ✅ Fallback to today's date if missing
-            if not review_date or review_date.strip() == "":
-                review_date = str(date.today())
-
-            print(f"🔍 Processing review {i}/{len(parsed_reviews)}")
-            sentiment = analyze_sentiment_ibm(review)
-            granite_result = summarize_review(review)
-
-            result.append({
-                "original_review": review,
-                "summary": granite_result["summary"],
-                "predicted_rating": granite_result["predicted_rating"],
-                "rating_stars": "⭐" * int(round(granite_result["predicted_rating"])),
-                "sentiment": sentiment,
-                "date": review_date  # ✅ key renamed to 'date'
-            })
-
-        # ✅ Save to output CSV
-        os.makedirs("output", exist_ok=True)
-        output_path = os.path.join("output", "summaries.csv")
-
-        with open(output_path, "w", newline='', encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=["original_review", "summary", "predicted_rating", "rating_stars", "sentiment", "date"])
-            writer.writeheader()
-            writer.writerows(result)
+        if WORKER_MODE == "queue":
+            dataset_id = dataset_name(dataset or file.filename) if (dataset or incremental) else None
+            return await _summarize_all_on_workers(file, dataset_id, include_data)
 
+        # ✅ Copy to disk off the event loop, then stream rows into the pipeline
+        file_location = await run_in_threadpool(save_upload, file)
+        parsed_reviews = iter_csv_reviews(file_location)  # Lazy dicts with 'review' and 'date'
+
+        stats, dataset_id = {}, None
+        if dataset or incremental:
+            # 🔁 Incremental: only new or changed rows are processed, then merged into the dataset
+            dataset_id = dataset_name(dataset or file.filename)
+            rows = iter_incremental_results(dataset_id, parsed_reviews, stats)
+        else:
+            rows = iter_bulk_results(parsed_reviews, stats)
+
+        # ✅ Each upload gets its own result files, written as rows finish
+        result_id = uuid.uuid4().hex
+        writer = await run_in_threadpool(result_store.ResultWriter, result_id)
+        result, pending_writes = [], []
+        try:
+            async for row in rows:
+                # ✅ Writes can hit the disk, so they run in a thread, a batch at a time
+                pending_writes.append(row)
+                if len(pending_writes) >= result_store.RESULT_WRITE_BATCH:
+                    await run_in_threadpool(writer.write_many, pending_writes)
+                    pending_writes = []
+                if include_data:
+                    result.append(row)
+            await run_in_threadpool(writer.write_many, pending_writes)
+        finally:
+            await run_in_threadpool(writer.close)
+
+        output_path = result_store.csv_path(result_id)
         print(f"✅ Summarization complete. Output saved to: {output_path}")
 
-        return {
+        response = {
             "status": "success",
-            "total_reviews": len(result),
+            "total_reviews": writer.rows,
+            "result_id": result_id,
+            "output_path": output_path,
+            "downloads": {fmt: f"/results/{result_id}/download?format={fmt}" for fmt in ("csv", "parquet")},
+            "trends": writer.trends.series("auto"),
+            "near_duplicates": stats.pop("near_duplicates", None),
             "data": result
         }
 
+        if dataset_id:
+            stats["output_path"] = await run_in_threadpool(
+                write_summaries_csv, dataset_store.iter_results(dataset_id),
+                os.path.join(OUTPUT_DIR, "datasets", f"{dataset_id}_summaries.csv")
+            )
+            print(f"✅ Incremental run for '{dataset_id}': {stats['processed']} processed, {stats['reused']} reused")
+            response["incremental"] = stats
+
+        return response
+
     except Exception as e:
         print("❌ Error in /upload/summarize_all:", str(e))
         raise HTTPException(status_code=500, detail=f"Batch summarization failed: {str(e)}")
+
+    finally:
+        # ✅ The rows are streamed from the upload, so it is removed only once the run is over
+        if file_location:
+            await run_in_threadpool(remove_upload, file_location)
+
+
+async def _summarize_all_on_workers(file: UploadFile, dataset_id: Optional[str], include_data: bool) -> dict:
+    """
+    WORKER_MODE=queue: the upload runs as a job on the worker processes and
+    the usual response is built from the job's stored results.
+    """
+    file_location = await run_in_threadpool(save_upload, file)
+    job_id = job_manager.submit_job(file.filename, file_location, dataset=dataset_id)
+    status = await job_manager.wait_for_job(job_id)
+    if status["status"] != job_manager.COMPLETED:
+        raise RuntimeError(status["error"] or f"Job {job_id} was {status['status']}.")
+
+    print(f"✅ Summarization complete. Output saved to: {status['output_path']}")
+    response = {
+        "status": "success",
+        "total_reviews": status["done"] + status["failed"],
+        "result_id": job_id,
+        "output_path": status["output_path"],
+        "downloads": {fmt: f"/results/{job_id}/download?format={fmt}" for fmt in ("csv", "parquet")},
+        "trends": await run_in_threadpool(result_store.read_trends, job_id, "auto"),
+        "near_duplicates": status["near_duplicates"],
+        "data": await run_in_threadpool(lambda: list(job_manager.store.iter_results(job_id))) if include_data else []
+    }
+
+    if dataset_id:
+        output_path = await run_in_threadpool(
+            write_summaries_csv, dataset_store.iter_results(dataset_id),
+            os.path.join(OUTPUT_DIR, "datasets", f"{dataset_id}_summaries.csv")
+        )
+        response["incremental"] = {"dataset": dataset_id, "output_path": output_path}
+
+    return response
+
+
+# ✅ Themes across a whole CSV, without one LLM call per review
+@app.post("/upload/digest")
+async def digest_reviews(file: UploadFile = File(...)):
+    file_location = await run_in_threadpool(save_upload, file)
+    try:
+        parsed_reviews = iter_csv_reviews(file_location)
+        return await run_in_threadpool(build_digest, (entry["review"] for entry in parsed_reviews))
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    finally:
+        await run_in_threadpool(remove_upload, file_location)
+
+
+# ✅ Background job for large CSV uploads — returns a job id immediately
+@app.post("/jobs")
+async def create_job(file: UploadFile = File(...), dataset: str = Form(None), incremental: bool = Form(False),
+                     trace: bool = Form(None)):
+    try:
+        print(f"📁 File received for job: {file.filename}")
+        file_location = await run_in_threadpool(save_upload, file)
+        validate_csv(file_location)  # ✅ Reject bad files before queueing
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    dataset_id = dataset_name(dataset or file.filename) if (dataset or incremental) else None
+    job_id = job_manager.submit_job(file.filename, file_location, dataset=dataset_id, trace=trace)
+    return {"status": "queued", "job_id": job_id}
+
+
+# 🧾 Per-stage timing of a traced job (submitted with trace=true or JOB_TRACE_ENABLED=1)
+@app.get("/jobs/{job_id}/trace")
+def get_job_trace(job_id: str):
+    if not job_manager.get_job_status(job_id):
+        raise HTTPException(status_code=404, detail="Job not found.")
+    path = result_store.trace_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No trace was recorded for this job.")
+    return {"job_id": job_id, "trace_path": path, "stages": summarize_trace(path)}
+
+
+# ✅ Job progress: rows done/failed, throughput and ETA
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    status = job_manager.get_job_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return status
+
+
+def result_filters(sentiment: Optional[str] = Query(None),
+                   min_rating: Optional[float] = Query(None, ge=0, le=5),
+                   max_rating: Optional[float] = Query(None, ge=0, le=5),
+                   date_from: Optional[date] = Query(None),
+                   date_to: Optional[date] = Query(None)) -> dict:
+    filters = {"sentiment": sentiment, "min_rating": min_rating, "max_rating": max_rating,
+               "date_from": date_from, "date_to": date_to}
+    return {name: value for name, value in filters.items() if value is not None}
+
+
+# ✅ Partial or final results, one page at a time (filtered reads use the columnar store)
+@app.get("/jobs/{job_id}/results")
+def get_job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+                    filters: dict = Depends(result_filters)):
+    if not job_manager.get_job_status(job_id):
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if filters:
+        data = result_store.read_results(job_id, offset, limit, **filters)
+    else:
+        data = job_manager.get_job_results(job_id, offset, limit)
+    return {"job_id": job_id, "offset": offset, "limit": limit, "filters": filters, "data": data}
+
+
+# ✅ Job output as CSV or Parquet, once the job has finished
+@app.get("/jobs/{job_id}/download")
+def download_job_results(job_id: str, format: Literal["csv", "parquet"] = "csv",
+                         filters: dict = Depends(result_filters)):
+    if not job_manager.get_job_status(job_id):
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return download_results(job_id, format, filters)
+
+
+# 📈 Sentiment, rating and volume per period (kept up to date while the job runs)
+@app.get("/jobs/{job_id}/trends")
+def get_job_trends(job_id: str, granularity: Literal["day", "week", "month", "auto"] = "day",
+                   date_from: Optional[date] = Query(None), date_to: Optional[date] = Query(None)):
+    if not job_manager.get_job_status(job_id):
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if not result_store.result_exists(job_id):
+        return {"job_id": job_id, "granularity": granularity, "total": 0, "undated": 0, "buckets": []}
+    return {"job_id": job_id, **result_store.read_trends(job_id, granularity, date_from, date_to)}
+
+
+# ✅ Filtered, paginated reads of an upload's or a job's results
+@app.get("/results/{result_id}")
+def get_results(result_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+                filters: dict = Depends(result_filters)):
+    if not result_store.result_exists(result_id):
+        raise HTTPException(status_code=404, detail="Results not found.")
+    return {
+        "result_id": result_id,
+        "offset": offset,
+        "limit": limit,
+        "filters": filters,
+        "data": result_store.read_results(result_id, offset, limit, **filters)
+    }
+
+
+# 📈 Trend series for an upload's results
+@app.get("/results/{result_id}/trends")
+def get_result_trends(result_id: str, granularity: Literal["day", "week", "month", "auto"] = "day",
+                      date_from: Optional[date] = Query(None), date_to: Optional[date] = Query(None)):
+    if not result_store.result_exists(result_id):
+        raise HTTPException(status_code=404, detail="Results not found.")
+    return {"result_id": result_id, **result_store.read_trends(result_id, granularity, date_from, date_to)}
+
+
+# ✅ Streamed downloads (whole files as-is, filtered exports batch by batch)
+@app.get("/results/{result_id}/download")
+def download_results(result_id: str, format: Literal["csv", "parquet"] = "csv",
+                     filters: dict = Depends(result_filters)):
+    if not result_store.result_exists(result_id):
+        raise HTTPException(status_code=404, detail="Results not found.")
+    if not result_store.is_complete(result_id):
+        raise HTTPException(status_code=409, detail="Results are still being written.")
+
+    filename = f"{result_id}_summaries.{format}"
+    if format == "csv":
+        if not filters:
+            return FileResponse(result_store.csv_path(result_id), media_type="text/csv", filename=filename)
+        stream, media_type = result_store.stream_csv(result_id, **filters), "text/csv"
+    else:
+        if not os.path.exists(result_store.parquet_path(result_id)):
+            raise HTTPException(status_code=404, detail="Parquet output is not available (pyarrow not installed).")
+        if not filters:
+            return FileResponse(result_store.parquet_path(result_id), media_type="application/octet-stream",
+                                filename=filename)
+        stream, media_type = result_store.stream_parquet(result_id, **filters), "application/octet-stream"
+
+    return StreamingResponse(stream, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+# ✅ Extractive digest of a job's reviews
+@app.get("/jobs/{job_id}/digest")
+async def get_job_digest(job_id: str):
+    digest = await run_in_threadpool(job_manager.get_job_digest, job_id)
+    if digest is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return digest
+
+
+# ✅ Cancel a queued or running job (finished rows are kept)
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    if not job_manager.get_job_status(job_id):
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if not job_manager.cancel_job(job_id):
+        raise HTTPException(status_code=409, detail="Job already finished.")
+    return {"status": "cancelled", "job_id": job_id}
+
+
+# ✅ Rows stored for an incrementally processed dataset
+@app.get("/datasets/{dataset_id}")
+def get_dataset(dataset_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    stats = dataset_store.stats(dataset_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Dataset not found.")
+    return {**stats, "offset": offset, "limit": limit, "data": dataset_store.get_results(dataset_id, offset, limit)}
+
+
+# ✅ Result cache hit/miss counters
+@app.get("/cache/stats")
+def cache_stats():
+    stats = result_cache.stats() if result_cache is not None else {"enabled": False}
+    stats.update(pipeline_stats)
+    return stats
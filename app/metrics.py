@@ -0,0 +1,258 @@
+import bisect
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# ⚙️ Metrics settings (override via environment)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+JOB_TRACE_ENABLED = os.getenv("JOB_TRACE_ENABLED", "0") == "1"  # default for jobs submitted without 'trace'
+TRACE_FLUSH_EVENTS = 1000  # trace events buffered before they are appended to disk
+
+# Seconds; covers a cached lookup up to a slow multi-chunk LLM call
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_text(self.labels, key)} {value}" for key, value in sorted(values.items())]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {round(series[-1], 6)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    A counter or gauge read from existing state at scrape time
+    (stats dicts, queue sizes), so the hot path pays nothing for it.
+    """
+
+    def __init__(self, name: str, kind: str, help_text: str, read: Callable[[], Dict[Tuple[str, ...], float]],
+                 labels: Tuple[str, ...] = ()):
+        self.name, self.kind, self.help, self.read, self.labels = name, kind, help_text, read, labels
+
+    def render(self) -> List[str]:
+        try:
+            values = self.read()
+        except Exception as e:
+            print(f"⚠️ [Metrics] Could not read {self.name}:", str(e))
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{_label_text(self.labels, key)} {value}" for key, value in sorted(values.items())]
+        return lines
+
+
+_registry: Dict[str, object] = {}
+
+
+def _register(metric):
+    return _registry.setdefault(metric.name, metric)
+
+
+def register_callback(name: str, kind: str, help_text: str, read: Callable[[], Dict[Tuple[str, ...], float]],
+                      labels: Tuple[str, ...] = ()):
+    _registry[name] = CallbackMetric(name, kind, help_text, read, labels)
+
+
+def render_metrics() -> str:
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in _registry.values():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# 📊 Pipeline metrics
+stage_seconds = _register(Histogram("review_stage_seconds", "Time spent in each pipeline stage.", ("stage",)))
+stage_errors = _register(Counter("review_stage_errors_total", "Stage calls that raised or returned an error.", ("stage",)))
+fallbacks = _register(Counter("review_fallbacks_total", "Results served by a fallback path.", ("kind",)))
+rows_processed = _register(Counter("review_rows_total", "Bulk result rows produced, by outcome.", ("status",)))
+
+
+# 🧾 Per-job trace: stage spans recorded while a traced job runs
+class JobTrace:
+    """
+    Appends {stage, start, seconds, error} events (start relative to the
+    job's start) to a JSON-lines file in batches.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.perf_counter()
+        self._events: List[dict] = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        open(path, "w").close()
+
+    def record(self, stage: str, start: float, seconds: float, error: bool):
+        with self._lock:
+            self._events.append({"stage": stage, "start": round(start - self.started, 6),
+                                 "seconds": round(seconds, 6), "error": error})
+            flush = len(self._events) >= TRACE_FLUSH_EVENTS
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            events, self._events = self._events, []
+            if events:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(json.dumps(event) + "\n" for event in events)
+
+
+_current_trace: contextvars.ContextVar[Optional[JobTrace]] = contextvars.ContextVar("job_trace", default=None)
+
+
+@contextmanager
+def tracing(trace: Optional[JobTrace]):
+    """
+    Makes 'trace' the active trace for stages run from this context
+    (and from executor calls submitted with copy_context()).
+    """
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        if trace:
+            trace.flush()
+
+
+def summarize_trace(path: str) -> dict:
+    """
+    Per-stage totals of a trace file: calls, errors, total and p50/p95 seconds.
+    """
+    stages: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            event = json.loads(line)
+            stages.setdefault(event["stage"], []).append(event["seconds"])
+            errors[event["stage"]] = errors.get(event["stage"], 0) + int(event["error"])
+
+    summary = {}
+    for stage, durations in stages.items():
+        durations.sort()
+        summary[stage] = {
+            "calls": len(durations),
+            "errors": errors[stage],
+            "total_seconds": round(sum(durations), 4),
+            "p50": durations[len(durations) // 2],
+            "p95": durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        }
+    return summary
+
+
+def _failed(result) -> bool:
+    # ✅ Backends report most failures as values, not exceptions
+    return result == "error" or (isinstance(result, dict) and "error" in result)
+
+
+def _record(stage: str, start: float, error: bool):
+    seconds = time.perf_counter() - start
+    stage_seconds.observe(seconds, stage)
+    if error:
+        stage_errors.inc(stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(stage, start, seconds, error)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Times a block as 'stage'; exceptions count as errors.
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    start, error = time.perf_counter(), True
+    try:
+        yield
+        error = False
+    finally:
+        _record(stage, start, error)
+
+
+def instrumented(stage: str):
+    """
+    Decorator recording latency and errors of every call as 'stage'.
+    With METRICS_ENABLED=0 the function is returned unwrapped.
+    """
+    def decorate(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start, error = time.perf_counter(), True
+            try:
+                result = fn(*args, **kwargs)
+                error = _failed(result)
+                return result
+            finally:
+                _record(stage, start, error)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# ⚙️ Granite model settings (override via environment)
+GRANITE_MODEL_ID = os.getenv("GRANITE_MODEL_ID", "ibm-granite/granite-7b-base")
+GRANITE_LOCAL_DIR = os.getenv("GRANITE_LOCAL_DIR", "./models/granite7b-base")
+GRANITE_DTYPE = os.getenv("GRANITE_DTYPE", "")        # e.g. "bfloat16" halves CPU memory; "" keeps float32
+GRANITE_QUANTIZE = os.getenv("GRANITE_QUANTIZE", "")  # "int8" applies dynamic int8 quantization on CPU
+
+# 🧾 Load states
+NOT_LOADED, LOADING, READY, FAILED = "not_loaded", "loading", "ready", "failed"
+
+_loaders: Dict[str, Callable[[], Any]] = {}
+_models: Dict[str, Any] = {}
+_status: Dict[str, dict] = {}
+_lock = threading.Lock()
+_load_locks: Dict[str, threading.Lock] = {}
+
+
+def register_model(name: str, loader: Callable[[], Any]):
+    """
+    Registers a loader; nothing is loaded until the model is first requested.
+    """
+    with _lock:
+        _loaders[name] = loader
+        _load_locks.setdefault(name, threading.Lock())
+        _status.setdefault(name, {"state": NOT_LOADED, "load_seconds": None, "error": None})
+
+
+def get_model(name: str, wait: bool = True) -> Optional[Any]:
+    """
+    Returns the shared instance of a model, loading it on first use.
+    With wait=False a missing model starts loading in the background and
+    None is returned, so callers can fall back instead of blocking.
+    """
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    if not wait:
+        warm_up_in_background([name])
+        return None
+
+    with _load_locks[name]:
+        # ✅ Another thread may have finished loading while we waited
+        if name in _models:
+            return _models[name]
+        if _status[name]["state"] == FAILED:
+            raise RuntimeError(f"Model '{name}' failed to load: {_status[name]['error']}")
+
+        _status[name].update(state=LOADING, error=None)
+        print(f"📥 [Registry] Loading model '{name}'...")
+        start = time.perf_counter()
+        try:
+            _models[name] = _loaders[name]()
+        except Exception as e:
+            _status[name].update(state=FAILED, error=str(e))
+            print(f"❌ [Registry] Failed to load '{name}':", str(e))
+            raise
+
+        _status[name].update(state=READY, load_seconds=round(time.perf_counter() - start, 2))
+        print(f"✅ [Registry] '{name}' ready in {_status[name]['load_seconds']}s")
+        return _models[name]
+
+
+def loaded_model(name: str) -> Optional[Any]:
+    """
+    Returns the model only if it is already loaded; never starts a load.
+    """
+    return _models.get(name)
+
+
+def warm_up_in_background(names):
+    """
+    Loads models on a daemon thread so the server can accept traffic meanwhile.
+    """
+    with _lock:
+        names = [name for name in names if _status[name]["state"] == NOT_LOADED]
+        for name in names:
+            _status[name]["state"] = LOADING
+
+    def load():
+        for name in names:
+            try:
+                get_model(name)
+            except Exception:
+                pass  # ❌ Failure is recorded in the status
+
+    if names:
+        threading.Thread(target=load, name="model-warmup", daemon=True).start()
+
+
+def model_status() -> Dict[str, dict]:
+    with _lock:
+        return {name: dict(status) for name, status in _status.items()}
+
+
+def _load_granite():
+    """
+    Loads Granite once from a local snapshot. safetensors weights are
+    memory-mapped, so worker processes loading the same files share pages.
+    """
+    import torch
+    from huggingface_hub import snapshot_download
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    from app.granite_engine import GraniteEngine
+
+    model_path = GRANITE_LOCAL_DIR
+    if not os.path.exists(os.path.join(model_path, "config.json")):
+        print("📥 Checking model cache or downloading Granite shards...")
+        model_path = snapshot_download(repo_id=GRANITE_MODEL_ID, local_dir=GRANITE_LOCAL_DIR, max_workers=2)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForCausalLM.from_pretrained(
+        model_path,
+        torch_dtype=getattr(torch, GRANITE_DTYPE) if GRANITE_DTYPE else None,
+        low_cpu_mem_usage=True
+    )
+
+    if GRANITE_QUANTIZE == "int8":
+        # ✅ Dynamic int8 quantization of Linear layers (CPU only)
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return GraniteEngine(model, tokenizer)
+
+
+register_model("granite", _load_granite)
+
+
+def get_granite_engine(wait: bool = True):
+    return get_model("granite", wait=wait)
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import zlib
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.extractive_summarizer import _content_words
+from app.local_sentiment import LEXICON
+from app.metrics import register_callback
+from app.utils import clean_text
+
+# ⚙️ Near-duplicate settings (override via environment)
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "1") == "1"
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))       # estimated Jaccard similarity of word sets
+NEAR_DUP_PERMUTATIONS = int(os.getenv("NEAR_DUP_PERMUTATIONS", "64"))    # MinHash signature length
+NEAR_DUP_BANDS = int(os.getenv("NEAR_DUP_BANDS", "16"))                  # LSH bands (must divide the permutations)
+NEAR_DUP_MIN_TOKENS = int(os.getenv("NEAR_DUP_MIN_TOKENS", "3"))         # shorter reviews are never clustered
+NEAR_DUP_MAX_REPRESENTATIVES = int(os.getenv("NEAR_DUP_MAX_REPRESENTATIVES", "50000"))  # reviews indexed (and results kept) per run
+
+NEGATIONS = {"not", "no", "never", "nothing", "without", "don't", "didn't", "wasn't", "isn't", "won't", "can't"}
+_PRIME = (1 << 31) - 1  # Mersenne prime; a * x + b stays below 2**62
+
+# 📊 Reviews summarized once per cluster vs. served from their representative
+near_duplicate_stats = {"representatives": 0, "members": 0}
+register_callback("review_near_duplicates_total", "counter", "Bulk reviews by near-duplicate role.",
+                  lambda: {(role,): count for role, count in near_duplicate_stats.items()}, ("role",))
+
+
+def review_tokens(review: str) -> Set[str]:
+    return set(_content_words(clean_text(review)))
+
+
+def polarity_key(tokens: Set[str]) -> Tuple[bool, FrozenSet[str]]:
+    """
+    Whether a review is negated, and its sentiment words. Reviews can only
+    share a result when both match: "room was spotless" and "room was dirty"
+    overlap heavily but deserve different ratings.
+    """
+    negated = any(token in NEGATIONS or token.endswith("n't") for token in tokens)
+    return negated, frozenset(token for token in tokens if token in LEXICON)
+
+
+class MinHasher:
+    """
+    MinHash signatures of token sets with seeded universal hashes, vectorized over permutations.
+    """
+
+    def __init__(self, permutations: int = NEAR_DUP_PERMUTATIONS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, permutations, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, permutations, dtype=np.uint64)
+
+    def signature(self, tokens: Set[str]) -> np.ndarray:
+        hashed = np.fromiter((zlib.crc32(token.encode("utf-8")) & _PRIME for token in tokens),
+                             dtype=np.uint64, count=len(tokens))
+        return ((hashed[:, None] * self.a + self.b) % _PRIME).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    LSH over MinHash signatures: reviews sharing any band are candidates,
+    confirmed when the estimated Jaccard similarity reaches the threshold.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, permutations: int = NEAR_DUP_PERMUTATIONS,
+                 bands: int = NEAR_DUP_BANDS, max_size: int = NEAR_DUP_MAX_REPRESENTATIVES):
+        if permutations % bands:
+            raise ValueError("NEAR_DUP_BANDS must divide NEAR_DUP_PERMUTATIONS.")
+        self.threshold, self.bands, self.rows = threshold, bands, permutations // bands
+        self.max_size = max_size
+        self.hasher = MinHasher(permutations)
+        self.buckets: Dict[bytes, List[int]] = {}
+        self.signatures: Dict[int, np.ndarray] = {}
+        self.polarity: Dict[int, Tuple[bool, FrozenSet[str]]] = {}
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [bytes([band]) + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)]
+
+    def query(self, tokens: Set[str]) -> Optional[int]:
+        """
+        Returns the id of the most similar indexed review at or above the threshold.
+        """
+        if len(tokens) < NEAR_DUP_MIN_TOKENS:
+            return None
+        signature = self.hasher.signature(tokens)
+        candidates = {member for key in self._band_keys(signature) for member in self.buckets.get(key, ())}
+        polarity = polarity_key(tokens)
+
+        best, best_similarity = None, self.threshold
+        for candidate in candidates:
+            # ❌ "was rude" / "was not rude" and "spotless" / "dirty" overlap heavily but mean the opposite
+            if self.polarity[candidate] != polarity:
+                continue
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    def add(self, item_id: int, tokens: Set[str]):
+        if len(tokens) < NEAR_DUP_MIN_TOKENS or len(self.signatures) >= self.max_size:
+            return
+        signature = self.hasher.signature(tokens)
+        self.signatures[item_id] = signature
+        self.polarity[item_id] = polarity_key(tokens)
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(item_id)
+
+
+def _usable(result) -> bool:
+    return isinstance(result, dict) and "error" not in result and result.get("predicted_rating") != "N/A"
+
+
+class NearDuplicateClusters:
+    """
+    Per-run clustering stage in front of the LLM: the first review of each
+    cluster is summarized, later near-duplicates reuse its result and are
+    flagged with 'duplicate_of' (the representative's input row index).
+    Members whose representative failed are summarized on their own.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD):
+        self.index = NearDuplicateIndex(threshold)
+        self.results: Dict[int, asyncio.Future] = {}
+        self.stats = {"threshold": threshold, "representatives": 0, "members": 0, "clusters": 0}
+        self._clustered: Set[int] = set()
+
+    async def summarize(self, reviews: List[str], positions: List[int],
+                        summarize_fn: Callable[[List[str]], Awaitable[list]]) -> list:
+        """
+        Like summarize_fn(reviews), with near-duplicates of earlier reviews
+        (in this call or previous ones) served from their representative.
+        """
+        loop = asyncio.get_running_loop()
+        plan, representatives = [], []
+        for review, position in zip(reviews, positions):
+            tokens = review_tokens(review)
+            match = self.index.query(tokens)
+            if match is None:
+                self.index.add(position, tokens)
+                self.results[position] = loop.create_future()
+                representatives.append((review, position))
+            plan.append(match)
+
+        rep_results = {}
+        try:
+            if representatives:
+                summaries = await summarize_fn([review for review, _ in representatives])
+                for (_, position), result in zip(representatives, summaries):
+                    rep_results[position] = result
+                    self.results[position].set_result(result)
+        finally:
+            for _, position in representatives:
+                if not self.results[position].done():
+                    self.results[position].cancel()
+                if position not in self.index.signatures:
+                    del self.results[position]  # ✅ Not indexed, so no later review can match it
+
+        results, retry = [], []
+        for i, (review, position, match) in enumerate(zip(reviews, positions, plan)):
+            if match is None:
+                results.append(rep_results[position])
+                continue
+            result = await asyncio.shield(self.results[match])
+            if not _usable(result):
+                retry.append(i)
+                results.append(None)
+                continue
+            results.append({**result, "original_review": review, "duplicate_of": match})
+            self._count_member(match)
+
+        # 🔁 Members of a failed representative get their own call
+        if retry:
+            for i, result in zip(retry, await summarize_fn([reviews[i] for i in retry])):
+                results[i] = result
+
+        self.stats["representatives"] += len(representatives)
+        near_duplicate_stats["representatives"] += len(representatives)
+        return results
+
+    def _count_member(self, representative: int):
+        self.stats["members"] += 1
+        near_duplicate_stats["members"] += 1
+        if representative not in self._clustered:
+            self._clustered.add(representative)
+            self.stats["clusters"] += 1
+
+    def summary(self) -> dict:
+        processed = self.stats["representatives"] + self.stats["members"]
+        return {**self.stats, "llm_calls_saved": self.stats["members"],
+                "saved_share": round(self.stats["members"] / processed, 4) if processed else None}
@@ -0,0 +1,236 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import AsyncIterator, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# ⚙️ Client settings (override via environment)
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))        # match the Ollama server's OLLAMA_NUM_PARALLEL
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_REQUEST_TIMEOUT = float(os.getenv("OLLAMA_REQUEST_TIMEOUT", "90"))  # per attempt
+OLLAMA_DEADLINE = float(os.getenv("OLLAMA_DEADLINE", "180"))              # whole call, including retries
+OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "3"))
+OLLAMA_BACKOFF = float(os.getenv("OLLAMA_BACKOFF", "0.5"))
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # keeps the model (and its cached prompt prefix) loaded between calls
+
+GENERATE_URL = f"{OLLAMA_HOST}/api/generate"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _backoff(attempt: int) -> float:
+    # ✅ Exponential backoff with jitter so retries from many threads spread out
+    return OLLAMA_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+
+
+def _attempt_timeout(deadline: float) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise requests.exceptions.Timeout(f"Ollama deadline of {OLLAMA_DEADLINE}s exceeded.")
+    return min(OLLAMA_REQUEST_TIMEOUT, remaining)
+
+
+class SlotBudget:
+    """
+    Concurrency limit shared by threads and event loops: use it as
+    `with slots:` from sync code or `async with slots:` from async code.
+    Waiters of both kinds are served in arrival order.
+    """
+
+    def __init__(self, size: int):
+        self._lock = threading.Lock()
+        self._free = size
+        self._waiters = deque()  # callables that hand a released slot to one waiter
+
+    @property
+    def free(self) -> int:
+        return self._free
+
+    def acquire(self):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            granted = threading.Event()
+            self._waiters.append(granted.set)
+        granted.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def grant():
+            if future.cancelled():
+                self.release()  # 🔁 The waiter gave up after the slot was handed over
+            else:
+                future.set_result(None)
+
+        def wake():
+            loop.call_soon_threadsafe(grant)
+
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            self._waiters.append(wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if wake in self._waiters:
+                    self._waiters.remove(wake)
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                wake = self._waiters.popleft()
+                try:
+                    wake()
+                    return
+                except RuntimeError:
+                    continue  # ⚠️ The waiter's event loop is closed
+            self._free += 1
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+
+# ✅ Shared keep-alive session: one connection pool for every thread
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_NUM_PARALLEL * 2))
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_NUM_PARALLEL * 2))
+# ✅ One budget for the sync and async paths, so mixed traffic stays within OLLAMA_NUM_PARALLEL
+_slots = SlotBudget(OLLAMA_NUM_PARALLEL)
+
+
+def _with_keep_alive(payload: dict) -> dict:
+    # ✅ An unloaded model loses the KV cache of the shared prompt prefix
+    return {"keep_alive": OLLAMA_KEEP_ALIVE, **payload} if OLLAMA_KEEP_ALIVE else payload
+
+
+def generate(payload: dict, deadline: Optional[float] = None) -> dict:
+    """
+    POSTs to /api/generate over the pooled session and returns the JSON reply.
+    At most OLLAMA_NUM_PARALLEL calls (sync and async together) run at once;
+    connection errors and 429/5xx responses are retried with backoff until
+    the overall deadline.
+    Raises requests exceptions like a plain requests.post would.
+    """
+    deadline = deadline or time.monotonic() + OLLAMA_DEADLINE
+    payload = _with_keep_alive(payload)
+
+    with _slots:
+        for attempt in range(OLLAMA_MAX_RETRIES + 1):
+            try:
+                response = _session.post(
+                    GENERATE_URL, json=payload,
+                    timeout=(OLLAMA_CONNECT_TIMEOUT, _attempt_timeout(deadline))
+                )
+                if response.status_code not in RETRY_STATUS or attempt == OLLAMA_MAX_RETRIES:
+                    response.raise_for_status()
+                    return response.json()
+                print(f"🔁 [Ollama] HTTP {response.status_code}, retrying...")
+
+            except requests.exceptions.ConnectionError as e:
+                if attempt == OLLAMA_MAX_RETRIES:
+                    raise
+                print("🔁 [Ollama] Connection error, retrying:", str(e))
+
+            time.sleep(min(_backoff(attempt), max(0, deadline - time.monotonic())))
+
+    raise requests.exceptions.Timeout("Ollama retries exhausted.")
+
+
+class _AsyncOllama:
+    """
+    Per-event-loop async client (httpx clients are loop-bound).
+    """
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=OLLAMA_NUM_PARALLEL * 2,
+                                max_keepalive_connections=OLLAMA_NUM_PARALLEL),
+            timeout=httpx.Timeout(OLLAMA_REQUEST_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT)
+        )
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _async_client() -> _AsyncOllama:
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = _AsyncOllama()
+    return _async_clients[loop]
+
+
+async def agenerate(payload: dict, deadline: Optional[float] = None) -> dict:
+    """
+    Async variant of generate() for use directly inside FastAPI handlers.
+    Raises httpx exceptions (TimeoutException, HTTPStatusError, ...).
+    """
+    client = _async_client()
+    loop = asyncio.get_running_loop()
+    deadline = deadline or loop.time() + OLLAMA_DEADLINE
+    payload = _with_keep_alive(payload)
+
+    async with _slots:
+        for attempt in range(OLLAMA_MAX_RETRIES + 1):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise httpx.TimeoutException(f"Ollama deadline of {OLLAMA_DEADLINE}s exceeded.")
+            try:
+                response = await client.client.post(
+                    GENERATE_URL, json=payload, timeout=min(OLLAMA_REQUEST_TIMEOUT, remaining)
+                )
+                if response.status_code not in RETRY_STATUS or attempt == OLLAMA_MAX_RETRIES:
+                    response.raise_for_status()
+                    return response.json()
+                print(f"🔁 [Ollama] HTTP {response.status_code}, retrying...")
+
+            except httpx.TransportError as e:
+                if attempt == OLLAMA_MAX_RETRIES or isinstance(e, httpx.TimeoutException):
+                    raise
+                print("🔁 [Ollama] Connection error, retrying:", str(e))
+
+            await asyncio.sleep(min(_backoff(attempt), max(0, deadline - loop.time())))
+
+    raise httpx.TimeoutException("Ollama retries exhausted.")
+
+
+async def astream_generate(payload: dict) -> AsyncIterator[dict]:
+    """
+    Streams /api/generate: yields each JSON chunk ({"response": token, "done": ...})
+    as Ollama produces it. Holds one concurrency slot for the whole stream.
+    """
+    client = _async_client()
+
+    async with _slots:
+        async with client.client.stream("POST", GENERATE_URL, json={**_with_keep_alive(payload), "stream": True},
+                                        timeout=httpx.Timeout(OLLAMA_REQUEST_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT)) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
@@ -1,85 +1,305 @@
+import os
+import httpx
 import requests
 import re
+from typing import AsyncIterator, Dict, List
 
-def summarize_with_ollama(review: str) -> dict:
-    """
-    Uses Ollama REST API (localhost:11434) to summarize and rate a review.
-    """
+from app.metrics import instrumented
+from app.ollama_client import OLLAMA_DEADLINE, agenerate, astream_generate, generate
+from app.output_parser import (FAILED, JSON_REPLY_FORMAT, OK, OUTPUT_REASK_ATTEMPTS, REPAIRED, STRUCTURED_OUTPUT,
+                               iter_json_objects, load_json, parse_rating, parse_reply, parse_result_object,
+                               record_parse)
+
+# ⚙️ Ollama settings
+OLLAMA_MODEL = "mistral"
+OLLAMA_BATCH_TOKEN_BUDGET = int(os.getenv("OLLAMA_BATCH_TOKEN_BUDGET", "1500"))  # review tokens per batch prompt
+
+# ✅ Instructions first and the review last: Ollama reuses the cached key/values
+# of a prompt prefix it has already evaluated while the model stays loaded
+OLLAMA_JSON_PREFIX = f"""
+Summarize the customer review below and predict a star rating (1–5).
 
-    prompt = f"""
-Summarize the following customer review and predict a star rating (1–5):
+Respond with only JSON:
+{JSON_REPLY_FORMAT}
 
-Review: "{review}"
+Review:"""
+
+OLLAMA_TEXT_PREFIX = """
+Summarize the customer review below and predict a star rating (1–5).
 
 Respond in this format:
 Summary: <summary>
 Predicted Rating: <1–5>
+
+Review:"""
+
+
+def build_ollama_prompt(review: str, structured: bool = STRUCTURED_OUTPUT) -> str:
+    return (OLLAMA_JSON_PREFIX if structured else OLLAMA_TEXT_PREFIX) + f' "{review}"\n'
+
+
+def _request(review: str, previous_reply: str = None) -> dict:
+    """
+    Generate payload for one review. With STRUCTURED_OUTPUT Ollama is asked
+    for JSON ('format'), which constrains decoding to valid JSON.
+    A 'previous_reply' that could not be parsed turns it into a re-ask.
+    """
+    prompt = build_ollama_prompt(review)
+    if previous_reply is not None:
+        prompt += f"""
+Your previous reply could not be read:
+{previous_reply[:500]}
+
+Reply again with only JSON in exactly this shape: {JSON_REPLY_FORMAT}
 """
+    payload = {"model": OLLAMA_MODEL, "prompt": prompt, "stream": False}
+    if STRUCTURED_OUTPUT or previous_reply is not None:
+        payload["format"] = "json"
+    return payload
+
+
+@instrumented("rating_parse")
+def parse_ollama_response(review: str, raw: str, expect_json: bool = False) -> dict:
+    print("📤 Ollama and Granite response:\n", raw)
+    return {"original_review": review, **parse_reply(raw, "ollama", expect_json), "engine_used": "ollama"}
+
+
+def _timeout_result(review: str) -> dict:
+    print(f"⏱️ Ollama timed out (deadline {OLLAMA_DEADLINE:.0f} seconds).")
+    return {
+        "original_review": review,
+        "summary": "Timed out while generating response from Ollama.",
+        "predicted_rating": "N/A",
+        "engine_used": "ollama"
+    }
+
+
+def _error_result(review: str, e: Exception) -> dict:
+    print("❌ Ollama REST API error:", str(e))
+    return {
+        "original_review": review,
+        "summary": "Error from Ollama API.",
+        "predicted_rating": "N/A",
+        "engine_used": "ollama",
+        "error": str(e)
+    }
 
+
+@instrumented("ollama")
+def summarize_with_ollama(review: str) -> dict:
+    """
+    Uses Ollama REST API (localhost:11434) to summarize and rate a review.
+    Requests go through the pooled keep-alive client in app/ollama_client.py.
+    """
     print("⚙️ [Ollama] Sending prompt to REST API...")
 
     try:
-        response = requests.post(
-            url="http://localhost:11434/api/generate",
-            json={
-                "model": "mistral",
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=90  # ⏱️ Handles cold start or large input
-        )
-
-        response.raise_for_status()
-        raw = response.json()["response"]
-        print("📤 Ollama and Granite response:\n", raw)
-
-        # ✅ Extract summary using flexible regex (robust across line formats)
-        summary_match = re.search(r"summary:\s*(.+?)(?:\n|$)", raw, re.IGNORECASE | re.DOTALL)
-        rating_match = re.search(r"predicted rating:\s*([0-9.]+)", raw, re.IGNORECASE)
-
-        summary = summary_match.group(1).strip() if summary_match else "Summary not found"
-        rating = rating_match.group(1).strip() if rating_match else "N/A"
-
-        return {
-            "original_review": review,
-            "summary": summary,
-            "predicted_rating": try_parse_rating(rating),
-            "engine_used": "ollama"
-        }
+        reply = generate(_request(review))["response"]
+        result = parse_ollama_response(review, reply, STRUCTURED_OUTPUT)
+
+        # 🔁 Re-ask only when the reply could not be parsed or repaired
+        for _ in range(OUTPUT_REASK_ATTEMPTS if result["predicted_rating"] == "N/A" else 0):
+            print("🔁 [Ollama] Unparseable reply, asking again for JSON...")
+            reply = generate(_request(review, reply))["response"]
+            result = parse_ollama_response(review, reply, expect_json=True)
+            if result["predicted_rating"] != "N/A":
+                break
+        return result
 
     except requests.exceptions.Timeout:
-        print("⏱️ Ollama timed out after 90 seconds.")
-        return {
-            "original_review": review,
-            "summary": "Timed out while generating response from Ollama.",
-            "predicted_rating": "N/A",
-            "engine_used": "ollama"
-        }
+        return _timeout_result(review)
+
+    except Exception as e:
+        return _error_result(review, e)
+
+
+async def asummarize_with_ollama(review: str) -> dict:
+    """
+    Async variant of summarize_with_ollama for use inside FastAPI handlers.
+    """
+    try:
+        reply = (await agenerate(_request(review)))["response"]
+        result = parse_ollama_response(review, reply, STRUCTURED_OUTPUT)
+
+        for _ in range(OUTPUT_REASK_ATTEMPTS if result["predicted_rating"] == "N/A" else 0):
+            reply = (await agenerate(_request(review, reply)))["response"]
+            result = parse_ollama_response(review, reply, expect_json=True)
+            if result["predicted_rating"] != "N/A":
+                break
+        return result
+
+    except httpx.TimeoutException:
+        return _timeout_result(review)
+
+    except Exception as e:
+        return _error_result(review, e)
+
+# ✅ Streaming mode: forward tokens as they arrive
+class StreamingSummaryParser:
+    """
+    Incrementally extracts the 'Summary:' and 'Predicted Rating:' fields
+    from a reply that arrives token by token.
+    """
+    SUMMARY_RE = re.compile(r"summary:\s*(.*?)(?:\n|predicted rating|$)", re.IGNORECASE | re.DOTALL)
+    RATING_RE = re.compile(r"predicted rating:\s*([0-9]+(?:\.[0-9]+)?)", re.IGNORECASE)
+
+    def __init__(self):
+        self.text = ""
+        self.summary = ""
+        self.rating = None
+
+    def feed(self, token: str) -> List[dict]:
+        """
+        Adds a token and returns events for any field that changed.
+        """
+        self.text += token
+        events = []
+
+        summary_match = self.SUMMARY_RE.search(self.text)
+        if summary_match and summary_match.group(1).strip() != self.summary:
+            self.summary = summary_match.group(1).strip()
+            events.append({"type": "summary", "text": self.summary})
+
+        rating_match = self.RATING_RE.search(self.text)
+        if rating_match and self.rating is None and not self.text.endswith(rating_match.group(1)):
+            # ✅ Only report the rating once the number is complete
+            self.rating = parse_rating(rating_match.group(1))
+            events.append({"type": "rating", "value": self.rating})
+
+        return events
+
+
+async def astream_summarize_with_ollama(review: str) -> AsyncIterator[dict]:
+    """
+    Streams a single-review summary from Ollama. Yields 'token', 'summary' and
+    'rating' events as text arrives, then a final 'result' event holding the
+    same dict summarize_with_ollama would return. Streams use the line
+    format, since partial JSON cannot be shown as it arrives.
+    """
+    parser = StreamingSummaryParser()
+
+    try:
+        prompt = build_ollama_prompt(review, structured=False)
+        async for chunk in astream_generate({"model": OLLAMA_MODEL, "prompt": prompt}):
+            token = chunk.get("response", "")
+            if token:
+                yield {"type": "token", "text": token}
+                for event in parser.feed(token):
+                    yield event
+            if chunk.get("done"):
+                break
+
+        result = parse_ollama_response(review, parser.text)
+
+    except httpx.TimeoutException:
+        result = _timeout_result(review)
 
     except Exception as e:
-        print("❌ Ollama REST API error:", str(e))
-        return {
-            "original_review": review,
-            "summary": "Error from Ollama API.",
-            "predicted_rating": "N/A",
-            "engine_used": "ollama",
-            "error": str(e)
-        }
-
-# ✅ Rating parser helper
-def try_parse_rating(value: str):
-    """
-    Safely extracts numeric rating from strings like:
-    '4.5', '3/5', 'Rating: 4.0', 'Predicted Rating: 5'
-    """
-    if not value or not isinstance(value, str):
-        return "N/A"
-
-    match = re.search(r"\d+(\.\d+)?", value)
-    if match:
+        result = _error_result(review, e)
+
+    yield {"type": "result", **result}
+
+
+# ✅ Batch mode: several short reviews in one generation
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (~4 characters per token for English text).
+    """
+    return len(text) // 4 + 1
+
+
+def split_batches(reviews: List[str], token_budget: int = OLLAMA_BATCH_TOKEN_BUDGET) -> List[List[int]]:
+    """
+    Groups review indexes into batches whose estimated size fits the token budget.
+    A review larger than the budget gets a batch of its own.
+    """
+    batches, current, used = [], [], 0
+    for index, review in enumerate(reviews):
+        tokens = estimate_tokens(review)
+        if current and used + tokens > token_budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_prompt(reviews: List[str]) -> str:
+    numbered = "\n".join(f'{i}. "{review}"' for i, review in enumerate(reviews, start=1))
+    return f"""
+Summarize each of the customer reviews below and predict a star rating (1–5) for each.
+
+Respond with only JSON, one entry per review, in the same order:
+{{"results": [{{"id": 1, "summary": "<summary>", "rating": <1–5>}}, ...]}}
+
+Reviews:
+{numbered}
+"""
+
+
+def parse_batch_response(raw: str, count: int) -> Dict[int, dict]:
+    """
+    Extracts per-review results from a batch reply, keyed by 0-based index.
+    Items that are missing or malformed are left out so the caller can retry them.
+    """
+    data, outcome = load_json(raw), OK
+    if data is None:
+        # ❌ Whole reply is invalid — salvage any well-formed per-review objects
+        items, outcome = list(iter_json_objects(raw)), REPAIRED
+    else:
+        items = data.get("results", []) if isinstance(data, dict) else data
+
+    parsed = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        result = parse_result_object(item)
+        if 0 <= index < count and result:
+            parsed[index] = result
+
+    record_parse("ollama-batch", outcome, len(parsed))
+    record_parse("ollama-batch", FAILED, count - len(parsed))
+    return parsed
+
+
+@instrumented("ollama_batch")
+def summarize_batch_with_ollama(reviews: List[str]) -> List[dict]:
+    """
+    Summarizes and rates several reviews with as few Ollama calls as possible.
+    Reviews are packed into prompts that fit OLLAMA_BATCH_TOKEN_BUDGET; any item
+    whose batch output cannot be parsed is retried on its own.
+    """
+    results: List[dict] = [None] * len(reviews)
+
+    for batch in split_batches(reviews):
+        if len(batch) == 1:
+            results[batch[0]] = summarize_with_ollama(reviews[batch[0]])
+            continue
+
+        parsed = {}
+        print(f"⚙️ [Ollama] Sending batch of {len(batch)} reviews to REST API...")
         try:
-            return round(float(match.group()), 1)
-        except:
-            return "N/A"
+            reply = generate({
+                "model": OLLAMA_MODEL,
+                "prompt": build_batch_prompt([reviews[i] for i in batch]),
+                "stream": False,
+                "format": "json"
+            })
+            parsed = parse_batch_response(reply["response"], len(batch))
+        except Exception as e:
+            print("❌ Ollama batch error:", str(e))
+
+        for position, index in enumerate(batch):
+            if position in parsed:
+                results[index] = {"original_review": reviews[index], **parsed[position], "engine_used": "ollama-batch"}
+            else:
+                # 🔁 Fall back to a single-review call for this item only
+                results[index] = summarize_with_ollama(reviews[index])
 
-    return "N/A"
+    return results
@@ -0,0 +1,152 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from app.metrics import register_callback
+
+# ⚙️ Structured output settings (override via environment)
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") == "1"            # ask engines for JSON replies where they support it
+OUTPUT_REASK_ATTEMPTS = int(os.getenv("OUTPUT_REASK_ATTEMPTS", "1"))      # re-asks of a reply that could not be parsed or repaired
+
+# 🧾 Parse outcomes
+OK, REPAIRED, FAILED = "ok", "repaired", "failed"
+SUMMARY_NOT_FOUND = "Summary not found"
+
+JSON_REPLY_FORMAT = '{"summary": "<summary>", "rating": <1–5>}'
+
+# ✅ Compiled once; every LLM reply goes through these
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_OBJECT_RE = re.compile(r"\{[^{}]*\}")
+_SUMMARY_LINE_RE = re.compile(r"summary\s*:\s*(.+?)\s*(?:\n|predicted rating|$)", re.IGNORECASE | re.DOTALL)
+_RATING_LINE_RE = re.compile(r"(?:predicted\s+)?rating\s*[:=]?\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+_OUT_OF_FIVE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:/\s*5|out of 5|stars?)\b", re.IGNORECASE)
+
+# 📊 Replies by engine and outcome
+parse_stats: Dict[Tuple[str, str], int] = {}
+_stats_lock = threading.Lock()
+register_callback("review_output_parse_total", "counter", "LLM replies by parse outcome.",
+                  lambda: dict(parse_stats), ("engine", "outcome"))
+
+
+def record_parse(engine: str, outcome: str, count: int = 1):
+    with _stats_lock:
+        parse_stats[(engine, outcome)] = parse_stats.get((engine, outcome), 0) + count
+
+
+def parse_summary() -> dict:
+    """
+    Per-engine parse outcome counts and failure rate.
+    """
+    with _stats_lock:
+        stats = dict(parse_stats)
+    summary = {}
+    for (engine, outcome), count in stats.items():
+        summary.setdefault(engine, {OK: 0, REPAIRED: 0, FAILED: 0})[outcome] = count
+    for counts in summary.values():
+        total = sum(counts.values())
+        counts["failure_rate"] = round(counts[FAILED] / total, 4) if total else None
+    return summary
+
+
+def parse_rating(value):
+    """
+    Extracts a 1–5 rating from numbers or strings like '4.5', '3/5',
+    'Rating: 4.0'. Returns "N/A" when there is none or it is out of range.
+    """
+    if isinstance(value, bool):
+        return "N/A"
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        match = _NUMBER_RE.search(str(value or ""))
+        if not match:
+            return "N/A"
+        number = float(match.group())
+    return round(number, 1) if 1 <= number <= 5 else "N/A"
+
+
+def rating_stars(rating) -> str:
+    """
+    Star string for a numeric rating; empty for "N/A" or missing ratings.
+    """
+    return "⭐" * int(round(rating)) if isinstance(rating, (int, float)) and not isinstance(rating, bool) else ""
+
+
+def parse_result_object(item) -> Optional[dict]:
+    """
+    {summary, predicted_rating} from a decoded JSON reply item, or None if
+    either field is missing or invalid.
+    """
+    if not isinstance(item, dict):
+        return None
+    summary = str(item.get("summary") or "").strip()
+    rating = parse_rating(item.get("rating", item.get("predicted_rating")))
+    if not summary or rating == "N/A":
+        return None
+    return {"summary": summary, "predicted_rating": rating}
+
+
+def load_json(raw: str):
+    """
+    json.loads that tolerates Markdown code fences; None when invalid.
+    """
+    try:
+        return json.loads(_FENCE_RE.sub("", raw))
+    except ValueError:
+        return None
+
+
+def iter_json_objects(raw: str):
+    """
+    Yields every flat JSON object found in a reply that is not valid JSON as a whole.
+    """
+    for match in _OBJECT_RE.finditer(raw):
+        item = load_json(match.group())
+        if item is not None:
+            yield item
+
+
+def parse_reply(raw: str, engine: str, expect_json: bool = False) -> dict:
+    """
+    Parses a single-review reply into {summary, predicted_rating}. Accepts
+    JSON or "Summary: ... / Predicted Rating: ..." lines, repairs partial
+    replies where it can, and records the outcome for the engine.
+    A reply that cannot be used has predicted_rating "N/A".
+    """
+    raw = raw or ""
+
+    # ✅ Fast path: a well-formed JSON reply
+    if raw.lstrip().startswith(("{", "`")):
+        result = parse_result_object(load_json(raw))
+        if result:
+            record_parse(engine, OK)
+            return result
+
+    # 🔧 JSON object embedded in surrounding text
+    for item in iter_json_objects(raw):
+        result = parse_result_object(item)
+        if result:
+            record_parse(engine, REPAIRED)
+            return result
+
+    summary_match = _SUMMARY_LINE_RE.search(raw)
+    rating_match = _RATING_LINE_RE.search(raw) or _OUT_OF_FIVE_RE.search(raw)
+    summary = summary_match.group(1).strip() if summary_match else ""
+    rating = parse_rating(rating_match.group(1)) if rating_match else "N/A"
+
+    if summary and rating != "N/A":
+        record_parse(engine, REPAIRED if expect_json else OK)
+        return {"summary": summary, "predicted_rating": rating}
+
+    if rating != "N/A":
+        # 🔧 Rating without a labelled summary: use the first other line
+        lines = [line.strip() for line in raw.splitlines() if line.strip() and rating_match.group(0) not in line]
+        if lines:
+            record_parse(engine, REPAIRED)
+            return {"summary": lines[0][:500], "predicted_rating": rating}
+
+    record_parse(engine, FAILED)
+    return {"summary": summary or SUMMARY_NOT_FOUND, "predicted_rating": "N/A"}
@@ -0,0 +1,25 @@
+import csv
+import os
+from typing import Iterable
+
+from app.metrics import instrumented
+
+# ✅ Columns written for every summarized review
+OUTPUT_DIR = os.getenv("OUTPUT_DIR", "output")
+OUTPUT_FIELDS = ["original_review", "summary", "predicted_rating", "rating_stars", "sentiment", "date"]
+
+
+@instrumented("output_csv")
+def write_summaries_csv(rows: Iterable[dict], output_path: str = os.path.join(OUTPUT_DIR, "summaries.csv")) -> str:
+    """
+    Writes summarized review rows to a CSV file and returns its path.
+    Accepts any iterable so callers can stream rows instead of building a list.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    with open(output_path, "w", newline='', encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return output_path
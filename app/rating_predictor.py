@@ -1,26 +1,249 @@
+import argparse
+import csv
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from app.local_sentiment import LEXICON
+from app.metrics import instrumented
+from app.model_registry import get_model, register_model
+from app.output_parser import parse_rating
+
+# ⚙️ Rating model settings (override via environment)
+RATING_MODEL_PATH = os.getenv("RATING_MODEL_PATH", os.path.join("models", "rating_model.npz"))
+RATING_HASH_FEATURES = int(os.getenv("RATING_HASH_FEATURES", str(2 ** 18)))
+
+RATINGS = np.arange(1, 6)
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# 🌱 Keyword seeds used when no trained model exists (the old heuristic's lists)
+POSITIVE_KEYWORDS = ["excellent", "amazing", "perfect", "great", "fantastic", "loved", "wonderful", "outstanding", "superb"]
+NEGATIVE_KEYWORDS = ["terrible", "horrible", "bad", "poor", "worst", "disappointed", "awful", "unacceptable"]
+NEUTRAL_KEYWORDS = ["okay", "average", "fine", "decent", "mediocre"]
+
+
+@lru_cache(maxsize=200_000)
+def _hash(feature: str, n_features: int) -> int:
+    # ✅ crc32 is stable across processes (Python's hash() is salted)
+    return zlib.crc32(feature.encode("utf-8")) % n_features
+
+
+def extract_ngrams(text: str) -> List[str]:
+    """
+    Unigrams plus bigrams, so "not clean" is a feature of its own.
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def featurize(texts: List[str], n_features: int = RATING_HASH_FEATURES) -> sp.csr_matrix:
+    """
+    Builds one sparse hashed n-gram matrix for all texts: log-scaled counts,
+    L2-normalized per row. Shape is (len(texts), n_features).
+    """
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        indexes = [_hash(gram, n_features) for gram in extract_ngrams(text)]
+        rows.extend([row] * len(indexes))
+        cols.extend(indexes)
+
+    data = np.ones(len(cols), dtype=np.float32)
+    matrix = sp.csr_matrix((data, (rows, cols)), shape=(len(texts), n_features), dtype=np.float32)
+    matrix.sum_duplicates()
+    np.log1p(matrix.data, out=matrix.data)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sp.diags(1 / norms).dot(matrix).tocsr()
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    return logits / logits.sum(axis=1, keepdims=True)
+
+
+class RatingModel:
+    """
+    Softmax regression over hashed n-grams, predicting 1–5 stars.
+    Scoring a batch is one sparse matrix product, so thousands of reviews
+    take milliseconds.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, source: str = "trained"):
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+        self.n_features = weights.shape[0]
+        self.source = source
+
+    @classmethod
+    def from_keywords(cls, n_features: int = RATING_HASH_FEATURES, strength: float = 6.0) -> "RatingModel":
+        """
+        Untrained fallback: each sentiment word pulls towards a target rating
+        (strongly positive words towards 5, strongly negative towards 1).
+        """
+        targets = {word: 3 + value * 2 / 3 for word, value in LEXICON.items()}
+        targets.update({word: 4.5 for word in POSITIVE_KEYWORDS})
+        targets.update({word: 1.5 for word in NEGATIVE_KEYWORDS})
+        targets.update({word: 3.0 for word in NEUTRAL_KEYWORDS})
+
+        weights = np.zeros((n_features, len(RATINGS)), dtype=np.float32)
+        for word, target in targets.items():
+            weights[_hash(word, n_features)] += -strength * np.abs(RATINGS - np.clip(target, 1, 5))
+            # ✅ Negated words pull the other way
+            weights[_hash(f"not {word}", n_features)] += -strength * np.abs(RATINGS - np.clip(6 - target, 1, 5))
+
+        bias = np.array([0, 0, 0.5, 0, 0], dtype=np.float32)  # no evidence → 3 stars
+        return cls(weights, bias, source="keywords")
+
+    @classmethod
+    def load(cls, path: str) -> "RatingModel":
+        with np.load(path) as data:
+            return cls(data["weights"], data["bias"], source="trained")
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, weights=self.weights, bias=self.bias)
+        return path
+
+    def predict_proba(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns a (len(texts), 5) array of probabilities for 1–5 stars.
+        """
+        if not texts:
+            return np.zeros((0, len(RATINGS)), dtype=np.float32)
+        features = featurize(texts, self.n_features)
+        return _softmax(features @ self.weights + self.bias)
+
+    def predict(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (ratings, confidence): the most likely star rating per text
+        and its probability.
+        """
+        proba = self.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        return RATINGS[best], proba[np.arange(len(best)), best]
+
+    def fit(self, texts: List[str], ratings: Iterable[int], epochs: int = 300,
+            learning_rate: float = 2.0, l2: float = 1e-4) -> "RatingModel":
+        """
+        Trains with full-batch gradient descent (with momentum) on cross-entropy.
+        """
+        features = featurize(texts, self.n_features)
+        labels = np.asarray(list(ratings)) - 1
+        targets = np.zeros((len(labels), len(RATINGS)), dtype=np.float32)
+        targets[np.arange(len(labels)), labels] = 1
+
+        weights = np.zeros_like(self.weights)
+        bias = np.zeros_like(self.bias)
+        velocity_w, velocity_b = np.zeros_like(weights), np.zeros_like(bias)
+
+        for _ in range(epochs):
+            error = (_softmax(features @ weights + bias) - targets) / len(labels)
+            velocity_w = 0.9 * velocity_w - learning_rate * (features.T @ error + l2 * weights)
+            velocity_b = 0.9 * velocity_b - learning_rate * error.sum(axis=0)
+            weights += velocity_w
+            bias += velocity_b
+
+        self.weights, self.bias, self.source = weights.astype(np.float32), bias.astype(np.float32), "trained"
+        return self
+
+
+def _load_rating_model() -> RatingModel:
+    if os.path.exists(RATING_MODEL_PATH):
+        return RatingModel.load(RATING_MODEL_PATH)
+    print(f"⚠️ [Rating] No model at {RATING_MODEL_PATH}, using keyword seed weights.")
+    return RatingModel.from_keywords()
+
+
+register_model("rating", _load_rating_model)
+
+
+def get_rating_model() -> RatingModel:
+    return get_model("rating")
+
+
+def predict_ratings(texts: List[str]) -> List[int]:
+    """
+    Predicts star ratings (1 to 5) for many reviews in one vectorized pass.
+    """
+    ratings, _ = get_rating_model().predict(texts)
+    return ratings.tolist()
+
+
+@instrumented("rating_model")
+def predict_ratings_with_confidence(texts: List[str]) -> List[Tuple[int, float]]:
+    ratings, confidence = get_rating_model().predict(texts)
+    return list(zip(ratings.tolist(), confidence.tolist()))
+
+
 def predict_rating(text: str) -> int:
     """
-    Heuristic-based placeholder for rating prediction.
-    Simulates star ratings (1 to 5) based on review sentiment keywords.
-    Intended for replacement with AI model or IBM Granite output.
+    Predicts a star rating (1 to 5) for a single review.
+    """
+    return predict_ratings([text])[0]
+
+
+def load_labeled_csv(path: str, text_column: str = "review",
+                     rating_column: str = "rating") -> Tuple[List[str], List[int]]:
+    """
+    Reads (review, rating) pairs; rows with a missing review or a rating
+    outside 1–5 are skipped. Column names are matched case-insensitively.
     """
+    texts, ratings = [], []
+    with open(path, newline='', encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {(key or "").strip().lower(): value for key, value in row.items()}
+            text = (row.get(text_column.lower()) or "").strip()
+            rating = parse_rating(row.get(rating_column.lower()))
+            if text and rating != "N/A":
+                texts.append(text)
+                ratings.append(int(round(rating)))
+    return texts, ratings
+
+
+def _evaluate(model: RatingModel, texts: List[str], ratings: List[int]) -> str:
+    predicted, _ = model.predict(texts)
+    truth = np.asarray(ratings)
+    return f"accuracy={np.mean(predicted == truth):.3f} MAE={np.mean(np.abs(predicted - truth)):.3f} (n={len(truth)})"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Train or evaluate the local rating model.")
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument("csv", help="CSV with a review column and a 1–5 rating column")
+    parser.add_argument("--text-column", default="review")
+    parser.add_argument("--rating-column", default="rating")
+    parser.add_argument("--model", default=RATING_MODEL_PATH, help="model file to write (train) or read (evaluate)")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--holdout", type=float, default=0.1, help="fraction of rows held out for evaluation")
+    args = parser.parse_args(argv)
+
+    texts, ratings = load_labeled_csv(args.csv, args.text_column, args.rating_column)
+    if not texts:
+        raise SystemExit("❌ No labeled rows found.")
 
-    text_lower = text.lower()
+    if args.command == "evaluate":
+        model = RatingModel.load(args.model) if os.path.exists(args.model) else RatingModel.from_keywords()
+        print(f"📊 [{model.source}] {_evaluate(model, texts, ratings)}")
+        return
 
-    # Positive sentiment indicators
-    positive_keywords = ["excellent", "amazing", "perfect", "great", "fantastic", "loved", "wonderful", "outstanding", "superb"]
-    negative_keywords = ["terrible", "horrible", "bad", "poor", "worst", "disappointed", "awful", "unacceptable"]
-    neutral_keywords = ["okay", "average", "fine", "decent", "mediocre"]
+    order = np.random.default_rng(0).permutation(len(texts))
+    cut = int(len(texts) * (1 - args.holdout)) if len(texts) >= 10 else len(texts)
+    train_idx, test_idx = order[:cut], order[cut:]
 
-    score = 3  # Default neutral score
+    model = RatingModel.from_keywords().fit([texts[i] for i in train_idx], [ratings[i] for i in train_idx],
+                                            epochs=args.epochs)
+    print("✅ Train:", _evaluate(model, [texts[i] for i in train_idx], [ratings[i] for i in train_idx]))
+    if len(test_idx):
+        print("📊 Holdout:", _evaluate(model, [texts[i] for i in test_idx], [ratings[i] for i in test_idx]))
+    print("💾 Saved model to", model.save(args.model))
 
-    # Adjust score based on keyword matches
-    if any(word in text_lower for word in positive_keywords):
-        score += 1
-    if any(word in text_lower for word in negative_keywords):
-        score -= 1
-    if any(word in text_lower for word in neutral_keywords):
-        score = 3
 
-    # Bound the score within 1 to 5
-    return max(1, min(5, score))
+if __name__ == "__main__":
+    main()
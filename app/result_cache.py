@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+from app.metrics import register_callback
+from app.utils import clean_text
+from app.sentiment import FallbackLabel, sentiment_engine_version
+from app.ollama_handler import OLLAMA_MODEL
+from app.summarizer import MODEL_ID, PROMPT_VERSION, SUMMARY_ENGINE
+
+# ⚙️ Cache settings (override via environment)
+CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+CACHE_DB_PATH = os.getenv("RESULT_CACHE_DB_PATH", os.path.join("cache", "results.db"))
+CACHE_MEMORY_ENTRIES = int(os.getenv("RESULT_CACHE_MEMORY_ENTRIES", "10000"))
+CACHE_DISK_ENTRIES = int(os.getenv("RESULT_CACHE_DISK_ENTRIES", "1000000"))
+CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+def cache_key(kind: str, text: str, engine: str, model: str, prompt_version: str) -> str:
+    """
+    Content-addressed key: hash of the normalized review plus everything
+    that can change the result (engine, model and prompt version).
+    """
+    payload = "\x1f".join([kind, engine, model, prompt_version, clean_text(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def summary_model() -> str:
+    return MODEL_ID if SUMMARY_ENGINE == "granite" else OLLAMA_MODEL
+
+
+def summary_cache_key(review: str) -> str:
+    return cache_key("summary", review, SUMMARY_ENGINE, summary_model(), PROMPT_VERSION)
+
+
+def sentiment_cache_key(review: str) -> str:
+    engine, version = sentiment_engine_version()
+    return cache_key("sentiment", review, engine, version, "1")
+
+
+def is_cacheable(value: Any) -> bool:
+    """
+    Only successful results are cached, so failures are retried next time.
+    """
+    if isinstance(value, dict):
+        return "error" not in value and value.get("predicted_rating") != "N/A"
+    if isinstance(value, FallbackLabel):
+        return False  # ❌ Local stand-in for a failed Watson call
+    return value not in (None, "error")
+
+
+class ResultCache:
+    """
+    Two-tier cache: an in-memory LRU in front of a SQLite table on disk.
+    Entries expire after 'ttl_seconds'; the oldest disk entries are pruned
+    once the table grows past 'max_disk_entries'.
+    """
+
+    def __init__(self, db_path: str = CACHE_DB_PATH, max_memory_entries: int = CACHE_MEMORY_ENTRIES,
+                 max_disk_entries: int = CACHE_DISK_ENTRIES, ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes_since_prune = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+        self._schema_lock = threading.Lock()
+        self._ready = False
+
+    def _ensure_schema(self, conn: sqlite3.Connection):
+        # ✅ Created on first use, so importing the app leaves no files behind
+        with self._schema_lock:
+            if self._ready:
+                return
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stored_at REAL, value TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_stored_at ON results (stored_at)")
+            conn.commit()
+            self._ready = True
+
+    def _conn(self) -> sqlite3.Connection:
+        # ✅ One connection per thread (sqlite3 connections are not shareable)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            self._ensure_schema(conn)
+            self._local.conn = conn
+        return conn
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def get_memory(self, key: str) -> Optional[Any]:
+        """
+        Memory-tier lookup only; cheap enough to call from the event loop.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[0]):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return entry[1]
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.get_memory(key)
+        if value is not None:
+            return value
+
+        row = self._conn().execute("SELECT stored_at, value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or self._expired(row[0]):
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+
+        value = json.loads(row[1])
+        self._remember(key, row[0], value)
+        with self._lock:
+            self.counters["disk_hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any):
+        stored_at = time.time()
+        self._remember(key, stored_at, value)
+
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO results (key, stored_at, value) VALUES (?, ?, ?)",
+            (key, stored_at, json.dumps(value, ensure_ascii=False))
+        )
+        conn.commit()
+
+        with self._lock:
+            self.counters["sets"] += 1
+            self._writes_since_prune += 1
+            prune = self._writes_since_prune >= 1000
+            if prune:
+                self._writes_since_prune = 0
+        if prune:
+            self.prune()
+
+    def _remember(self, key: str, stored_at: float, value: Any):
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def prune(self):
+        """
+        Drops expired rows and the oldest rows beyond the disk size limit.
+        """
+        conn = self._conn()
+        if self.ttl_seconds > 0:
+            conn.execute("DELETE FROM results WHERE stored_at < ?", (time.time() - self.ttl_seconds,))
+        excess = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY stored_at LIMIT ?)",
+                (excess,)
+            )
+        conn.commit()
+
+    def get_or_compute(self, key: str, fn: Callable, *args) -> Any:
+        """
+        Returns the cached value for 'key', or calls fn(*args) and caches its result.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = fn(*args)
+        if is_cacheable(value):
+            self.set(key, value)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            counters["memory_entries"] = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        counters["hit_rate"] = round((counters["memory_hits"] + counters["disk_hits"]) / lookups, 4) if lookups else None
+        return counters
+
+
+result_cache = ResultCache() if CACHE_ENABLED else None
+
+if result_cache is not None:
+    register_callback("review_cache_lookups_total", "counter", "Result cache lookups by outcome.",
+                      lambda: {(name,): result_cache.counters[name] for name in ("memory_hits", "disk_hits", "misses")},
+                      ("result",))
+    register_callback("review_cache_entries", "gauge", "Entries in the in-memory result cache.",
+                      lambda: {(): len(result_cache._memory)})
+
+
+def cached_call(key: str, fn: Callable, *args) -> Any:
+    """
+    Runs fn(*args) through the shared cache (or directly when caching is disabled).
+    """
+    if result_cache is None:
+        return fn(*args)
+    return result_cache.get_or_compute(key, fn, *args)
+
+
+def cached_batch_call(keys: List[str], batch_fn: Callable, items: list) -> list:
+    """
+    Batch variant of cached_call: looks up every key, calls batch_fn once with
+    only the missing items, caches those results and returns all values in order.
+    """
+    if result_cache is None:
+        return batch_fn(items)
+
+    values = [result_cache.get(key) for key in keys]
+    missing = [i for i, value in enumerate(values) if value is None]
+    if missing:
+        computed = batch_fn([items[i] for i in missing])
+        for i, value in zip(missing, computed):
+            values[i] = value
+            if is_cacheable(value):
+                result_cache.set(keys[i], value)
+    return values
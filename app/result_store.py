@@ -0,0 +1,371 @@
+import csv
+import io
+import os
+import re
+import shutil
+import time
+from datetime import date
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.metrics import instrumented
+from app.output_writer import OUTPUT_DIR, OUTPUT_FIELDS
+from app.trends import TrendAggregator
+from app.utils import parse_review_date
+
+# ⚙️ Result store settings (override via environment)
+RESULTS_DIR = os.getenv("RESULTS_DIR", os.path.join(OUTPUT_DIR, "results"))
+RESULT_PART_ROWS = int(os.getenv("RESULT_PART_ROWS", "1000"))          # rows per Parquet part file
+RESULT_FLUSH_SECONDS = float(os.getenv("RESULT_FLUSH_SECONDS", "5"))   # max delay before buffered rows are readable
+RESULT_WRITE_BATCH = int(os.getenv("RESULT_WRITE_BATCH", "100"))        # rows handed to a writer thread at once by async callers
+
+_RESULT_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def _arrow():
+    """
+    pyarrow is optional: without it results are kept as CSV only.
+    """
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def _schema(pa):
+    return pa.schema([
+        ("row_index", pa.int64()),
+        ("original_review", pa.string()),
+        ("summary", pa.string()),
+        ("predicted_rating", pa.float64()),
+        ("rating_stars", pa.string()),
+        ("sentiment", pa.string()),
+        ("date", pa.string()),
+        ("rating_source", pa.string()),
+        ("review_date", pa.date32()),
+        ("duplicate_of", pa.int64())
+    ])
+
+
+def result_dir(result_id: str) -> str:
+    if not _RESULT_ID_RE.match(result_id or ""):
+        raise ValueError("Invalid result id.")
+    return os.path.join(RESULTS_DIR, result_id)
+
+
+def csv_path(result_id: str) -> str:
+    return os.path.join(result_dir(result_id), "summaries.csv")
+
+
+def parquet_path(result_id: str) -> str:
+    return os.path.join(result_dir(result_id), "summaries.parquet")
+
+
+def trends_path(result_id: str) -> str:
+    return os.path.join(result_dir(result_id), "trends.json")
+
+
+def trace_path(result_id: str) -> str:
+    return os.path.join(result_dir(result_id), "trace.jsonl")
+
+
+def _parts_dir(result_id: str) -> str:
+    return os.path.join(result_dir(result_id), "parts")
+
+
+def is_complete(result_id: str) -> bool:
+    """
+    True once the writer has closed, so the files are final and can be served as-is.
+    """
+    return os.path.exists(os.path.join(result_dir(result_id), ".complete"))
+
+
+def result_exists(result_id: str) -> bool:
+    try:
+        return os.path.exists(csv_path(result_id))
+    except ValueError:
+        return False
+
+
+def _record(row: dict, row_index: int) -> dict:
+    rating = row.get("predicted_rating")
+    return {
+        "row_index": row_index,
+        "original_review": row.get("original_review"),
+        "summary": row.get("summary"),
+        "predicted_rating": float(rating) if isinstance(rating, (int, float)) else None,
+        "rating_stars": row.get("rating_stars"),
+        "sentiment": row.get("sentiment"),
+        "date": row.get("date"),
+        "rating_source": row.get("rating_source"),
+        "review_date": parse_review_date(row.get("date")),
+        "duplicate_of": row.get("duplicate_of")
+    }
+
+
+class ResultWriter:
+    """
+    Writes result rows as they finish: appended to summaries.csv and, with
+    pyarrow, buffered into Parquet part files (readable while the run is in
+    progress). Trend totals are kept up to date alongside and saved on every
+    flush. close() compacts the parts into one summaries.parquet.
+    Pass 'existing_rows' ((row_index, row) pairs) to rebuild the files of a resumed run.
+    """
+
+    def __init__(self, result_id: str, existing_rows: Optional[Iterable[Tuple[int, dict]]] = None):
+        self.result_id = result_id
+        self.directory = result_dir(result_id)
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+
+        self.pa = _arrow()
+        self.schema = _schema(self.pa) if self.pa else None
+        self.buffer: List[dict] = []
+        self.trends = TrendAggregator()
+        self.parts = 0
+        self.rows = 0
+        self.last_flush = time.monotonic()
+
+        self._csv_file = open(csv_path(result_id), "w", newline='', encoding="utf-8")
+        self._csv = csv.DictWriter(self._csv_file, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+        self._csv.writeheader()
+
+        for row_index, row in existing_rows or []:
+            self.write(row, row_index)
+
+    @instrumented("output_write")
+    def write(self, row: dict, row_index: Optional[int] = None):
+        self._csv.writerow(row)
+        self.trends.add(row)
+        if self.pa:
+            self.buffer.append(_record(row, self.rows if row_index is None else row_index))
+        self.rows += 1
+        if len(self.buffer) >= RESULT_PART_ROWS or time.monotonic() - self.last_flush >= RESULT_FLUSH_SECONDS:
+            self.flush()
+
+    def write_many(self, rows: List[dict]):
+        """
+        Writes several rows in one call; async callers run it in a thread,
+        since a write may flush Parquet parts and trends to disk.
+        """
+        for row in rows:
+            self.write(row)
+
+    @instrumented("output_flush")
+    def flush(self):
+        self._csv_file.flush()
+        self.trends.save(trends_path(self.result_id))
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+
+        os.makedirs(_parts_dir(self.result_id), exist_ok=True)
+        table = self.pa.Table.from_pylist(self.buffer, schema=self.schema)
+        final = os.path.join(_parts_dir(self.result_id), f"part-{self.parts:06d}.parquet")
+        # ✅ Write then rename, so readers never see a half-written part
+        self.pa.parquet.write_table(table, final + ".tmp")
+        os.replace(final + ".tmp", final)
+        self.parts += 1
+        self.buffer = []
+
+    @instrumented("output_close")
+    def close(self):
+        if self._csv_file.closed:
+            return
+        self.flush()
+        self._csv_file.close()
+        if not self.pa:
+            self._mark_complete()
+            return
+
+        # 📦 Compact the parts into a single file, one part at a time
+        writer = self.pa.parquet.ParquetWriter(parquet_path(self.result_id) + ".tmp", self.schema)
+        try:
+            for batch in _dataset(self.pa, _parts_dir(self.result_id)).to_batches():
+                writer.write_batch(batch)
+        finally:
+            writer.close()
+        os.replace(parquet_path(self.result_id) + ".tmp", parquet_path(self.result_id))
+        shutil.rmtree(_parts_dir(self.result_id), ignore_errors=True)
+        self._mark_complete()
+
+    def _mark_complete(self):
+        open(os.path.join(self.directory, ".complete"), "w").close()
+
+
+def _dataset(pa, path: str):
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".parquet"))
+    else:
+        files = [path] if os.path.exists(path) else []
+    return pa.dataset.dataset(files, schema=_schema(pa), format="parquet")
+
+
+def _filter(pa, sentiment: Optional[str], min_rating: Optional[float], max_rating: Optional[float],
+            date_from: Optional[date], date_to: Optional[date]):
+    field = pa.dataset.field
+    conditions = []
+    if sentiment:
+        conditions.append(field("sentiment") == sentiment)
+    if min_rating is not None:
+        conditions.append(field("predicted_rating") >= min_rating)
+    if max_rating is not None:
+        conditions.append(field("predicted_rating") <= max_rating)
+    if date_from:
+        conditions.append(field("review_date") >= pa.scalar(date_from, pa.date32()))
+    if date_to:
+        conditions.append(field("review_date") <= pa.scalar(date_to, pa.date32()))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _matches(record: dict, sentiment, min_rating, max_rating, date_from, date_to) -> bool:
+    # ✅ Same filters as _filter(), for the CSV-only fallback
+    rating, review_date = record["predicted_rating"], record["review_date"]
+    return (
+        (not sentiment or record["sentiment"] == sentiment)
+        and (min_rating is None or (rating is not None and rating >= min_rating))
+        and (max_rating is None or (rating is not None and rating <= max_rating))
+        and (not date_from or (review_date is not None and review_date >= date_from))
+        and (not date_to or (review_date is not None and review_date <= date_to))
+    )
+
+
+def iter_batches(result_id: str, sentiment: Optional[str] = None, min_rating: Optional[float] = None,
+                 max_rating: Optional[float] = None, date_from: Optional[date] = None,
+                 date_to: Optional[date] = None) -> Iterator[List[dict]]:
+    """
+    Yields filtered rows in batches without loading the whole result set.
+    Uses Parquet predicate pushdown when available (the compacted file, or
+    the parts written so far), otherwise scans the CSV.
+    """
+    pa = _arrow()
+    filters = (sentiment, min_rating, max_rating, date_from, date_to)
+
+    if pa and (os.path.exists(parquet_path(result_id)) or os.path.isdir(_parts_dir(result_id))):
+        source = parquet_path(result_id) if os.path.exists(parquet_path(result_id)) else _parts_dir(result_id)
+        for batch in _dataset(pa, source).to_batches(filter=_filter(pa, *filters)):
+            if batch.num_rows:
+                yield batch.to_pylist()
+        return
+
+    if not os.path.exists(csv_path(result_id)):
+        return
+    with open(csv_path(result_id), newline='', encoding="utf-8") as f:
+        batch = []
+        for index, row in enumerate(csv.DictReader(f)):
+            rating = row.get("predicted_rating")
+            row["predicted_rating"] = float(rating) if rating and rating != "N/A" else None
+            record = _record(row, index)
+            if _matches(record, *filters):
+                batch.append(record)
+                if len(batch) >= RESULT_PART_ROWS:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+
+def read_results(result_id: str, offset: int = 0, limit: int = 100, **filters) -> List[dict]:
+    """
+    Returns one page of filtered rows; batches before 'offset' are skipped
+    without being converted.
+    """
+    page = []
+    for batch in iter_batches(result_id, **filters):
+        if offset >= len(batch):
+            offset -= len(batch)
+            continue
+        page.extend(batch[offset:offset + limit - len(page)])
+        offset = 0
+        if len(page) >= limit:
+            break
+    return [_public(row) for row in page]
+
+
+def _public(record: dict) -> dict:
+    record = dict(record)
+    if record.get("review_date") is not None:
+        record["review_date"] = record["review_date"].isoformat()
+    if record.get("predicted_rating") is None:
+        record["predicted_rating"] = "N/A"
+    return record
+
+
+def stream_csv(result_id: str, **filters) -> Iterator[bytes]:
+    """
+    Streams filtered rows as CSV, one batch at a time.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for batch in iter_batches(result_id, **filters):
+        writer.writerows(_public(row) for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+class _Sink(io.RawIOBase):
+    """
+    Write-only file object that hands written bytes back to a generator.
+    """
+
+    def __init__(self):
+        self.chunks, self.position = [], 0
+
+    def writable(self):
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def stream_parquet(result_id: str, **filters) -> Iterator[bytes]:
+    """
+    Streams filtered rows as a Parquet file, one row group per batch.
+    """
+    pa = _arrow()
+    if not pa:
+        raise RuntimeError("pyarrow is not installed.")
+
+    schema = _schema(pa)
+    sink = _Sink()
+    writer = pa.parquet.ParquetWriter(sink, schema)
+    try:
+        for batch in iter_batches(result_id, **filters):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def read_trends(result_id: str, granularity: str = "day", date_from: Optional[date] = None,
+                date_to: Optional[date] = None) -> dict:
+    """
+    Trend series from the totals saved by the writer (current as of its last
+    flush). Results written without them are aggregated from the stored rows.
+    """
+    if os.path.exists(trends_path(result_id)):
+        aggregator = TrendAggregator.load(trends_path(result_id))
+    else:
+        aggregator = TrendAggregator()
+        for batch in iter_batches(result_id):
+            aggregator.add_many(batch)
+    return aggregator.series(granularity, date_from, date_to)
@@ -0,0 +1,51 @@
+import os
+from typing import List
+
+from app.extractive_summarizer import summarize_extractive
+from app.metrics import register_callback
+from app.rating_predictor import get_rating_model
+
+# ⚙️ Routing settings (override via environment)
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "0") == "1"                    # opt-in: local results are extractive, not LLM summaries
+ROUTER_MAX_LOCAL_WORDS = int(os.getenv("ROUTER_MAX_LOCAL_WORDS", "40"))     # never local above this length
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.75"))  # trained-model confidence needed for the local path
+
+LOCAL, LLM = "local", "llm"
+
+# 📊 Reviews sent down each route
+router_stats = {LOCAL: 0, LLM: 0}
+register_callback("review_routes_total", "counter", "Reviews sent down each route.",
+                  lambda: {(route,): count for route, count in router_stats.items()}, ("route",))
+
+
+def choose_route(review: str, confidence: float, trained: bool = True) -> str:
+    """
+    Reviews up to ROUTER_MAX_LOCAL_WORDS long that the trained local rating
+    model is sure about take the cheap local path; long or ambiguous ones go
+    to the LLM. The keyword seed model is never trusted to replace the LLM,
+    however short the review.
+    """
+    if not ROUTER_ENABLED or not trained or confidence < ROUTER_MIN_CONFIDENCE:
+        return LLM
+    return LOCAL if len(review.split()) <= ROUTER_MAX_LOCAL_WORDS else LLM
+
+
+def route_reviews(reviews: List[str], confidences: List[float]) -> List[str]:
+    trained = ROUTER_ENABLED and get_rating_model().source == "trained"
+    routes = [choose_route(review, confidence, trained) for review, confidence in zip(reviews, confidences)]
+    router_stats[LOCAL] += routes.count(LOCAL)
+    router_stats[LLM] += routes.count(LLM)
+    return routes
+
+
+def summarize_locally(review: str, rating: int) -> dict:
+    """
+    Cheap-path result in the same shape as summarize_review().
+    """
+    return {
+        "summary": summarize_extractive(review),
+        "predicted_rating": rating,
+        "engine_used": "local",
+        "rating_source": "local",
+        "original_review": review
+    }
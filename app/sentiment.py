@@ -0,0 +1,61 @@
+import os
+from typing import List, Tuple
+
+from app.ibm_sentiment import (
+    NLU_VERSION, analyze_sentiment_ibm, analyze_sentiment_ibm_batch, watson_configured
+)
+from app.local_sentiment import analyze_sentiment_local, analyze_sentiment_local_batch
+from app.metrics import fallbacks
+
+# ⚙️ "watson", "local", or "auto" (Watson when configured, local on failure)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "auto")
+LOCAL_SENTIMENT_VERSION = "1"
+
+
+class FallbackLabel(str):
+    """
+    A local label served in place of a failed Watson call.
+    Behaves like a plain string but is never cached as a Watson result.
+    """
+
+
+def sentiment_engine() -> str:
+    """
+    The backend that actually serves requests: 'watson' or 'local'.
+    """
+    if SENTIMENT_BACKEND == "local":
+        return "local"
+    if SENTIMENT_BACKEND == "auto" and not watson_configured():
+        return "local"
+    return "watson"
+
+
+def sentiment_engine_version() -> Tuple[str, str]:
+    engine = sentiment_engine()
+    return engine, NLU_VERSION if engine == "watson" else LOCAL_SENTIMENT_VERSION
+
+
+def _with_fallback(text: str, label: str) -> str:
+    if label == "error" and SENTIMENT_BACKEND == "auto":
+        print("⚠️ [Sentiment] Watson failed, using local classifier.")
+        fallbacks.inc("watson_to_local")
+        return FallbackLabel(analyze_sentiment_local(text))
+    return label
+
+
+def analyze_sentiment(text: str) -> str:
+    """
+    Returns 'positive', 'neutral', 'negative' or 'error' from the configured backend.
+    """
+    if sentiment_engine() == "local":
+        return analyze_sentiment_local(text)
+    return _with_fallback(text, analyze_sentiment_ibm(text))
+
+
+def analyze_sentiments(texts: List[str]) -> List[str]:
+    """
+    Batch variant: Watson calls run concurrently, local runs in-process.
+    """
+    if sentiment_engine() == "local":
+        return analyze_sentiment_local_batch(texts)
+    return [_with_fallback(text, label) for text, label in zip(texts, analyze_sentiment_ibm_batch(texts))]
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class SQLiteStore:
+    """
+    Base for the SQLite-backed stores. The database file (and its directory)
+    is created on first use, not when the module is imported, so importing
+    the app leaves nothing behind in the working directory.
+    Subclasses create their tables in _create_schema().
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._ready = False
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        raise NotImplementedError
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        with self._schema_lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                with conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    self._create_schema(conn)
+            finally:
+                conn.close()
+            self._ready = True
+
+    @contextmanager
+    def _connect(self):
+        self._ensure_schema()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
@@ -1,97 +1,104 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM
-from app.ollama_handler import summarize_with_ollama
-import torch
-import re
-
-# ✅ IBM Granite 7B (Hugging Face model)
-MODEL_ID = "ibm-granite/granite-7b-base"
-print("📥 [INIT] Loading IBM Granite 7B model...")
-
-tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
-model = AutoModelForCausalLM.from_pretrained(MODEL_ID)
+from app.ollama_handler import summarize_batch_with_ollama, summarize_with_ollama
+from app.chunking import needs_chunking, summarize_chunked
+from app.model_registry import GRANITE_MODEL_ID, get_granite_engine
+from app.metrics import fallbacks, instrumented
+from app.output_parser import parse_rating
+from typing import List
+import os
+
+# ✅ IBM Granite 7B (Hugging Face model) — loaded lazily by the model registry
+MODEL_ID = GRANITE_MODEL_ID
+SUMMARY_ENGINE = os.getenv("SUMMARY_ENGINE", "ollama")  # "granite" runs the local model, with Ollama as fallback
+PROMPT_VERSION = "3"       # Bump whenever the summary prompt changes (invalidates cached results)
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "1"))  # >1 packs several reviews per generation
+
+def _granite_engine():
+    """
+    Returns the shared Granite engine, or raises while it is still loading
+    so requests fall back to Ollama instead of waiting minutes.
+    """
+    engine = get_granite_engine(wait=False)
+    if engine is None:
+        raise RuntimeError("Granite model is still loading.")
+    return engine
 
 
+@instrumented("summarize")
 def summarize_review(review: str) -> dict:
     """
     Attempts to summarize a review and predict a rating using Granite.
     Falls back to Ollama if Granite fails or is disabled.
+    Reviews too long for the model's context are map-reduced in chunks.
     """
-    prompt = f"""
-You are an AI assistant that summarizes customer reviews and predicts a star rating (1–5).
+    if needs_chunking(review, SUMMARY_ENGINE):
+        return summarize_chunked(review, _summarize_single, SUMMARY_ENGINE)
+    return _summarize_single(review)
 
-Review: "{review}"
-
-Give your response in this format:
-Summary: <summary>
-Predicted Rating: <1–5>
-"""
 
+def _summarize_single(review: str) -> dict:
     try:
-        # ❌ Temporarily disable Granite and force fallback to Ollama
-        raise RuntimeError("Granite enabled merging with Ollama fallback.")
-
-        # ✅ Uncomment to enable Granite execution later:
-        """
-        inputs = tokenizer(prompt, return_tensors="pt")
-        with torch.no_grad():
-            output = model.generate(
-                **inputs,
-                max_new_tokens=100,
-                temperature=0.7,
-                top_k=50,
-                top_p=0.9,
-                repetition_penalty=1.2,
-                pad_token_id=tokenizer.eos_token_id
-            )
-
-        full_output = tokenizer.decode(output[0], skip_special_tokens=True)
-        return parse_granite_output(full_output)
-        """
+        if SUMMARY_ENGINE != "granite":
+            raise RuntimeError(f"Granite disabled (SUMMARY_ENGINE={SUMMARY_ENGINE}).")
+
+        result = _granite_engine().summarize_batch([review])[0]
+        if result["predicted_rating"] == "N/A":
+            raise RuntimeError("Granite output could not be parsed.")
+        return result
 
     except Exception as e:
         print("⚠️ Parsing Granite review :", str(e))
-        result = summarize_with_ollama(review)
+        if SUMMARY_ENGINE == "granite":
+            fallbacks.inc("granite_to_ollama")
+        return _summarize_with_fallback(review)
 
-        # ✅ Safe rating extraction
-        result["predicted_rating"] = try_parse_rating(str(result.get("predicted_rating", "")))
 
-        # ✅ Ensure summary is present
-        result["summary"] = result.get("summary", "Summary not found")
-
-        return result
+def _summarize_with_fallback(review: str) -> dict:
+    result = summarize_with_ollama(review)
 
+    # ✅ Safe rating extraction
+    result["predicted_rating"] = parse_rating(result.get("predicted_rating"))
 
-def parse_granite_output(output: str) -> dict:
-    """
-    Extracts structured summary and rating from Granite raw output.
-    """
-    summary = "Could not extract summary"
-    rating = "N/A"
+    # ✅ Ensure summary is present
+    result["summary"] = result.get("summary", "Summary not found")
 
-    for line in output.splitlines():
-        if line.lower().startswith("summary:"):
-            summary = line.split(":", 1)[1].strip()
-        elif "predicted rating" in line.lower():
-            rating = line.split(":", 1)[1].strip()
+    return result
 
-    return {
-        "summary": summary,
-        "predicted_rating": try_parse_rating(rating),
-        "engine_used": "granite"
-    }
 
-
-def try_parse_rating(value: str):
+@instrumented("summarize_batch")
+def summarize_reviews(reviews: List[str]) -> List[dict]:
     """
-    Safely extracts a float rating from strings like '3', '4.5', 'Rating: 3.0', etc.
+    Summarizes several reviews at once, returning results in the same order.
+    Granite generates the whole list in padded batches; Ollama uses one
+    batched prompt per group when SUMMARY_BATCH_SIZE > 1.
+    Long reviews are taken out of the batch and chunked individually.
     """
-    if not isinstance(value, str):
-        value = str(value)
+    if not reviews:
+        return []
+
+    long_reviews = {i for i, review in enumerate(reviews) if needs_chunking(review, SUMMARY_ENGINE)}
+    if long_reviews:
+        short_results = iter(summarize_reviews([r for i, r in enumerate(reviews) if i not in long_reviews]))
+        return [summarize_review(review) if i in long_reviews else next(short_results)
+                for i, review in enumerate(reviews)]
 
-    match = re.search(r"\d+(\.\d+)?", value)
-    if match:
+    if SUMMARY_ENGINE == "granite":
         try:
-            return round(float(match.group()), 1)
-        except:
-            return "N/A"
-    return "N/A"
+            results = _granite_engine().summarize_batch(reviews)
+        except Exception as e:
+            print("⚠️ Granite batch failed:", str(e))
+            results = [{"predicted_rating": "N/A"}] * len(reviews)
+
+        # 🔁 Only unparseable items go to Ollama
+        fallbacks.inc("granite_to_ollama", amount=sum(1 for result in results if result["predicted_rating"] == "N/A"))
+        return [
+            result if result["predicted_rating"] != "N/A" else _summarize_with_fallback(review)
+            for review, result in zip(reviews, results)
+        ]
+
+    if SUMMARY_BATCH_SIZE <= 1 or len(reviews) == 1:
+        return [summarize_review(review) for review in reviews]
+
+    results = summarize_batch_with_ollama(reviews)
+    for result in results:
+        result["summary"] = result.get("summary", "Summary not found")
+    return results
@@ -0,0 +1,158 @@
+import json
+import os
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from app.utils import parse_review_date
+
+SENTIMENTS = ("positive", "neutral", "negative")
+GRANULARITIES = ("day", "week", "month")
+TREND_MERGE_ROWS = 2000  # rows buffered before they are folded into the daily totals
+AUTO_MAX_BUCKETS = 60    # 'auto' picks the finest granularity with at most this many periods
+
+_EPOCH = date(1970, 1, 1)
+# Columns of the per-day totals: one count per sentiment, other (errors/unknown), rating sum, rated rows
+_OTHER, _RATING_SUM, _RATED = len(SENTIMENTS), len(SENTIMENTS) + 1, len(SENTIMENTS) + 2
+_COLUMNS = len(SENTIMENTS) + 3
+_SENTIMENT_CODES = {sentiment: code for code, sentiment in enumerate(SENTIMENTS)}
+
+
+@lru_cache(maxsize=65536)
+def _day_number(value: str) -> Optional[int]:
+    # ✅ Exports repeat the same few date strings, so each distinct string is parsed once
+    parsed = parse_review_date(value)
+    return (parsed - _EPOCH).days if parsed else None
+
+
+def _rating(value) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+
+class TrendAggregator:
+    """
+    Running per-day sentiment counts, rating sums and volume for one result set.
+    Rows are buffered and folded in with NumPy grouping, so the totals stay
+    current while a job runs; week and month views are rolled up from the days.
+    """
+
+    def __init__(self):
+        self.days = np.empty(0, dtype=np.int64)      # sorted days since 1970-01-01
+        self.totals = np.zeros((0, _COLUMNS))
+        self.undated = 0
+        self._pending_days: List[int] = []
+        self._pending_codes: List[int] = []
+        self._pending_ratings: List[float] = []
+
+    def add(self, row: dict):
+        day = _day_number(row.get("date") or "")
+        if day is None:
+            self.undated += 1
+            return
+        self._pending_days.append(day)
+        self._pending_codes.append(_SENTIMENT_CODES.get(row.get("sentiment"), _OTHER))
+        self._pending_ratings.append(_rating(row.get("predicted_rating")))
+        if len(self._pending_days) >= TREND_MERGE_ROWS:
+            self.merge()
+
+    def add_many(self, rows: Iterable[dict]):
+        for row in rows:
+            self.add(row)
+        self.merge()
+
+    def merge(self):
+        if not self._pending_days:
+            return
+        days = np.asarray(self._pending_days, dtype=np.int64)
+        codes = np.asarray(self._pending_codes, dtype=np.int64)
+        ratings = np.asarray(self._pending_ratings, dtype=float)
+        self._pending_days, self._pending_codes, self._pending_ratings = [], [], []
+
+        batch_days, inverse = np.unique(days, return_inverse=True)
+        batch = np.zeros((len(batch_days), _COLUMNS))
+        batch[:, :_OTHER + 1] = np.bincount(
+            inverse * (_OTHER + 1) + codes, minlength=len(batch_days) * (_OTHER + 1)
+        ).reshape(-1, _OTHER + 1)
+        rated = ~np.isnan(ratings)
+        batch[:, _RATING_SUM] = np.bincount(inverse[rated], weights=ratings[rated], minlength=len(batch_days))
+        batch[:, _RATED] = np.bincount(inverse[rated], minlength=len(batch_days))
+
+        all_days = np.union1d(self.days, batch_days)
+        totals = np.zeros((len(all_days), _COLUMNS))
+        totals[np.searchsorted(all_days, self.days)] += self.totals
+        totals[np.searchsorted(all_days, batch_days)] += batch
+        self.days, self.totals = all_days, totals
+
+    def series(self, granularity: str = "day", date_from: Optional[date] = None,
+               date_to: Optional[date] = None) -> dict:
+        """
+        Per-period volume, sentiment counts and average rating, oldest first.
+        granularity: day, week (starting Monday), month, or auto.
+        """
+        self.merge()
+        keep = np.ones(len(self.days), dtype=bool)
+        if date_from:
+            keep &= self.days >= (date_from - _EPOCH).days
+        if date_to:
+            keep &= self.days <= (date_to - _EPOCH).days
+        days, totals = self.days[keep], self.totals[keep]
+
+        if granularity == "auto":
+            granularity = next((g for g in GRANULARITIES if len(_periods(days, g)[0]) <= AUTO_MAX_BUCKETS), "month")
+
+        periods, inverse = _periods(days, granularity)
+        grouped = np.zeros((len(periods), _COLUMNS))
+        np.add.at(grouped, inverse, totals)
+
+        buckets = []
+        for period, values in zip(periods, grouped):
+            rated = values[_RATED]
+            buckets.append({
+                "period": (_EPOCH + timedelta(days=int(period))).isoformat(),
+                "volume": int(values[:_OTHER + 1].sum()),
+                **{sentiment: int(values[code]) for sentiment, code in _SENTIMENT_CODES.items()},
+                "other": int(values[_OTHER]),
+                "average_rating": round(float(values[_RATING_SUM] / rated), 2) if rated else None
+            })
+
+        return {
+            "granularity": granularity,
+            "total": int(totals[:, :_OTHER + 1].sum()),
+            "undated": self.undated,
+            "buckets": buckets
+        }
+
+    def save(self, path: str):
+        self.merge()
+        payload = {"days": self.days.tolist(), "totals": self.totals.tolist(), "undated": self.undated}
+        # ✅ Write then rename, so a dashboard polling mid-job never reads a partial file
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "TrendAggregator":
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        aggregator = cls()
+        aggregator.days = np.asarray(payload["days"], dtype=np.int64)
+        aggregator.totals = np.asarray(payload["totals"], dtype=float).reshape(-1, _COLUMNS)
+        aggregator.undated = payload["undated"]
+        return aggregator
+
+
+def _periods(days: np.ndarray, granularity: str):
+    """
+    Maps day numbers to the first day of their period; returns (periods, inverse).
+    """
+    if granularity == "week":
+        starts = days - (days + 3) % 7  # 1970-01-01 was a Thursday
+    elif granularity == "month":
+        starts = days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    elif granularity == "day":
+        starts = days
+    else:
+        raise ValueError(f"Unknown granularity '{granularity}'.")
+    return np.unique(starts, return_inverse=True)
@@ -1,4 +1,6 @@
 import re
+from datetime import date, datetime
+from typing import Optional
 
 def validate_review(text: str) -> bool:
     """
@@ -18,3 +20,25 @@ def clean_text(text: str) -> str:
     cleaned = re.sub(r'\s+', ' ', text)
     cleaned = cleaned.strip()
     return cleaned
+
+DATE_FORMATS = ["%m/%d/%Y", "%m/%d/%y", "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S", "%d.%m.%Y", "%b %d, %Y", "%d %b %Y"]
+
+
+def parse_review_date(value: str) -> Optional[date]:
+    """
+    Parses the date formats seen in review exports (ISO dates and timestamps,
+    US-style 6/6/2025, ...). Returns None when the value is not a date.
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
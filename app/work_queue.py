@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Sequence
+
+from app.metrics import register_callback
+from app.sqlite_store import SQLiteStore
+
+# ⚙️ Work queue settings (override via environment)
+WORKER_MODE = os.getenv("WORKER_MODE", "thread")  # "queue": web processes enqueue, `python -m app.worker` processes run the work
+WORK_QUEUE_DB_PATH = os.getenv("WORK_QUEUE_DB_PATH", os.path.join("jobs", "work_queue.db"))
+WORK_QUEUE_POLL_MS = float(os.getenv("WORK_QUEUE_POLL_MS", "20"))                  # result / new task polling interval
+WORK_QUEUE_STALE_SECONDS = float(os.getenv("WORK_QUEUE_STALE_SECONDS", "60"))      # claimed tasks without a heartbeat this long are re-queued
+WORK_QUEUE_MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))           # claims before a task that keeps killing workers fails
+WORK_QUEUE_RESULT_TIMEOUT = float(os.getenv("WORK_QUEUE_RESULT_TIMEOUT", "600"))   # seconds a web request waits for its task
+
+# 🧾 Task kinds and states
+JOB_TASK, REVIEWS_TASK = "job", "reviews"
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class WorkQueue(SQLiteStore):
+    """
+    SQLite-backed task queue shared by web and worker processes on one host.
+    Claims are atomic (BEGIN IMMEDIATE), and tasks whose worker stopped
+    sending heartbeats are handed to another worker.
+    """
+
+    def __init__(self, db_path: str = WORK_QUEUE_DB_PATH):
+        super().__init__(db_path)
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT,
+                payload TEXT,
+                status TEXT,
+                worker TEXT,
+                attempts INTEGER DEFAULT 0,
+                created_at REAL,
+                heartbeat_at REAL,
+                result TEXT,
+                error TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id)")
+
+    def put(self, kind: str, payload: dict) -> int:
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO tasks (kind, payload, status, created_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False), QUEUED, time.time())
+            )
+            return cursor.lastrowid
+
+    def put_job(self, job_id: str, trace: bool = False) -> bool:
+        """
+        Queues a job task unless one is already queued or running for the job
+        (several web processes may try to resume the same job at startup).
+        """
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for row in conn.execute("SELECT payload FROM tasks WHERE kind = ? AND status IN (?, ?)",
+                                    (JOB_TASK, QUEUED, RUNNING)):
+                if json.loads(row["payload"])["job_id"] == job_id:
+                    return False
+            conn.execute(
+                "INSERT INTO tasks (kind, payload, status, created_at) VALUES (?, ?, ?, ?)",
+                (JOB_TASK, json.dumps({"job_id": job_id, "trace": trace}), QUEUED, time.time())
+            )
+            return True
+
+    def claim(self, worker: str, kinds: Sequence[str] = (JOB_TASK, REVIEWS_TASK), max_tasks: int = 1) -> List[dict]:
+        """
+        Claims the oldest queued task of the given kinds. A review task is
+        claimed together with up to 'max_tasks' - 1 more, so the worker can
+        run them as one batch. Returns [] when nothing is waiting.
+        """
+        now = time.time()
+        marks = ", ".join("?" for _ in kinds)
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._requeue_stale(conn, now)
+
+            first = conn.execute(
+                f"SELECT id, kind FROM tasks WHERE status = ? AND kind IN ({marks}) ORDER BY id LIMIT 1",
+                (QUEUED, *kinds)
+            ).fetchone()
+            if first is None:
+                return []
+
+            ids = [first["id"]]
+            if first["kind"] == REVIEWS_TASK and max_tasks > 1:
+                ids += [row["id"] for row in conn.execute(
+                    "SELECT id FROM tasks WHERE status = ? AND kind = ? AND id > ? ORDER BY id LIMIT ?",
+                    (QUEUED, REVIEWS_TASK, first["id"], max_tasks - 1)
+                )]
+
+            id_marks = ", ".join("?" for _ in ids)
+            conn.execute(
+                f"UPDATE tasks SET status = ?, worker = ?, heartbeat_at = ?, attempts = attempts + 1 "
+                f"WHERE id IN ({id_marks})",
+                (RUNNING, worker, now, *ids)
+            )
+            rows = conn.execute(f"SELECT id, kind, payload FROM tasks WHERE id IN ({id_marks}) ORDER BY id", ids)
+            return [{"id": row["id"], "kind": row["kind"], "payload": json.loads(row["payload"])} for row in rows]
+
+    def _requeue_stale(self, conn, now: float):
+        # ❌ The worker died or hung: retry elsewhere, unless the task keeps failing this way
+        stale = now - WORK_QUEUE_STALE_SECONDS
+        conn.execute(
+            "UPDATE tasks SET status = ?, error = ? WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+            (FAILED, "Worker stopped responding.", RUNNING, stale, WORK_QUEUE_MAX_ATTEMPTS)
+        )
+        conn.execute("UPDATE tasks SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                     (QUEUED, RUNNING, stale))
+
+    def heartbeat(self, worker: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE tasks SET heartbeat_at = ? WHERE status = ? AND worker = ?",
+                         (time.time(), RUNNING, worker))
+
+    def release(self, worker: str, crashed: bool = False):
+        """
+        Hands an exited worker's unfinished tasks back to the queue. A crash
+        counts as an attempt; a clean shutdown does not.
+        """
+        with self._lock, self._connect() as conn:
+            if crashed:
+                conn.execute("UPDATE tasks SET status = ?, error = ? WHERE status = ? AND worker = ? AND attempts >= ?",
+                             (FAILED, "Worker crashed.", RUNNING, worker, WORK_QUEUE_MAX_ATTEMPTS))
+            conn.execute("UPDATE tasks SET status = ?, worker = NULL, attempts = attempts - ? "
+                         "WHERE status = ? AND worker = ?", (QUEUED, 0 if crashed else 1, RUNNING, worker))
+
+    def complete(self, task_id: int, result=None):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE tasks SET status = ?, result = ? WHERE id = ?",
+                         (DONE, json.dumps(result, ensure_ascii=False), task_id))
+
+    def fail(self, task_id: int, error: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE tasks SET status = ?, error = ? WHERE id = ?", (FAILED, error, task_id))
+
+    def remove(self, task_id: int):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+
+    def get(self, task_id: int) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return dict(row) if row else None
+
+    def depth(self) -> Dict[tuple, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT kind, status, COUNT(*) AS tasks FROM tasks GROUP BY kind, status").fetchall()
+        return {(row["kind"], row["status"]): row["tasks"] for row in rows}
+
+    async def wait(self, task_id: int, timeout: float = WORK_QUEUE_RESULT_TIMEOUT):
+        """
+        Waits for a task's result and removes the task.
+        Raises RuntimeError if the task failed and TimeoutError after 'timeout'.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                task = await loop.run_in_executor(None, self.get, task_id)
+                if task is None:
+                    raise RuntimeError(f"Task {task_id} disappeared from the work queue.")
+                if task["status"] == DONE:
+                    return json.loads(task["result"])
+                if task["status"] == FAILED:
+                    raise RuntimeError(task["error"])
+                if loop.time() >= deadline:
+                    raise TimeoutError(f"No worker finished task {task_id} in {timeout}s.")
+                await asyncio.sleep(WORK_QUEUE_POLL_MS / 1000)
+        finally:
+            await loop.run_in_executor(None, self.remove, task_id)
+
+
+work_queue = WorkQueue()
+
+register_callback("review_work_queue_tasks", "gauge", "Work queue tasks by kind and state.",
+                  work_queue.depth, ("kind", "status"))
+
+
+async def process_reviews_on_workers(entries: List[Dict[str, str]]) -> List[dict]:
+    """
+    Drop-in for bulk_pipeline.process_reviews that runs the batch on a
+    worker process (WORKER_MODE=queue).
+    """
+    task_id = await asyncio.get_running_loop().run_in_executor(
+        None, work_queue.put, REVIEWS_TASK, {"entries": entries}
+    )
+    return await work_queue.wait(task_id)
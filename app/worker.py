@@ -0,0 +1,181 @@
+"""
+Inference worker pool for WORKER_MODE=queue.
+
+Web processes only accept requests and put work on the SQLite work queue;
+this command runs the pipeline in a pool of worker processes. The Granite
+model is loaded once in the parent before forking, so the children share
+its weights copy-on-write instead of loading the model once per process.
+
+Usage:
+    WORKER_MODE=queue uvicorn app.main:app --workers 4
+    WORKER_MODE=queue python -m app.worker --processes 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from app.bulk_pipeline import process_reviews
+from app.job_manager import run_queued_job
+from app.model_registry import get_model
+from app.summarizer import SUMMARY_ENGINE
+from app.work_queue import JOB_TASK, REVIEWS_TASK, WORK_QUEUE_POLL_MS, WORK_QUEUE_STALE_SECONDS, work_queue
+
+# ⚙️ Worker settings (override via environment)
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "0"))        # 0 = one per physical core (half the logical cores)
+WORKER_BATCH_TASKS = int(os.getenv("WORKER_BATCH_TASKS", "4"))    # queued /summarize batches merged into one pipeline chunk
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))    # review batches in flight per process (I/O-bound backends)
+WORKER_PRELOAD = os.getenv("WORKER_PRELOAD", "1") == "1"          # load models before forking so children share them
+
+
+def _physical_cores() -> int:
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _worker_id(pid: int) -> str:
+    return f"{socket.gethostname()}:{pid}"
+
+
+async def _run_reviews(tasks: list):
+    """
+    Runs several queued review batches as one chunk and splits the results back.
+    """
+    entries = [entry for task in tasks for entry in task["payload"]["entries"]]
+    try:
+        results = await process_reviews(entries)
+    except Exception as e:
+        print("❌ [Worker] Review batch failed:", str(e))
+        for task in tasks:
+            work_queue.fail(task["id"], str(e))
+        return
+
+    offset = 0
+    for task in tasks:
+        size = len(task["payload"]["entries"])
+        work_queue.complete(task["id"], results[offset:offset + size])
+        offset += size
+
+
+def _run_job_task(task: dict):
+    try:
+        run_queued_job(task["payload"]["job_id"], task["payload"].get("trace", False))
+    finally:
+        work_queue.remove(task["id"])
+
+
+async def _serve(worker: str, stop: threading.Event):
+    """
+    Claims tasks until 'stop' is set. A job runs on its own thread (one at a
+    time per process) while review batches keep being served alongside it.
+    """
+    inflight = set()
+    job_thread = None
+    poll = WORK_QUEUE_POLL_MS / 1000
+
+    while not stop.is_set():
+        job_free = job_thread is None or not job_thread.is_alive()
+        tasks = []
+        if len(inflight) < WORKER_CONCURRENCY:
+            kinds = (JOB_TASK, REVIEWS_TASK) if job_free else (REVIEWS_TASK,)
+            tasks = work_queue.claim(worker, kinds, WORKER_BATCH_TASKS)
+
+        if not tasks:
+            if inflight:
+                await asyncio.wait(inflight, timeout=poll, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(poll)
+            continue
+
+        if tasks[0]["kind"] == JOB_TASK:
+            print(f"📥 [Worker {worker}] Running job {tasks[0]['payload']['job_id']}")
+            job_thread = threading.Thread(target=_run_job_task, args=(tasks[0],), name="job", daemon=True)
+            job_thread.start()
+        else:
+            task = asyncio.ensure_future(_run_reviews(tasks))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+
+    # ✅ Finish batches already claimed; a running job is handed back once the process exits
+    if inflight:
+        await asyncio.gather(*inflight, return_exceptions=True)
+
+
+def _child(index: int, processes: int):
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    if SUMMARY_ENGINE == "granite":
+        from app.granite_engine import configure_cpu_threads
+        # ✅ Split the cores between processes instead of oversubscribing them
+        threads = configure_cpu_threads(max(1, _physical_cores() // processes))
+        print(f"🧵 [Worker {index}] Using {threads} CPU threads")
+
+    worker = _worker_id(os.getpid())
+
+    def heartbeat():
+        while not stop.wait(WORK_QUEUE_STALE_SECONDS / 4):
+            work_queue.heartbeat(worker)
+
+    threading.Thread(target=heartbeat, name="heartbeat", daemon=True).start()
+    print(f"✅ [Worker {index}] Ready (pid {os.getpid()})")
+    asyncio.run(_serve(worker, stop))
+    print(f"🛑 [Worker {index}] Stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=WORKER_PROCESSES or _physical_cores())
+    parser.add_argument("--no-preload", action="store_true", help="let each process load the models itself")
+    args = parser.parse_args()
+
+    if WORKER_PRELOAD and not args.no_preload:
+        # ✅ Loaded once; forked children share the weights copy-on-write
+        for name in ["rating"] + (["granite"] if SUMMARY_ENGINE == "granite" else []):
+            try:
+                get_model(name)
+            except Exception:
+                pass  # ❌ Each child retries (and falls back) on first use
+
+    context = multiprocessing.get_context("fork")
+    stopping = threading.Event()
+
+    def start(index: int):
+        process = context.Process(target=_child, args=(index, args.processes), name=f"worker-{index}")
+        process.start()
+        return process
+
+    def shutdown(*_):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    children = {index: start(index) for index in range(args.processes)}
+    print(f"🚀 Started {args.processes} worker processes ({SUMMARY_ENGINE} engine)")
+
+    # 🔁 Replace workers that crash and hand their claimed tasks to the others
+    while not stopping.wait(1):
+        for index, process in children.items():
+            if not process.is_alive():
+                print(f"⚠️ Worker {index} exited with code {process.exitcode}; restarting")
+                work_queue.release(_worker_id(process.pid), crashed=True)
+                children[index] = start(index)
+
+    for process in children.values():
+        process.terminate()
+    deadline = time.time() + 30
+    for process in children.values():
+        process.join(max(0.0, deadline - time.time()))
+        if process.is_alive():
+            process.kill()
+            process.join()
+        work_queue.release(_worker_id(process.pid), crashed=process.exitcode != 0)
+
+
+if __name__ == "__main__":
+    main()
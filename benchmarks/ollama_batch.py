@@ -0,0 +1,47 @@
+"""
+Compares Ollama throughput for single-review prompts against batched prompts.
+
+Usage (with Ollama running locally):
+    python -m benchmarks.ollama_batch --csv Data/sample_reviews_15_mixed.csv --batch-sizes 1 4 8
+"""
+import argparse
+import time
+
+from app.file_upload import iter_csv_reviews
+from app.ollama_handler import summarize_batch_with_ollama, summarize_with_ollama
+
+
+def run(reviews, batch_size: int) -> dict:
+    start = time.perf_counter()
+    if batch_size <= 1:
+        results = [summarize_with_ollama(review) for review in reviews]
+    else:
+        results = []
+        for i in range(0, len(reviews), batch_size):
+            results.extend(summarize_batch_with_ollama(reviews[i:i + batch_size]))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "batch_size": batch_size,
+        "reviews": len(results),
+        "seconds": round(elapsed, 2),
+        "reviews_per_sec": round(len(results) / elapsed, 2) if elapsed else None,
+        "batched_items": sum(1 for r in results if r.get("engine_used") == "ollama-batch"),
+        "failed": sum(1 for r in results if r.get("predicted_rating") == "N/A")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--csv", default="Data/sample_reviews_15_mixed.csv")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--limit", type=int, default=32)
+    args = parser.parse_args()
+
+    reviews = [row["review"] for _, row in zip(range(args.limit), iter_csv_reviews(args.csv))]
+    for batch_size in args.batch_sizes:
+        print(run(reviews, batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Prefill time saved by prompt prefix caching.
+
+Granite (in-process): for each review, times the prompt prefill (one forward
+pass over the prompt) for the full prompt and for the review suffix on top
+of the cached instruction-block key/values, then checks that greedy outputs
+with and without the cache match. Without --model a small randomly
+initialized Llama with a byte-level BPE tokenizer trained on the sample
+reviews is used, so it runs anywhere; the relative saving carries over to
+the real model, the absolute times do not.
+
+Ollama (optional, --ollama-host): sends the reviews one after another with
+keep_alive and reports prompt_eval_count / prompt_eval_duration from the
+replies. Once the shared prefix is cached the server only evaluates the
+tokens after it.
+
+Usage (from the repository root):
+    python -m benchmarks.prefix_cache --reviews 50
+    python -m benchmarks.prefix_cache --model ./models/granite7b-base --reviews 20
+    python -m benchmarks.prefix_cache --ollama-host http://localhost:11434 --reviews 20
+"""
+import argparse
+import copy
+import os
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks.synthetic_data import SEED_CSV, generate_reviews, load_sentences
+
+
+def tiny_engine(corpus: List[str]):
+    """
+    GraniteEngine around a 4-layer random Llama and a BPE tokenizer trained on 'corpus'.
+    """
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, processors, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+    from app.granite_engine import GraniteEngine
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(corpus, trainers.BpeTrainer(
+        vocab_size=2000, special_tokens=["<s>", "</s>"], initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    tokenizer.post_processor = processors.TemplateProcessing(single="<s> $A", special_tokens=[("<s>", 0)])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>")
+
+    torch.manual_seed(0)
+    model = LlamaForCausalLM(LlamaConfig(
+        vocab_size=len(tokenizer), hidden_size=256, intermediate_size=688, num_hidden_layers=4,
+        num_attention_heads=4, num_key_value_heads=4, max_position_embeddings=2048,
+        bos_token_id=0, eos_token_id=1
+    ))
+    return GraniteEngine(model, tokenizer, max_new_tokens=16)
+
+
+def load_engine(model_path: str):
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    from app.granite_engine import GraniteEngine
+
+    return GraniteEngine(AutoModelForCausalLM.from_pretrained(model_path, low_cpu_mem_usage=True),
+                         AutoTokenizer.from_pretrained(model_path), max_new_tokens=16)
+
+
+def bench_granite(engine, reviews: List[str], check: int) -> dict:
+    import torch
+    from app.granite_engine import GRANITE_PROMPT_PREFIX, build_granite_prompt, build_granite_suffix
+
+    tokenizer, model = engine.tokenizer, engine.model
+    device = next(model.parameters()).device
+    prefix_ids, past = engine.prefix_cache(GRANITE_PROMPT_PREFIX)
+
+    full_times, cached_times, suffix_tokens = [], [], []
+    with torch.inference_mode():
+        model(input_ids=prefix_ids)  # warm-up
+        for review in reviews:
+            full_ids = tokenizer(build_granite_prompt(review), return_tensors="pt")["input_ids"].to(device)
+            start = time.perf_counter()
+            model(input_ids=full_ids, use_cache=True)
+            full_times.append(time.perf_counter() - start)
+
+            suffix_ids = tokenizer(build_granite_suffix(review), return_tensors="pt",
+                                   add_special_tokens=False)["input_ids"].to(device)
+            start = time.perf_counter()
+            model(input_ids=suffix_ids, past_key_values=copy.deepcopy(past), use_cache=True)
+            cached_times.append(time.perf_counter() - start)
+            suffix_tokens.append(suffix_ids.shape[1])
+
+    # ✅ Same greedy output with and without the cache (batched, so padding is exercised too)
+    sample = reviews[:check]
+    uncached = engine.generate_texts([build_granite_prompt(review) for review in sample])
+    cached = engine.generate_texts([build_granite_suffix(review) for review in sample], GRANITE_PROMPT_PREFIX)
+
+    full_ms, cached_ms = np.mean(full_times) * 1000, np.mean(cached_times) * 1000
+    return {
+        "reviews": len(reviews),
+        "prefix_tokens": int(prefix_ids.shape[1]),
+        "mean_suffix_tokens": round(float(np.mean(suffix_tokens)), 1),
+        "prefill_full_ms": round(float(full_ms), 3),
+        "prefill_cached_ms": round(float(cached_ms), 3),
+        "saved_ms_per_review": round(float(full_ms - cached_ms), 3),
+        "saved_share": round(float(1 - cached_ms / full_ms), 3),
+        "outputs_identical": f"{sum(a == b for a, b in zip(uncached, cached))}/{len(sample)}"
+    }
+
+
+def bench_ollama(reviews: List[str]) -> dict:
+    from app.ollama_client import OLLAMA_KEEP_ALIVE, generate
+    from app.ollama_handler import OLLAMA_MODEL, build_ollama_prompt
+
+    counts, durations = [], []
+    for review in reviews:
+        reply = generate({"model": OLLAMA_MODEL, "prompt": build_ollama_prompt(review), "stream": False,
+                          "options": {"num_predict": 1}})
+        counts.append(reply.get("prompt_eval_count"))
+        durations.append(reply.get("prompt_eval_duration"))
+
+    if None in counts[1:] or None in durations[1:]:
+        return {"reviews": len(reviews), "note": "server did not report prompt_eval_count/prompt_eval_duration"}
+    return {
+        "reviews": len(reviews),
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "first_prompt_eval_tokens": counts[0],
+        "mean_prompt_eval_tokens_after": round(float(np.mean(counts[1:])), 1),
+        "first_prompt_eval_ms": round(durations[0] / 1e6, 2),
+        "mean_prompt_eval_ms_after": round(float(np.mean(durations[1:])) / 1e6, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reviews", type=int, default=50)
+    parser.add_argument("--mean-words", type=float, default=25)
+    parser.add_argument("--model", help="local Hugging Face model directory (default: tiny random Llama)")
+    parser.add_argument("--check", type=int, default=8, help="reviews generated with and without the cache")
+    parser.add_argument("--ollama-host", help="also measure an Ollama server")
+    args = parser.parse_args()
+
+    if args.ollama_host:
+        os.environ["OLLAMA_HOST"] = args.ollama_host  # read when app.ollama_client is imported
+
+    reviews = [entry["review"] for entry in generate_reviews(args.reviews, mean_words=args.mean_words, seed=1)]
+
+    if args.model:
+        engine = load_engine(args.model)
+    else:
+        from app.granite_engine import GRANITE_PROMPT_PREFIX
+        engine = tiny_engine(load_sentences(SEED_CSV) + [GRANITE_PROMPT_PREFIX])
+
+    print("⏱️ Granite prefill, full prompt vs. cached prefix:")
+    for name, value in bench_granite(engine, reviews, args.check).items():
+        print(f"  {name:<22} {value}")
+
+    if args.ollama_host:
+        print(f"⏱️ Ollama prompt evaluation at {args.ollama_host}:")
+        for name, value in bench_ollama(reviews).items():
+            print(f"  {name:<32} {value}")
+
+
+if __name__ == "__main__":
+    main()
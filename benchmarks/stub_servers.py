@@ -0,0 +1,171 @@
+"""
+Local stand-ins for Ollama and Watson NLU with configurable latency, so the
+pipeline can be load tested without models, GPUs or cloud credentials.
+
+Usage (standalone, e.g. to point a running server at them):
+    python -m benchmarks.stub_servers --ollama-latency 0.2 --watson-latency 0.05
+    OLLAMA_HOST=http://127.0.0.1:11500 WATSON_URL=http://127.0.0.1:8765 WATSON_AUTH_TYPE=none uvicorn app.main:app
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NEGATIVE_HINTS = ("rude", "dirty", "slow", "noisy", "broken", "terrible", "worst", "unhelpful", "flicker", "cold")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        server = self.server
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+
+
+def _rating_for(text: str) -> int:
+    return 2 if any(hint in text.lower() for hint in NEGATIVE_HINTS) else 4
+
+
+class _OllamaHandler(_Handler):
+    """
+    /api/generate: plain "Summary/Predicted Rating" replies, JSON replies for
+    batched prompts and 'format': 'json' requests, and NDJSON streaming when
+    'stream' is set.
+    """
+
+    def do_POST(self):
+        payload = self._read_json()
+        prompt = payload.get("prompt", "")
+        self._delay()
+
+        if '"results"' in prompt:
+            items = re.findall(r'^(\d+)\. "(.*)"$', prompt, re.M)
+            reply = json.dumps({"results": [
+                {"id": int(number), "summary": " ".join(text.split()[:12]), "rating": _rating_for(text)}
+                for number, text in items
+            ]})
+        else:
+            review = re.search(r'Review: "(.*?)"\n', prompt, re.S)
+            text = review.group(1) if review else prompt
+            if payload.get("format") == "json":
+                reply = json.dumps({"summary": " ".join(text.split()[:12]), "rating": _rating_for(text)})
+            else:
+                reply = f"Summary: {' '.join(text.split()[:12])}\nPredicted Rating: {_rating_for(text)}"
+
+        if not payload.get("stream"):
+            self._send_json(200, {"model": payload.get("model"), "response": reply, "done": True})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in re.findall(r"\S+\s*", reply) + [None]:
+            line = (json.dumps({"response": token or "", "done": token is None}) + "\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+            time.sleep(self.server.token_latency)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _WatsonHandler(_Handler):
+    """
+    Watson NLU /v1/analyze: document sentiment, with an optional share of
+    429 responses to exercise the client's retry path.
+    """
+
+    def do_POST(self):
+        payload = self._read_json()
+        self._delay()
+        if random.random() < self.server.error_rate:
+            self._send_json(429, {"error": "Too Many Requests", "code": 429}, {"Retry-After": "0.1"})
+            return
+
+        text = payload.get("text", "")
+        negative = any(hint in text.lower() for hint in NEGATIVE_HINTS)
+        label, score = ("negative", -0.6) if negative else ("positive", 0.7)
+        self._send_json(200, {"language": "en", "sentiment": {"document": {"label": label, "score": score}}})
+
+
+class StubServer:
+    """
+    Runs a stub on a background thread; usable as a context manager.
+    """
+
+    def __init__(self, handler, port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, token_latency: float = 0.0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self.server.latency, self.server.jitter = latency, jitter
+        self.server.error_rate, self.server.token_latency = error_rate, token_latency
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def stub_ollama(port: int = 0, latency: float = 0.2, jitter: float = 0.0, token_latency: float = 0.005) -> StubServer:
+    return StubServer(_OllamaHandler, port, latency, jitter, token_latency=token_latency)
+
+
+def stub_watson(port: int = 0, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0) -> StubServer:
+    return StubServer(_WatsonHandler, port, latency, jitter, error_rate=error_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--ollama-latency", type=float, default=0.2)
+    parser.add_argument("--watson-port", type=int, default=8765)
+    parser.add_argument("--watson-latency", type=float, default=0.05)
+    parser.add_argument("--watson-error-rate", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    args = parser.parse_args()
+
+    ollama = stub_ollama(args.ollama_port, args.ollama_latency, args.jitter).start()
+    watson = stub_watson(args.watson_port, args.watson_latency, args.jitter, args.watson_error_rate).start()
+    print(f"🧪 Stub Ollama at {ollama.url}, stub Watson NLU at {watson.url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        ollama.stop()
+        watson.stop()
+
+
+if __name__ == "__main__":
+    main()
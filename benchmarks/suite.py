@@ -0,0 +1,288 @@
+"""
+End-to-end benchmark of the review pipeline against stub Ollama and Watson
+servers, so throughput and latency regressions show up before deployment.
+
+Scenarios:
+    startup    time from launching the API server until /health answers
+    parse      save_and_parse_csv on a synthetic upload (in a separate process)
+    bulk       POST /upload/summarize_all with the synthetic CSV
+    summarize  concurrent POST /summarize requests
+
+Each scenario reports rows/sec, p50/p95/p99 latency (seconds) and the peak
+memory (MB) of the process under test. The API server runs in its own
+uvicorn process, so its numbers exclude the load generator and the stubs.
+
+Usage (from the repository root):
+    python -m benchmarks.suite --rows 2000 --ollama-latency 0.2 --watson-latency 0.05
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --baseline bench.json --tolerance 0.15   # exit code 1 on regression
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.stub_servers import stub_ollama, stub_watson
+from benchmarks.synthetic_data import generate_reviews, write_csv
+
+SCENARIOS = ("startup", "parse", "bulk", "summarize")
+STARTUP_TIMEOUT = 120
+
+
+def percentiles(latencies: List[float]) -> dict:
+    if not latencies:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50": round(float(p50), 4), "p95": round(float(p95), 4), "p99": round(float(p99), 4)}
+
+
+def peak_memory_mb(pid: int) -> Optional[float]:
+    """
+    High-water mark of a process's resident memory (Linux /proc), or None elsewhere.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ApiServer:
+    """
+    The FastAPI app under uvicorn in a child process, pointed at the stubs.
+    """
+
+    def __init__(self, env: Dict[str, str]):
+        self.env, self.port = env, _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+        self.startup_seconds = None
+
+    def __enter__(self):
+        os.makedirs("output", exist_ok=True)  # mounted as static files by app.main
+        start = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(self.port), "--log-level", "warning"],
+            env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        while time.perf_counter() - start < STARTUP_TIMEOUT:
+            if self.process.poll() is not None:
+                raise RuntimeError("API server exited during startup.")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    self.startup_seconds = time.perf_counter() - start
+                    return self
+            except httpx.TransportError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError("API server did not start in time.")
+
+    def peak_memory_mb(self) -> Optional[float]:
+        return peak_memory_mb(self.process.pid)
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def bench_startup(env: dict, repeat: int) -> dict:
+    timings, memory = [], []
+    for _ in range(repeat):
+        with ApiServer(env) as server:
+            timings.append(server.startup_seconds)
+            memory.append(server.peak_memory_mb())
+    return {"runs": repeat, "rows_per_sec": None, **percentiles(timings),
+            "peak_memory_mb": max(memory) if None not in memory else None}
+
+
+def bench_parse(env: dict, csv_path: str, repeat: int) -> dict:
+    # ✅ Own process, so peak memory is the parser's alone
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--parse-worker", csv_path, "--repeat", str(repeat)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _parse_worker(csv_path: str, repeat: int):
+    from starlette.datastructures import UploadFile
+    from app.file_upload import UPLOAD_DIR, save_and_parse_csv
+
+    timings, rows = [], 0
+    for run in range(repeat):
+        with open(csv_path, "rb") as f:
+            start = time.perf_counter()
+            rows = len(save_and_parse_csv(UploadFile(f, filename=os.path.basename(csv_path)),
+                                          save_as=f"bench_parse_{os.getpid()}_{run}.csv"))
+            timings.append(time.perf_counter() - start)
+        os.remove(os.path.join(UPLOAD_DIR, f"bench_parse_{os.getpid()}_{run}.csv"))
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # kilobytes on Linux
+    print(json.dumps({"runs": repeat, "rows": rows, "rows_per_sec": round(rows / np.median(timings), 1),
+                      **percentiles(timings), "peak_memory_mb": round(peak_kb / 1024, 1)}))
+
+
+def bench_bulk(env: dict, csv_path: str, rows: int, repeat: int) -> dict:
+    timings = []
+    with ApiServer(env) as server:
+        for _ in range(repeat):
+            with open(csv_path, "rb") as f:
+                start = time.perf_counter()
+                response = httpx.post(f"{server.url}/upload/summarize_all", timeout=None,
+                                      files={"file": ("bench.csv", f, "text/csv")}, data={"include_data": "false"})
+                timings.append(time.perf_counter() - start)
+            response.raise_for_status()
+        memory = server.peak_memory_mb()
+    return {"runs": repeat, "rows": rows, "rows_per_sec": round(rows / np.median(timings), 1),
+            **percentiles(timings), "peak_memory_mb": memory}
+
+
+def bench_summarize(env: dict, reviews: List[str], requests: int, concurrency: int) -> dict:
+    with ApiServer(env) as server, httpx.Client(base_url=server.url, timeout=None,
+                                                limits=httpx.Limits(max_connections=concurrency)) as client:
+        def call(index: int):
+            start = time.perf_counter()
+            response = client.post("/summarize", data={"review": reviews[index % len(reviews)]})
+            return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(call, range(requests)))
+        elapsed = time.perf_counter() - start
+        memory = server.peak_memory_mb()
+
+    latencies = [latency for latency, status in results if status == 200]
+    return {"requests": requests, "concurrency": concurrency, "errors": requests - len(latencies),
+            "rows_per_sec": round(len(latencies) / elapsed, 1), **percentiles(latencies), "peak_memory_mb": memory}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Lists metrics that got worse than the baseline by more than 'tolerance' (a fraction).
+    """
+    regressions = []
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if not previous:
+            continue
+        for metric, higher_is_better in (("rows_per_sec", True), ("p95", False), ("peak_memory_mb", False)):
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{scenario}.{metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def print_report(results: dict):
+    print(f"\n{'scenario':<10} {'rows/sec':>10} {'p50':>8} {'p95':>8} {'p99':>8} {'peak MB':>9}")
+    for scenario, result in results.items():
+        cells = [result.get(key) for key in ("rows_per_sec", "p50", "p95", "p99", "peak_memory_mb")]
+        print(f"{scenario:<10} " + " ".join(f"{'-' if v is None else v:>{w}}" for v, w in zip(cells, (10, 8, 8, 8, 9))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--rows", type=int, default=1000, help="rows in the synthetic CSV")
+    parser.add_argument("--mean-words", type=float, default=25)
+    parser.add_argument("--sigma", type=float, default=0.6)
+    parser.add_argument("--repeat", type=int, default=3, help="runs of the startup, parse and bulk scenarios")
+    parser.add_argument("--requests", type=int, default=200, help="/summarize requests")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--ollama-latency", type=float, default=0.2)
+    parser.add_argument("--watson-latency", type=float, default=0.05)
+    parser.add_argument("--watson-error-rate", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--sentiment-backend", default="watson", choices=["watson", "local", "auto"])
+    parser.add_argument("--cache", action="store_true", help="keep the result cache on (off by default)")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--parse-worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.parse_worker:
+        _parse_worker(args.parse_worker, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="review-bench-") as workdir, \
+            stub_ollama(latency=args.ollama_latency, jitter=args.jitter) as ollama, \
+            stub_watson(latency=args.watson_latency, jitter=args.jitter, error_rate=args.watson_error_rate) as watson:
+        csv_path = write_csv(os.path.join(workdir, "reviews.csv"), args.rows,
+                             mean_words=args.mean_words, sigma=args.sigma)
+        env = {
+            **os.environ,
+            "OLLAMA_HOST": ollama.url,
+            "WATSON_URL": watson.url,
+            "WATSON_API_KEY": "benchmark",
+            "WATSON_AUTH_TYPE": "none",
+            "SENTIMENT_BACKEND": args.sentiment_backend,
+            "SUMMARY_ENGINE": "ollama",
+            "RESULT_CACHE_ENABLED": "1" if args.cache else "0",
+            # ✅ Keep benchmark state out of the real stores
+            "RESULT_CACHE_DB_PATH": os.path.join(workdir, "cache.db"),
+            "RESULTS_DIR": os.path.join(workdir, "results"),
+            "JOB_DB_PATH": os.path.join(workdir, "jobs.db"),
+            "DATASET_DB_PATH": os.path.join(workdir, "datasets.db"),
+            "WORK_QUEUE_DB_PATH": os.path.join(workdir, "work_queue.db"),
+            "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+            "OUTPUT_DIR": os.path.join(workdir, "output"),
+        }
+        os.makedirs(env["OUTPUT_DIR"])  # ✅ The API serves it as static files, so it must exist at startup
+        print(f"🧪 {args.rows} synthetic rows, Ollama latency {args.ollama_latency}s, "
+              f"Watson latency {args.watson_latency}s ({args.sentiment_backend} sentiment)")
+
+        results = {}
+        for scenario in args.scenarios:
+            print(f"⏱️ Running {scenario}...")
+            if scenario == "startup":
+                results[scenario] = bench_startup(env, args.repeat)
+            elif scenario == "parse":
+                results[scenario] = bench_parse(env, csv_path, args.repeat)
+            elif scenario == "bulk":
+                results[scenario] = bench_bulk(env, csv_path, args.rows, args.repeat)
+            else:
+                reviews = [entry["review"] for entry in generate_reviews(min(args.requests, args.rows), seed=1)]
+                results[scenario] = bench_summarize(env, reviews, args.requests, args.concurrency)
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Regressions against baseline:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("✅ No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
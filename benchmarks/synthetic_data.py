@@ -0,0 +1,92 @@
+"""
+Generates synthetic review CSVs for load testing, seeded from a real sample.
+
+Review lengths follow a log-normal distribution (in words); sentences are
+drawn from the seed file so vocabulary and sentiment mix stay realistic.
+Dates are spread over a range and written in the mixed formats real exports use.
+
+Usage:
+    python -m benchmarks.synthetic_data --rows 10000 --out /tmp/reviews_10k.csv
+    python -m benchmarks.synthetic_data --rows 1000 --mean-words 120 --sigma 0.8 --out /tmp/long.csv
+"""
+import argparse
+import csv
+import math
+import random
+from datetime import date, datetime, timedelta
+from typing import List
+
+from app.extractive_summarizer import split_sentences
+from app.file_upload import iter_csv_reviews
+
+SEED_CSV = "Data/sample_reviews_15_mixed.csv"
+DATE_STYLES = (
+    lambda d: f"{d.month}/{d.day}/{d.year}",                                  # 6/6/2025
+    lambda d: d.isoformat(),                                                  # 2025-06-06
+    lambda d: datetime(d.year, d.month, d.day, 9, 15).isoformat(),            # 2025-06-06T09:15:00
+)
+
+
+def load_sentences(seed_csv: str = SEED_CSV) -> List[str]:
+    sentences = []
+    for entry in iter_csv_reviews(seed_csv):
+        sentences.extend(split_sentences(entry["review"]))
+    return sentences
+
+
+def generate_reviews(rows: int, mean_words: float = 25, sigma: float = 0.6, seed: int = 0,
+                     seed_csv: str = SEED_CSV, days: int = 90, start: date = date(2025, 6, 1),
+                     duplicate_rate: float = 0.0):
+    """
+    Yields {review, date} dicts. 'duplicate_rate' repeats earlier reviews
+    verbatim, like re-posted or templated feedback.
+    """
+    rng = random.Random(seed)
+    sentences = load_sentences(seed_csv)
+    mu = max(0.0, math.log(mean_words) - sigma ** 2 / 2)  # log-normal with the requested mean
+    recent: List[str] = []
+
+    for _ in range(rows):
+        if recent and rng.random() < duplicate_rate:
+            review = rng.choice(recent)
+        else:
+            target = max(3, int(rng.lognormvariate(mu, sigma)))
+            parts, words = [], 0
+            while words < target:
+                sentence = rng.choice(sentences)
+                parts.append(sentence)
+                words += len(sentence.split())
+            review = " ".join(parts)
+            if len(recent) < 1000:
+                recent.append(review)
+
+        day = start + timedelta(days=rng.randrange(days))
+        yield {"review": review, "date": rng.choice(DATE_STYLES)(day)}
+
+
+def write_csv(path: str, rows: int, **options) -> str:
+    with open(path, "w", newline='', encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["review", "date"])
+        writer.writeheader()
+        writer.writerows(generate_reviews(rows, **options))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--out", default="synthetic_reviews.csv")
+    parser.add_argument("--mean-words", type=float, default=25)
+    parser.add_argument("--sigma", type=float, default=0.6, help="log-normal spread of review length")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seed-csv", default=SEED_CSV)
+    args = parser.parse_args()
+
+    write_csv(args.out, args.rows, mean_words=args.mean_words, sigma=args.sigma, seed=args.seed,
+              seed_csv=args.seed_csv, duplicate_rate=args.duplicate_rate)
+    print(f"✅ Wrote {args.rows} synthetic reviews to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -75,20 +75,28 @@ window.addEventListener("DOMContentLoaded", () => {
     formData.append("review", review);
 
     try {
-      const res = await fetch("/summarize", {
-        method: "POST",
-        body: formData
-      });
+      // ✅ Show the summary as it is generated, then the final result
+      inputReview.innerText = review;
+      summaryOutput.innerText = "";
+      ratingOutput.innerText = "…";
+      sentimentOutput.innerText = "…";
+      outputSection.style.display = "block";
 
-      const data = await res.json();
+      let data = await streamSummary(formData);
+      if (!data) {
+        // ❌ Streaming unavailable — fall back to the regular endpoint
+        const res = await fetch("/summarize", {
+          method: "POST",
+          body: formData
+        });
+        data = await res.json();
+      }
 
       inputReview.innerText = data.original_review || "[Review not returned]";
       summaryOutput.innerText = data.summary || "[Summary missing]";
       ratingOutput.innerText = data.predicted_rating ? `⭐ ${data.predicted_rating} / 5` : "Not available";
       sentimentOutput.innerText = data.sentiment || "Not detected";
 
-      outputSection.style.display = "block";
-
       trendSection.classList.remove("hidden");
       const ctx = chartEl.getContext("2d");
       if (window.sentimentChartInstance) window.sentimentChartInstance.destroy();
@@ -124,6 +132,41 @@ window.addEventListener("DOMContentLoaded", () => {
     }
   });
 
+  // 📡 Reads NDJSON events from /summarize/stream; returns the final result or null
+  async function streamSummary(formData) {
+    const res = await fetch("/summarize/stream", {
+      method: "POST",
+      body: formData
+    });
+    if (!res.ok || !res.body) return null;
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let result = null;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const lines = buffer.split("\n");
+      buffer = lines.pop();
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const event = JSON.parse(line);
+        if (event.type === "summary") {
+          summaryOutput.innerText = event.text;
+        } else if (event.type === "rating") {
+          ratingOutput.innerText = `⭐ ${event.value} / 5`;
+        } else if (event.type === "result") {
+          result = event;
+        }
+      }
+    }
+    return result;
+  }
+
   uploadBtn.addEventListener("click", async () => {
     const file = document.getElementById("fileUpload").files[0];
     if (!file) return alert("Please upload a CSV file.");
@@ -143,8 +186,6 @@ window.addEventListener("DOMContentLoaded", () => {
       if (!results.length) return alert("No reviews found.");
 
       let combinedText = "";
-      const dateSentimentMap = {};
-      const reviewNumbersMap = {};  // ✅ To track review indexes for each sentiment/date
 
       reviewCardsContainer.classList.remove("hidden");
       reviewCardsContainer.innerHTML = "";
@@ -154,19 +195,6 @@ window.addEventListener("DOMContentLoaded", () => {
         const sentiment = item.sentiment || "unknown";
         const date = item.date || item.timestamp || "Unknown Date";
 
-        // Initialize maps
-        if (!dateSentimentMap[date]) {
-          dateSentimentMap[date] = { positive: 0, neutral: 0, negative: 0 };
-        }
-        if (!reviewNumbersMap[date]) {
-          reviewNumbersMap[date] = { positive: [], neutral: [], negative: [] };
-        }
-
-        if (["positive", "neutral", "negative"].includes(sentiment)) {
-          dateSentimentMap[date][sentiment]++;
-          reviewNumbersMap[date][sentiment].push(idx + 1);
-        }
-
         const card = document.createElement("div");
         card.className = "bg-white text-black p-4 rounded-xl shadow-md mb-4";
         card.innerHTML = `
@@ -182,10 +210,12 @@ window.addEventListener("DOMContentLoaded", () => {
         combinedText += `${reviewNum} (${date})\nOriginal: ${item.original_review || item.review}\nSummary: ${item.summary}\nRating: ${item.predicted_rating}\nSentiment: ${item.sentiment}\n\n`;
       });
 
-      const dates = Object.keys(dateSentimentMap).sort();
-      const pos = dates.map(d => dateSentimentMap[d].positive || 0);
-      const neu = dates.map(d => dateSentimentMap[d].neutral || 0);
-      const neg = dates.map(d => dateSentimentMap[d].negative || 0);
+      // 📈 Counts per period are aggregated on the server (json.trends)
+      const buckets = (json.trends && json.trends.buckets) || [];
+      const dates = buckets.map(b => b.period);
+      const pos = buckets.map(b => b.positive);
+      const neu = buckets.map(b => b.neutral);
+      const neg = buckets.map(b => b.negative);
 
       trendSection.classList.remove("hidden");
       const ctx = chartEl.getContext("2d");
@@ -224,11 +254,12 @@ window.addEventListener("DOMContentLoaded", () => {
               intersect: false,
               callbacks: {
                 label: function (context) {
-                  const sentiment = context.dataset.label.toLowerCase();
-                  const date = context.label;
-                  const value = context.raw;
-                  const reviews = reviewNumbersMap[date]?.[sentiment]?.join(", ") || "–";
-                  return `${context.dataset.label}: ${value} (Review ${reviews})`;
+                  return `${context.dataset.label}: ${context.raw}`;
+                },
+                footer: function (items) {
+                  const bucket = buckets[items[0].dataIndex];
+                  const rating = bucket.average_rating ?? "N/A";
+                  return `Reviews: ${bucket.volume} · Avg rating: ${rating}`;
                 }
               }
             },
@@ -243,7 +274,7 @@ window.addEventListener("DOMContentLoaded", () => {
           scales: {
             x: {
               stacked: false,
-              title: { display: true, text: "Date" }
+              title: { display: true, text: `Date (per ${json.trends?.granularity || "day"})` }
             },
             y: {
               stacked: false,
@@ -0,0 +1,13 @@
+import os
+import tempfile
+
+# ✅ Keep the stores out of the working tree and the tests offline
+_TMP = tempfile.mkdtemp(prefix="review-tests-")
+os.environ.setdefault("RESULT_CACHE_DB_PATH", os.path.join(_TMP, "results.db"))
+os.environ.setdefault("JOB_DB_PATH", os.path.join(_TMP, "jobs.db"))
+os.environ.setdefault("DATASET_DB_PATH", os.path.join(_TMP, "datasets.db"))
+os.environ.setdefault("WORK_QUEUE_DB_PATH", os.path.join(_TMP, "work_queue.db"))
+os.environ.setdefault("RESULTS_DIR", os.path.join(_TMP, "results"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_TMP, "uploads"))
+os.environ.setdefault("RESULT_CACHE_ENABLED", "0")
+os.environ.setdefault("SENTIMENT_BACKEND", "local")
@@ -0,0 +1,58 @@
+import asyncio
+
+from app.batch_scheduler import MicroBatchScheduler, QueueFullError
+
+
+async def _slow_backend(items):
+    await asyncio.sleep(0.2)
+    return [item * 2 for item in items]
+
+
+def test_rejects_when_running_batches_hold_the_slots():
+    async def run():
+        scheduler = MicroBatchScheduler(_slow_backend, max_batch_size=4, max_wait_ms=5, max_queue_depth=16)
+        scheduler.start()
+        try:
+            results = await asyncio.gather(*(scheduler.submit(i) for i in range(100)), return_exceptions=True)
+        finally:
+            await scheduler.stop()
+        return scheduler, results
+
+    scheduler, results = asyncio.run(run())
+    rejected = [r for r in results if isinstance(r, QueueFullError)]
+    served = [r for r in results if not isinstance(r, Exception)]
+    assert len(served) == 16
+    assert len(rejected) == 84 == scheduler.stats["rejected"]
+    assert scheduler.pending == 0
+
+
+def test_slots_are_freed_when_a_batch_finishes():
+    async def run():
+        scheduler = MicroBatchScheduler(_slow_backend, max_batch_size=4, max_wait_ms=5, max_queue_depth=4)
+        scheduler.start()
+        try:
+            first = await asyncio.gather(*(scheduler.submit(i) for i in range(4)))
+            second = await asyncio.gather(*(scheduler.submit(i) for i in range(4, 8)))
+        finally:
+            await scheduler.stop()
+        return first + second
+
+    assert asyncio.run(run()) == [i * 2 for i in range(8)]
+
+
+def test_failed_batch_frees_its_slots():
+    async def failing(items):
+        raise RuntimeError("backend down")
+
+    async def run():
+        scheduler = MicroBatchScheduler(failing, max_wait_ms=5, max_queue_depth=2)
+        scheduler.start()
+        try:
+            results = await asyncio.gather(scheduler.submit(1), scheduler.submit(2), return_exceptions=True)
+        finally:
+            await scheduler.stop()
+        return scheduler, results
+
+    scheduler, results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert scheduler.pending == 0
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app import bulk_pipeline, dataset_store
+from app.dataset_store import iter_incremental_results
+from app.router import LLM
+
+
+@pytest.fixture
+def summarize(monkeypatch):
+    state = {"gate": None, "calls": 0}
+
+    async def fake(reviews, inflight):
+        state["calls"] += len(reviews)
+        if state["gate"] is not None:
+            await state["gate"].wait()
+        return [{"summary": review[:10], "predicted_rating": 3, "original_review": review} for review in reviews]
+
+    monkeypatch.setattr(bulk_pipeline, "_summarize_chunk", fake)
+    monkeypatch.setattr(bulk_pipeline, "predict_ratings_with_confidence", lambda reviews: [(3, 0.0)] * len(reviews))
+    monkeypatch.setattr(bulk_pipeline, "route_reviews", lambda reviews, confidences: [LLM] * len(reviews))
+    monkeypatch.setattr(bulk_pipeline, "NEAR_DUP_ENABLED", False)
+    return state
+
+
+def _entries(count: int, start: int = 0):
+    return [{"review": f"Review number {i} about room {i * 7} and breakfast {i * 3}", "date": "2024-01-01"}
+            for i in range(start, start + count)]
+
+
+def test_reused_prefix_streams_before_new_rows_finish(summarize, monkeypatch):
+    monkeypatch.setattr(dataset_store, "LOOKUP_BATCH", 50)
+    monkeypatch.setattr(dataset_store, "REUSED_AHEAD", 100)
+
+    async def run():
+        first = [row async for row in iter_incremental_results("append-only", _entries(1000))]
+        assert len(first) == 1000
+
+        # ✅ The new rows cannot finish until every reused row has been received
+        summarize["gate"] = asyncio.Event()
+        rows = []
+        async for row in iter_incremental_results("append-only", _entries(1005)):
+            rows.append(row)
+            if len(rows) == 1000:
+                summarize["gate"].set()
+        return rows
+
+    rows = asyncio.run(asyncio.wait_for(run(), 30))
+    assert [row["original_review"] for row in rows] == [entry["review"] for entry in _entries(1005)]
+
+
+def test_rows_stay_in_input_order_around_new_rows(summarize):
+    async def run():
+        old = _entries(30)
+        [row async for row in iter_incremental_results("interleaved", old[::2])]
+        return [row async for row in iter_incremental_results("interleaved", old)]
+
+    stats_rows = asyncio.run(run())
+    assert [row["original_review"] for row in stats_rows] == [entry["review"] for entry in _entries(30)]
+
+
+def test_consumer_stopping_early_releases_the_reader(summarize, monkeypatch):
+    monkeypatch.setattr(dataset_store, "LOOKUP_BATCH", 10)
+    monkeypatch.setattr(dataset_store, "REUSED_AHEAD", 20)
+
+    async def run():
+        [row async for row in iter_incremental_results("early-stop", _entries(200))]
+        results = iter_incremental_results("early-stop", _entries(210))
+        first = [await results.__anext__() for _ in range(5)]
+        await results.aclose()
+        return first
+
+    assert len(asyncio.run(asyncio.wait_for(run(), 30))) == 5
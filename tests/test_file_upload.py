@@ -0,0 +1,32 @@
+import io
+import os
+
+from starlette.datastructures import UploadFile
+
+from app.file_upload import UPLOAD_DIR, remove_upload, save_upload
+
+
+def _upload(name: str, body: bytes = b"review\nGreat stay\n") -> UploadFile:
+    return UploadFile(io.BytesIO(body), filename=name)
+
+
+def test_same_name_uploads_get_their_own_files():
+    first = save_upload(_upload("reviews.csv", b"review\nfirst\n"))
+    second = save_upload(_upload("reviews.csv", b"review\nsecond\n"))
+
+    assert first != second
+    assert open(first, encoding="utf-8").read() == "review\nfirst\n"
+    assert os.path.basename(first).endswith("_reviews.csv")
+
+
+def test_client_path_components_are_dropped():
+    location = save_upload(_upload("../../etc/reviews.csv"))
+    assert os.path.dirname(location) == UPLOAD_DIR
+    assert os.path.basename(location).endswith("_reviews.csv")
+
+
+def test_remove_upload_ignores_missing_files():
+    location = save_upload(_upload("reviews.csv"))
+    remove_upload(location)
+    remove_upload(location)
+    assert not os.path.exists(location)
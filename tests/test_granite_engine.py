@@ -0,0 +1,79 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("tokenizers")
+
+from app import granite_engine
+from app.granite_engine import GRANITE_PROMPT_PREFIX, GraniteEngine, build_granite_prompt, build_granite_suffix
+
+REVIEWS = [
+    "Great stay, the staff were lovely and the room was spotless.",
+    "Terrible service. Cold food and a rude waiter.",
+    "Okay hotel, nothing special.",
+    "The pool was closed for the whole week and nobody told us before we arrived at the hotel.",
+    "Loved it!",
+]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    """
+    GraniteEngine around a 2-layer random Llama and a BPE tokenizer trained on the test reviews.
+    """
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, processors, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(REVIEWS + [GRANITE_PROMPT_PREFIX], trainers.BpeTrainer(
+        vocab_size=400, special_tokens=["<s>", "</s>"], initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    tokenizer.post_processor = processors.TemplateProcessing(single="<s> $A", special_tokens=[("<s>", 0)])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>")
+
+    torch.manual_seed(0)
+    model = LlamaForCausalLM(LlamaConfig(
+        vocab_size=len(tokenizer), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+        num_attention_heads=4, num_key_value_heads=4, max_position_embeddings=512,
+        bos_token_id=0, eos_token_id=1
+    ))
+    return GraniteEngine(model, tokenizer, batch_size=4, max_new_tokens=8)
+
+
+def test_batched_generation_matches_one_at_a_time(engine, monkeypatch):
+    monkeypatch.setattr(granite_engine, "GRANITE_PREFIX_CACHE", False)
+    batched = engine.generate_texts([build_granite_prompt(review) for review in REVIEWS])
+    single = [engine.generate_texts([build_granite_prompt(review)])[0] for review in REVIEWS]
+    assert batched == single
+
+
+def test_prefix_cache_matches_full_prompts(engine, monkeypatch):
+    monkeypatch.setattr(granite_engine, "GRANITE_PREFIX_CACHE", False)
+    uncached = engine.generate_texts([build_granite_prompt(review) for review in REVIEWS])
+
+    monkeypatch.setattr(granite_engine, "GRANITE_PREFIX_CACHE", True)
+    suffixes = [build_granite_suffix(review) for review in REVIEWS]
+    assert engine.generate_texts(suffixes, GRANITE_PROMPT_PREFIX) == uncached
+    # ✅ The cached key/values are copied, so a second run sees the same prefix
+    assert engine.generate_texts(suffixes, GRANITE_PROMPT_PREFIX) == uncached
+
+
+def test_unparseable_replies_are_reasked_with_summary_prefilled(engine, monkeypatch):
+    calls = []
+
+    def fake_generate(prompts, prefix=""):
+        calls.append(list(prompts))
+        if len(calls) == 1:
+            return ["Summary: Lovely stay\nPredicted Rating: 5", "<garbage>"]
+        return [" Cold food and rude staff\nPredicted Rating: 2"]
+
+    monkeypatch.setattr(engine, "generate_texts", fake_generate)
+    results = engine.summarize_batch(REVIEWS[:2])
+
+    assert calls[1] == [build_granite_suffix(REVIEWS[1]) + "Summary:"]
+    assert results[0]["predicted_rating"] == 5
+    assert results[1]["summary"] == "Cold food and rude staff"
+    assert results[1]["predicted_rating"] == 2
+    assert [result["original_review"] for result in results] == REVIEWS[:2]
@@ -0,0 +1,43 @@
+import threading
+
+from app import job_manager
+from app.job_manager import CANCELLED, _run_job, store
+
+
+def test_job_cancelled_before_start_is_finished_and_forgotten(tmp_path):
+    input_path = tmp_path / "reviews.csv"
+    input_path.write_text("review\nGreat stay\n", encoding="utf-8")
+    store.create("cancelled-early", "reviews.csv", str(input_path), 1)
+
+    event = job_manager._cancel_events["cancelled-early"] = threading.Event()
+    event.set()
+    _run_job("cancelled-early", str(input_path), set())
+
+    job = store.get("cancelled-early")
+    assert job["status"] == CANCELLED
+    assert job["finished_at"] is not None
+    assert "cancelled-early" not in job_manager._cancel_events
+
+
+def test_store_files_are_created_on_first_use(tmp_path):
+    db_path = tmp_path / "jobs" / "jobs.db"
+    jobs = job_manager.JobStore(str(db_path))
+    assert not db_path.parent.exists()
+
+    assert jobs.get("missing") is None
+    assert db_path.exists()
+
+
+def test_cancelled_job_is_not_revived_by_a_late_start(tmp_path):
+    input_path = tmp_path / "reviews.csv"
+    input_path.write_text("review\nGreat stay\n", encoding="utf-8")
+    store.create("cancelled-in-queue", "reviews.csv", str(input_path), 1)
+    store.update("cancelled-in-queue", status=CANCELLED)
+
+    # ✅ The worker's own cancel event was never set, as when the watcher has not polled yet
+    job_manager._cancel_events["cancelled-in-queue"] = threading.Event()
+    _run_job("cancelled-in-queue", str(input_path), set())
+
+    assert store.get("cancelled-in-queue")["status"] == CANCELLED
+    assert store.get("cancelled-in-queue")["started_at"] is None
+    assert "cancelled-in-queue" not in job_manager._cancel_events
@@ -0,0 +1,26 @@
+import pytest
+
+from app.local_sentiment import analyze_sentiment_local, score_text
+
+
+@pytest.mark.parametrize("text", [
+    "I don't recommend this hotel",
+    "The room wasn't clean.",
+    "Staff weren't friendly.",
+    "Staff weren’t friendly.",   # typographic apostrophe
+])
+def test_negated_contractions_are_negative(text):
+    assert analyze_sentiment_local(text) == "negative"
+
+
+@pytest.mark.parametrize("positive, negated", [
+    ("I recommend this hotel", "I don't recommend this hotel"),
+    ("The room was clean.", "The room wasn't clean."),
+    ("The staff were rude.", "The staff weren't rude."),
+])
+def test_contraction_flips_polarity(positive, negated):
+    assert score_text(positive) * score_text(negated) < 0
+
+
+def test_hyphenated_words_stay_one_token():
+    assert analyze_sentiment_local("Top-notch service!") == "positive"
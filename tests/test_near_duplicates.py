@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+import pytest
+
+from app import bulk_pipeline
+from app.dataset_store import iter_incremental_results
+from app.near_duplicates import NearDuplicateIndex, review_tokens
+from app.router import LLM
+
+DISTINCT = [
+    "The breakfast buffet had fresh fruit and warm pastries every morning",
+    "Parking was expensive and the garage entrance was hard to find",
+]
+NEAR_DUPLICATES = [
+    "The pool area was spotless and the lifeguards were attentive all afternoon",
+    "The pool area was spotless and the lifeguards were attentive all afternoon today",
+]
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    async def summarize(reviews, inflight):
+        calls.extend(reviews)
+        return [{"summary": review[:20], "predicted_rating": 4, "original_review": review} for review in reviews]
+
+    monkeypatch.setattr(bulk_pipeline, "_summarize_chunk", summarize)
+    monkeypatch.setattr(bulk_pipeline, "predict_ratings_with_confidence", lambda reviews: [(4, 0.0)] * len(reviews))
+    monkeypatch.setattr(bulk_pipeline, "route_reviews", lambda reviews, confidences: [LLM] * len(reviews))
+    return calls
+
+
+def _run(dataset_id, reviews):
+    async def collect():
+        entries = [{"review": review, "date": "2024-01-01"} for review in reviews]
+        return [row async for row in iter_incremental_results(dataset_id, entries)]
+    return asyncio.run(collect())
+
+
+def test_duplicate_of_is_the_input_row_when_rows_are_reused(llm_calls):
+    _run("near-dup-incremental", DISTINCT)
+    llm_calls.clear()
+
+    rows = _run("near-dup-incremental", DISTINCT + NEAR_DUPLICATES)
+
+    assert llm_calls == NEAR_DUPLICATES[:1]  # rows 0-1 reused, row 3 served from row 2
+    assert "duplicate_of" not in rows[2]
+    assert rows[3]["duplicate_of"] == 2
+    assert rows[3]["summary"] == rows[2]["summary"]
+
+
+def test_duplicate_of_without_skipped_rows(llm_calls):
+    async def collect():
+        entries = [{"review": review, "date": ""} for review in DISTINCT + NEAR_DUPLICATES]
+        return [row async for row in bulk_pipeline.iter_bulk_results(entries)]
+
+    rows = asyncio.run(collect())
+    assert [row.get("duplicate_of") for row in rows] == [None, None, None, 2]
+
+
+def test_duplicate_of_is_the_input_row_on_resume(llm_calls, tmp_path):
+    from app.job_manager import _process_rows, store
+
+    input_path = tmp_path / "reviews.csv"
+    lines = ["review,date"] + [f'"{review}",2024-01-01' for review in DISTINCT + NEAR_DUPLICATES]
+    input_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    store.create("near-dup-resume", "reviews.csv", str(input_path), 4)
+
+    # ✅ Rows 0-1 finished before the restart
+    asyncio.run(_process_rows("near-dup-resume", str(input_path), {0, 1}, threading.Event()))
+
+    rows = dict(store.iter_indexed_results("near-dup-resume"))
+    assert llm_calls == NEAR_DUPLICATES[:1]
+    assert sorted(rows) == [2, 3]
+    assert rows[3]["duplicate_of"] == 2
+
+
+@pytest.mark.parametrize("first, second", [
+    ("The room on the third floor was spotless and the view over the harbour was lovely",
+     "The room on the third floor was dirty and the view over the harbour was lovely"),
+    ("The staff at the front desk were rude when we checked in late on friday night",
+     "The staff at the front desk weren't rude when we checked in late on friday night"),
+])
+def test_opposite_polarity_is_never_clustered(first, second):
+    index = NearDuplicateIndex()
+    index.add(0, review_tokens(first))
+    assert index.query(review_tokens(second)) is None
+
+
+def test_same_polarity_near_duplicates_cluster():
+    index = NearDuplicateIndex()
+    index.add(0, review_tokens(NEAR_DUPLICATES[0]))
+    assert index.query(review_tokens(NEAR_DUPLICATES[1])) == 0
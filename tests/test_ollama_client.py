@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.ollama_client import SlotBudget
+
+
+def test_sync_and_async_callers_share_one_budget():
+    budget = SlotBudget(2)
+    held = threading.Event()
+    done = threading.Event()
+
+    def sync_caller():
+        with budget:
+            held.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=sync_caller)
+    thread.start()
+    held.wait(5)
+
+    async def main():
+        running = 0
+        peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with budget:
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(5)))
+        return peak
+
+    # ✅ The sync thread holds one of the two slots, so async calls run one at a time
+    assert asyncio.run(main()) == 1
+    done.set()
+    thread.join(5)
+    assert budget.free == 2
+
+
+def test_async_waiter_gets_slot_released_by_a_thread():
+    budget = SlotBudget(1)
+    budget.acquire()
+
+    async def main():
+        threading.Timer(0.05, budget.release).start()
+        started = time.monotonic()
+        async with budget:
+            return time.monotonic() - started
+
+    assert asyncio.run(main()) >= 0.04
+    assert budget.free == 1
+
+
+def test_thread_waiter_gets_slot_released_by_async_code():
+    budget = SlotBudget(1)
+    acquired = threading.Event()
+
+    async def main():
+        async with budget:
+            thread = threading.Thread(target=lambda: (budget.acquire(), acquired.set()))
+            thread.start()
+            await asyncio.sleep(0.05)
+            assert not acquired.is_set()
+        await asyncio.to_thread(acquired.wait, 5)
+        return thread
+
+    asyncio.run(main()).join(5)
+    assert acquired.is_set()
+    budget.release()
+    assert budget.free == 1
+
+
+@pytest.mark.parametrize("release_first", [False, True])
+def test_cancelled_waiter_does_not_leak_a_slot(release_first):
+    budget = SlotBudget(1)
+
+    async def main():
+        await budget.acquire_async()
+        waiter = asyncio.create_task(budget.acquire_async())
+        await asyncio.sleep(0.01)
+        # 🔁 Cancelled either while still queued or after the slot was handed over
+        if release_first:
+            budget.release()
+            waiter.cancel()
+        else:
+            waiter.cancel()
+            budget.release()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+    assert budget.free == 1
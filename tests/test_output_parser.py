@@ -0,0 +1,74 @@
+import itertools
+
+import pytest
+
+from app.output_parser import FAILED, OK, REPAIRED, parse_rating, parse_reply, parse_stats, rating_stars
+
+
+_engines = itertools.count()
+
+
+def _outcome(raw: str, expect_json: bool = True):
+    engine = f"test-{next(_engines)}"
+    result = parse_reply(raw, engine, expect_json)
+    outcomes = [outcome for (name, outcome), count in parse_stats.items() if name == engine and count]
+    return result, outcomes[0]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (4, 4.0), (4.5, 4.5), ("3/5", 3.0), ("Rating: 4.0", 4.0), ("5 stars", 5.0), (" 1 ", 1.0),
+    (0, "N/A"), (6, "N/A"), ("10/10", "N/A"), ("-2", 2.0), ("", "N/A"), (None, "N/A"), (True, "N/A"),
+])
+def test_parse_rating_keeps_only_1_to_5(value, expected):
+    assert parse_rating(value) == expected
+
+
+def test_rating_stars():
+    assert rating_stars(4.4) == "⭐⭐⭐⭐"
+    assert rating_stars("N/A") == ""
+    assert rating_stars(True) == ""
+
+
+def test_json_reply():
+    result, outcome = _outcome('{"summary": "Clean and quiet", "rating": 5}')
+    assert result == {"summary": "Clean and quiet", "predicted_rating": 5.0}
+    assert outcome == OK
+
+
+def test_fenced_json_reply():
+    result, outcome = _outcome('```json\n{"summary": "Clean", "rating": "4"}\n```')
+    assert result == {"summary": "Clean", "predicted_rating": 4.0}
+    assert outcome == OK
+
+
+def test_json_embedded_in_text_is_repaired():
+    result, outcome = _outcome('Sure! Here you go: {"summary": "Slow check-in", "rating": 2} Hope it helps.')
+    assert result == {"summary": "Slow check-in", "predicted_rating": 2.0}
+    assert outcome == REPAIRED
+
+
+def test_labelled_lines():
+    raw = "Summary: Friendly staff, small room\nPredicted Rating: 4"
+    assert _outcome(raw, expect_json=False) == ({"summary": "Friendly staff, small room", "predicted_rating": 4.0}, OK)
+    # ✅ The same lines are only a repair when JSON was asked for
+    assert _outcome(raw, expect_json=True)[1] == REPAIRED
+
+
+def test_rating_without_summary_label_uses_the_first_other_line():
+    result, outcome = _outcome("The guest liked the pool but not the food.\nRating: 3/5")
+    assert result == {"summary": "The guest liked the pool but not the food.", "predicted_rating": 3.0}
+    assert outcome == REPAIRED
+
+
+def test_out_of_range_json_rating_falls_through_to_failure():
+    result, outcome = _outcome('{"summary": "Great", "rating": 9}')
+    assert result["predicted_rating"] == "N/A"
+    assert outcome == FAILED
+
+
+@pytest.mark.parametrize("raw", ["", "I cannot help with that.", "Summary: Nice place"])
+def test_unusable_replies_fail(raw):
+    result, outcome = _outcome(raw)
+    assert result["predicted_rating"] == "N/A"
+    assert result["summary"] in ("Summary not found", "Nice place")
+    assert outcome == FAILED
@@ -0,0 +1,62 @@
+import numpy as np
+
+from app.rating_predictor import RatingModel, load_labeled_csv, main
+
+TRAIN = [
+    ("Absolutely wonderful stay, spotless room and lovely staff", 5),
+    ("Excellent breakfast and a fantastic view from the balcony", 5),
+    ("Good location, comfortable bed, would come back", 4),
+    ("Nice room and helpful reception, a bit noisy at night", 4),
+    ("Average hotel, nothing special but fine for one night", 3),
+    ("Okay stay, the room was decent and the price fair", 3),
+    ("Disappointed by the dirty bathroom and slow check in", 2),
+    ("Poor service and the air conditioning was broken", 2),
+    ("Terrible experience, rude staff and a filthy room", 1),
+    ("The worst hotel ever, cockroaches and no hot water", 1),
+]
+TEXTS, RATINGS = [text for text, _ in TRAIN], [rating for _, rating in TRAIN]
+
+
+def _small_model() -> RatingModel:
+    return RatingModel.from_keywords(n_features=2 ** 12)
+
+
+def test_trained_model_fits_its_training_data():
+    model = _small_model().fit(TEXTS, RATINGS, epochs=200)
+    ratings, confidence = model.predict(TEXTS)
+
+    assert model.source == "trained"
+    assert ratings.tolist() == RATINGS
+    assert np.all((confidence > 0) & (confidence <= 1))
+
+
+def test_saved_model_predicts_the_same(tmp_path):
+    model = _small_model().fit(TEXTS, RATINGS, epochs=50)
+    path = model.save(str(tmp_path / "models" / "rating_model.npz"))
+
+    loaded = RatingModel.load(path)
+    assert loaded.source == "trained"
+    np.testing.assert_allclose(loaded.predict_proba(TEXTS), model.predict_proba(TEXTS), rtol=1e-6)
+
+
+def test_keyword_seed_model_orders_clear_reviews():
+    ratings, _ = _small_model().predict(["Excellent and amazing stay", "Terrible and awful stay", ""])
+    assert ratings[0] > 3 > ratings[1]
+    assert ratings[2] == 3  # ✅ No evidence falls back to three stars
+
+
+def test_empty_batches_are_fine():
+    assert _small_model().predict_proba([]).shape == (0, 5)
+
+
+def test_train_command_round_trip(tmp_path):
+    csv_path = tmp_path / "labeled.csv"
+    rows = [f'"{text}",{rating}' for text, rating in TRAIN] + ['"No rating here",', '"Out of range",9']
+    csv_path.write_text("Review,Rating\n" + "\n".join(rows) + "\n", encoding="utf-8")
+
+    texts, ratings = load_labeled_csv(str(csv_path))
+    assert (texts, ratings) == (TEXTS, RATINGS)
+
+    model_path = tmp_path / "rating_model.npz"
+    main(["train", str(csv_path), "--model", str(model_path), "--epochs", "50", "--holdout", "0"])
+    assert RatingModel.load(str(model_path)).predict(TEXTS)[0].shape == (len(TEXTS),)
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import bulk_pipeline
+from app.result_cache import ResultCache, cache_key, is_cacheable
+from app.sentiment import FallbackLabel
+
+RESULT = {"summary": "Nice stay", "predicted_rating": 4}
+
+
+def test_evicted_entries_are_served_from_disk_and_promoted(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache" / "results.db"), max_memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, {**RESULT, "key": key})
+
+    assert cache.get_memory("a") is None
+    assert cache.counters["evictions"] == 1
+
+    assert cache.get("a")["key"] == "a"
+    assert cache.counters["disk_hits"] == 1
+    assert cache.get_memory("a")["key"] == "a"  # ✅ Promoted back into the LRU
+    assert cache.get_memory("b") is None        # ... pushing out the least recently used entry
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "results.db")
+    ResultCache(path).set("k", RESULT)
+    assert ResultCache(path).get("k") == RESULT
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path / "results.db"), ttl_seconds=60)
+    cache.set("k", RESULT)
+    later = time.time() + 120
+    monkeypatch.setattr("app.result_cache.time.time", lambda: later)
+    assert cache.get("k") is None
+    assert cache.counters["misses"] == 1
+
+
+def test_failures_are_not_cached(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.db"))
+    assert not is_cacheable({"summary": "x", "predicted_rating": "N/A"})
+    assert not is_cacheable({"summary": "x", "error": "timeout"})
+    assert not is_cacheable(FallbackLabel("positive"))
+    assert not is_cacheable("error")
+
+    calls = []
+    cache.get_or_compute("k", lambda: calls.append(1) or "error")
+    cache.get_or_compute("k", lambda: calls.append(1) or "error")
+    assert len(calls) == 2
+
+
+def test_cache_key_normalizes_whitespace_and_tracks_the_model():
+    key = cache_key("summary", "Great  stay\n", "ollama", "llama3", "3")
+    assert key == cache_key("summary", " Great stay", "ollama", "llama3", "3")
+    assert key != cache_key("summary", "Great stay", "ollama", "llama3", "4")
+    assert key != cache_key("summary", "Great stay", "granite", "llama3", "3")
+
+
+def test_identical_reviews_share_one_inflight_call():
+    calls = []
+    lock = threading.Lock()
+
+    def slow(review):
+        with lock:
+            calls.append(review)
+        time.sleep(0.1)
+        return {**RESULT, "original_review": review}
+
+    async def run():
+        inflight = {}
+        with ThreadPoolExecutor(4) as pool:
+            return await asyncio.gather(*(bulk_pipeline._run_cached(pool, "same-key", slow, "Great stay", inflight)
+                                          for _ in range(5))), inflight
+
+    before = bulk_pipeline.pipeline_stats["deduplicated_calls"]
+    results, inflight = asyncio.run(run())
+    assert calls == ["Great stay"]
+    assert all(result == results[0] for result in results)
+    assert bulk_pipeline.pipeline_stats["deduplicated_calls"] - before == 4
+    assert inflight == {}
+
+
+def test_batch_sends_each_distinct_review_once():
+    batches = []
+
+    def batch_fn(reviews):
+        batches.append(list(reviews))
+        return [{**RESULT, "original_review": review} for review in reviews]
+
+    async def run():
+        with ThreadPoolExecutor(2) as pool:
+            reviews = ["a", "b", "a", "c", "b"]
+            return await bulk_pipeline._run_cached_batch(pool, reviews, batch_fn, reviews, {})
+
+    results = asyncio.run(run())
+    assert sorted(review for batch in batches for review in batch) == ["a", "b", "c"]
+    assert [result["original_review"] for result in results] == ["a", "b", "a", "c", "b"]
@@ -0,0 +1,29 @@
+import csv
+
+from app import result_store
+from app.result_store import ResultWriter
+
+
+def _row(i: int) -> dict:
+    return {"original_review": f"review {i}", "summary": f"summary {i}", "predicted_rating": 4,
+            "rating_stars": "⭐⭐⭐⭐", "sentiment": "positive", "date": "2024-01-0" + str(1 + i % 9)}
+
+
+def test_write_many_matches_row_by_row_writes():
+    batched = ResultWriter("write-many-batched")
+    batched.write_many([_row(i) for i in range(5)])
+    batched.write_many([])
+    batched.close()
+
+    single = ResultWriter("write-many-single")
+    for i in range(5):
+        single.write(_row(i))
+    single.close()
+
+    def read(result_id):
+        with open(result_store.csv_path(result_id), encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    assert batched.rows == single.rows == 5
+    assert read("write-many-batched") == read("write-many-single")
+    assert batched.trends.series("day") == single.trends.series("day")
@@ -0,0 +1,24 @@
+from app import router
+from app.router import LLM, LOCAL, choose_route
+
+SHORT = "Great stay, lovely staff"
+LONG = " ".join(["word"] * 60)
+
+
+def test_router_is_off_by_default():
+    assert router.ROUTER_ENABLED is False
+    assert choose_route(SHORT, 0.99) == LLM
+
+
+def test_short_reviews_need_a_trained_confident_model(monkeypatch):
+    monkeypatch.setattr(router, "ROUTER_ENABLED", True)
+    assert choose_route(SHORT, 0.99, trained=False) == LLM
+    assert choose_route(SHORT, 0.5, trained=True) == LLM
+    assert choose_route(SHORT, 0.99, trained=True) == LOCAL
+    assert choose_route(LONG, 0.99, trained=True) == LLM
+
+
+def test_keyword_seed_model_never_routes_locally(monkeypatch):
+    monkeypatch.setattr(router, "ROUTER_ENABLED", True)
+    monkeypatch.setattr(router, "get_rating_model", lambda: type("Seed", (), {"source": "keywords"})())
+    assert router.route_reviews([SHORT, "ok"], [0.99, 0.99]) == [LLM, LLM]
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from app import ibm_sentiment, sentiment
+from app.ibm_sentiment import RateLimiter, analyze_sentiment_ibm
+from app.sentiment import FallbackLabel, analyze_sentiment, analyze_sentiments
+from benchmarks.stub_servers import StubServer, _Handler
+
+
+class _ScriptedNLU(_Handler):
+    """
+    NLU stub that answers with the next (status, delay) of the server's script, then 200s.
+    """
+
+    def do_POST(self):
+        payload = self._read_json()
+        self.server.requests += 1
+        status, delay = self.server.script.pop(0) if self.server.script else (200, 0.0)
+        time.sleep(delay)
+        if status != 200:
+            self._send_json(status, {"error": "stub error", "code": status}, {"Retry-After": "0"})
+            return
+        label = "negative" if "rude" in payload.get("text", "") else "positive"
+        self._send_json(200, {"language": "en", "sentiment": {"document": {"label": label, "score": 0.5}}})
+
+
+@pytest.fixture
+def nlu(monkeypatch):
+    server = StubServer(_ScriptedNLU).start()
+    server.server.script, server.server.requests = [], 0
+    monkeypatch.setattr(ibm_sentiment, "WATSON_URL", server.url)
+    monkeypatch.setattr(ibm_sentiment, "WATSON_AUTH_TYPE", "none")
+    monkeypatch.setattr(ibm_sentiment, "WATSON_BACKOFF", 0.01)
+    monkeypatch.setattr(ibm_sentiment, "WATSON_MAX_RETRIES", 2)
+    monkeypatch.setattr(ibm_sentiment, "WATSON_TIMEOUT", 0.5)
+    monkeypatch.setattr(ibm_sentiment, "_rate_limiter", RateLimiter(0))
+    monkeypatch.setattr(ibm_sentiment, "_client", None)
+    monkeypatch.setattr(sentiment, "SENTIMENT_BACKEND", "auto")
+    yield server.server
+    server.stop()
+
+
+def test_429_and_5xx_are_retried(nlu):
+    nlu.script = [(429, 0.0), (503, 0.0)]
+    assert analyze_sentiment_ibm("Lovely stay") == "positive"
+    assert nlu.requests == 3
+
+
+def test_retries_stop_after_the_limit(nlu):
+    nlu.script = [(500, 0.0)] * 5
+    assert analyze_sentiment_ibm("Lovely stay") == "error"
+    assert nlu.requests == 3  # first call + WATSON_MAX_RETRIES
+
+
+def test_client_errors_are_not_retried(nlu):
+    nlu.script = [(400, 0.0)]
+    assert analyze_sentiment_ibm("Lovely stay") == "error"
+    assert nlu.requests == 1
+
+
+def test_slow_calls_hit_the_deadline_and_fall_back(nlu):
+    nlu.script = [(200, 2.0)]
+    start = time.perf_counter()
+    label = analyze_sentiment("The staff were rude.")
+    assert time.perf_counter() - start < 1.5
+    assert isinstance(label, FallbackLabel)
+    assert label == "negative"
+
+
+def test_failed_batch_items_fall_back_to_the_local_classifier(nlu):
+    nlu.script = [(400, 0.0)]
+    labels = analyze_sentiments(["The staff were rude."])
+    assert labels == ["negative"] and isinstance(labels[0], FallbackLabel)
+
+    labels = analyze_sentiments(["Lovely stay", "The staff were rude."])
+    assert labels == ["positive", "negative"]
+    assert not any(isinstance(label, FallbackLabel) for label in labels)
+
+
+def test_no_fallback_when_watson_is_forced(nlu, monkeypatch):
+    monkeypatch.setattr(sentiment, "SENTIMENT_BACKEND", "watson")
+    nlu.script = [(400, 0.0)]
+    assert analyze_sentiment("Lovely stay") == "error"
+
+
+def test_token_bucket_limits_the_rate():
+    limiter = RateLimiter(rate=20, burst=2)
+    start = time.perf_counter()
+    for _ in range(6):
+        limiter.acquire()
+    # ✅ Two calls from the burst, then one every 50 ms
+    assert 0.18 <= time.perf_counter() - start < 0.5
+
+
+def test_token_bucket_disabled_at_zero_rate():
+    limiter = RateLimiter(rate=0)
+    start = time.perf_counter()
+    for _ in range(1000):
+        limiter.acquire()
+    assert time.perf_counter() - start < 0.1